@@ -0,0 +1,154 @@
+"""
+/predict concurrency benchmark - bench_concurrency.py
+
+Fires /predict requests with a fixed number in flight and reports
+throughput and latency for each concurrency level. If the event loop is
+getting blocked (sync SQLite, predict() on the loop) throughput stays
+flat as concurrency goes up - it should climb until the CPU or the
+database is actually saturated.
+
+By default the app runs in-process with a throwaway database. Point it at
+a real server with --url to include uvicorn and the network.
+
+Also reports CPU time per request (this process's CPU time over the
+level, divided by requests). In-process that's the app plus the test
+client, so it's for comparing before and after a change on one machine,
+not an absolute cost. With --url it's just the client.
+
+Usage (from the backend folder):
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --levels 1 4 16 64 --requests 2000
+    python benchmarks/bench_concurrency.py --write-behind
+    python benchmarks/bench_concurrency.py --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+CITIES = ['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
+          'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
+APARTMENTS = ['studio', '1BR', '2BR', '3BR']
+CARS = ['compact', 'sedan', 'suv', 'electric']
+
+
+def random_payloads(n: int, seed: int = 42) -> list:
+    """Random but valid /predict bodies."""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'city': CITIES[rng.integers(len(CITIES))],
+            'apartment_size': APARTMENTS[rng.integers(len(APARTMENTS))],
+            'dining_frequency': int(rng.integers(0, 16)),
+            'car_type': CARS[rng.integers(len(CARS))],
+            'commute_miles': round(float(rng.uniform(0, 100)), 1)
+        }
+        for _ in range(n)
+    ]
+
+
+async def run_level(client: httpx.AsyncClient, payloads: list, concurrency: int) -> dict:
+    """Send every payload with `concurrency` requests in flight at once."""
+    latencies = []
+    errors = 0
+    queue = list(reversed(payloads))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            payload = queue.pop()
+            start = time.perf_counter()
+            response = await client.post('/predict', json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    cpu_seconds = time.process_time() - cpu_start
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(payloads),
+        'errors': errors,
+        'throughput_rps': len(payloads) / elapsed,
+        'cpu_ms_per_request': cpu_seconds * 1000 / len(payloads),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99))
+    }
+
+
+def make_client(url: str = None) -> httpx.AsyncClient:
+    """Client for a running server, or for the app in-process with a temp DB."""
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+
+    import database
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix='livecost-bench-'), 'bench.db')
+
+    import main
+    main.prepare_database()
+    main.load_models()
+
+    return httpx.AsyncClient(app=main.app, base_url='http://bench', timeout=60)
+
+
+async def run_levels(client: httpx.AsyncClient, levels: list, requests: int):
+    """Warm up, then yield the result for each concurrency level in turn."""
+    # Warm up caches / connections so level 1 isn't penalized
+    await run_level(client, random_payloads(20, seed=0), 4)
+
+    for level in levels:
+        yield await run_level(client, random_payloads(requests), level)
+
+
+async def run(args):
+    async with make_client(args.url) as client:
+        if args.write_behind and not args.url:
+            import main
+            from query_logger import QueryLogger
+            main.query_logger = QueryLogger()
+            await main.query_logger.start()
+
+        print(f"{'in flight':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'cpu ms':>7} {'errors':>7}")
+        async for result in run_levels(client, args.levels, args.requests):
+            print(f"{result['concurrency']:>9} {result['throughput_rps']:>9.1f} "
+                  f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['cpu_ms_per_request']:>7.3f} "
+                  f"{result['errors']:>7}")
+
+        if args.write_behind and not args.url:
+            await main.query_logger.stop()
+            print(f"\nWrite-behind logger: {main.query_logger.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--requests', type=int, default=500,
+                        help='requests per concurrency level')
+    parser.add_argument('--url', help='benchmark a running server instead of in-process')
+    parser.add_argument('--write-behind', action='store_true',
+                        help='log queries through the write-behind logger (in-process only)')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
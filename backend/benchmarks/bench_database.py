@@ -0,0 +1,166 @@
+"""
+Database benchmark - bench_database.py
+
+Times get_query_statistics() and get_recent_queries() against a throwaway
+database filled with synthetic user_queries rows, growing it to each size
+in turn (10k, 1M, 10M by default). Both should cost about the same at
+every size - /statistics reads the running totals and the history pages
+come straight off the timestamp indexes. The full GROUP BY scan that
+/statistics used to run is timed too, for comparison.
+
+Filling 10M rows takes a couple of minutes and about 1.5 GB of disk (the
+query_stats triggers run for every row, like they would in production).
+
+Usage (from the backend folder):
+    python benchmarks/bench_database.py
+    python benchmarks/bench_database.py --rows 10000 100000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import database  # noqa: E402
+
+CITIES = ['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
+          'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
+APARTMENTS = ['studio', '1BR', '2BR', '3BR']
+CARS = ['compact', 'sedan', 'suv', 'electric']
+
+# Same columns the API writes, plus the timestamp so the rows are spread
+# out over time instead of all landing in the same second
+INSERT_SYNTHETIC_SQL = '''
+    INSERT INTO user_queries
+    (city, apartment_size, dining_frequency, car_type, commute_miles,
+     predicted_cost, breakdown, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+'''
+
+BREAKDOWN_JSON = '{"rent": 1800.0, "food": 450.0, "transportation": 250.0, "utilities": 160.0}'
+
+# Rows are one every few seconds, ending about now
+SECONDS_BETWEEN_ROWS = 3
+
+FILL_CHUNK_ROWS = 200_000
+
+
+def fill_queries(conn, start_id: int, end_id: int, total_rows: int, seed: int = 42):
+    """
+    Insert synthetic rows start_id..end_id-1, oldest first like real traffic.
+
+    Timestamps are laid out as if total_rows were the whole history, so
+    growing the table in steps gives the same rows as filling it at once.
+    """
+    rng = np.random.default_rng(seed + start_id)
+    newest = int(time.time())
+
+    for chunk_start in range(start_id, end_id, FILL_CHUNK_ROWS):
+        n = min(FILL_CHUNK_ROWS, end_id - chunk_start)
+        rows = zip(
+            (CITIES[i] for i in rng.integers(len(CITIES), size=n)),
+            (APARTMENTS[i] for i in rng.integers(len(APARTMENTS), size=n)),
+            rng.integers(0, 16, n).tolist(),
+            (CARS[i] for i in rng.integers(len(CARS), size=n)),
+            np.round(rng.uniform(0, 100, n), 1).tolist(),
+            np.round(rng.uniform(1500, 9000, n), 2).tolist(),
+            [BREAKDOWN_JSON] * n,
+            (newest - (total_rows - i) * SECONDS_BETWEEN_ROWS
+             for i in range(chunk_start, chunk_start + n))
+        )
+        conn.executemany(INSERT_SYNTHETIC_SQL, rows)
+        conn.commit()
+
+
+def time_call(func, min_seconds: float = 0.5, min_runs: int = 5) -> dict:
+    """Median and p95 ms per call, repeating for at least min_seconds."""
+    func()  # warm up
+
+    timings = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or len(timings) < min_runs:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    timings_ms = np.array(timings) * 1000
+    return {
+        'runs': len(timings),
+        'median_ms': float(np.median(timings_ms)),
+        'p95_ms': float(np.percentile(timings_ms, 95))
+    }
+
+
+def full_scan_statistics():
+    """What /statistics did before query_stats - a scan of every row."""
+    conn = database.get_connection()
+    rows = conn.execute(database.AGGREGATE_QUERY_STATS_SQL).fetchall()
+    database.release_connection(conn)
+    return rows
+
+
+def run(sizes: list, db_dir: str = None, full_scan: bool = True) -> list:
+    """Grow one database through every size and time the queries at each."""
+    sizes = sorted(sizes)
+
+    own_dir = db_dir is None
+    db_dir = db_dir or tempfile.mkdtemp(prefix='livecost-bench-db-')
+    database.DB_PATH = os.path.join(db_dir, 'bench.db')
+    database.init_database()
+    conn = database.get_connection()
+
+    results = []
+    filled = 0
+    for size in sizes:
+        start = time.perf_counter()
+        fill_queries(conn, filled, size, sizes[-1])
+        filled = size
+        print(f"  filled {size:,} rows ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+        # An id from the middle of the history, for a deep keyset page
+        middle_id = conn.execute('SELECT MAX(id) FROM user_queries').fetchone()[0] // 2
+
+        queries = {
+            'statistics': database.get_query_statistics,
+            'recent_first_page': lambda: database.get_recent_queries(10),
+            'recent_deep_page': lambda: database.get_recent_queries(10, after=middle_id),
+            'recent_by_city': lambda: database.get_recent_queries(10, city='Denver')
+        }
+        if full_scan:
+            queries['statistics_full_scan'] = full_scan_statistics
+
+        for name, func in queries.items():
+            # The full scan takes seconds at 10M rows - a few runs is plenty
+            timing = time_call(func, min_runs=3 if name == 'statistics_full_scan' else 5)
+            results.append({'rows': size, 'query': name, **timing})
+
+    database.close_connections()
+    if own_dir:
+        shutil.rmtree(db_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--no-full-scan', action='store_true',
+                        help='skip timing the old GROUP BY scan')
+    args = parser.parse_args()
+
+    results = run(args.rows, full_scan=not args.no_full_scan)
+
+    print(f"{'rows':>11} {'query':<22} {'median ms':>10} {'p95 ms':>9}")
+    for result in results:
+        print(f"{result['rows']:>11,} {result['query']:<22} "
+              f"{result['median_ms']:>10.3f} {result['p95_ms']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
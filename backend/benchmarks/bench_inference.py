@@ -0,0 +1,94 @@
+"""
+Inference engine microbenchmark - bench_inference.py
+
+Times the three inference engines (sklearn, numpy, table) on the saved
+models for a single row and for a few batch sizes, and checks that the
+NumPy engine and the lookup table give bit-identical results to sklearn.
+
+Usage (from the backend folder):
+    python benchmarks/bench_inference.py
+    python benchmarks/bench_inference.py --sizes 1 10 100 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import lookup_table  # noqa: E402
+import tree_engine  # noqa: E402
+
+# sklearn warns about missing feature names on every ndarray predict()
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def random_features(n_rows: int, seed: int = 42) -> np.ndarray:
+    """Random rows covering the whole input space the API accepts."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 10, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.integers(0, 16, n_rows),
+        rng.integers(0, 4, n_rows),
+        rng.uniform(0, 100, n_rows)
+    ]).astype(np.float64)
+
+
+def time_predict(engine, features: np.ndarray, min_seconds: float = 0.5) -> float:
+    """Median seconds per predict() call, repeating for at least min_seconds."""
+    engine.predict(features)  # warm up
+
+    timings = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or len(timings) < 5:
+        start = time.perf_counter()
+        engine.predict(features)
+        timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    model, breakdown_models, metadata = lookup_table.load_artifacts(BACKEND_DIR)
+
+    engines = {
+        'sklearn': tree_engine.SklearnEnsemble(model, breakdown_models),
+        'numpy': tree_engine.from_models(model, breakdown_models),
+        'table': lookup_table.build_table(model, breakdown_models, metadata)
+    }
+
+    # Correctness first - no point being fast if the numbers are wrong
+    check = random_features(max(args.sizes))
+    expected = engines['sklearn'].predict(check)
+    for name in ('numpy', 'table'):
+        identical = np.array_equal(engines[name].predict(check), expected)
+        print(f"{name} bit-identical to sklearn on {len(check)} rows: {identical}")
+        if not identical:
+            sys.exit(1)
+
+    print()
+    print(f"{'rows':>8} " + ' '.join(f"{name + ' (ms)':>14}" for name in engines)
+          + f" {'numpy x':>9} {'table x':>9}")
+
+    for size in args.sizes:
+        features = random_features(size)
+        timings = {name: time_predict(engine, features) for name, engine in engines.items()}
+
+        print(f"{size:>8} "
+              + ' '.join(f"{timings[name] * 1000:>14.3f}" for name in engines)
+              + f" {timings['sklearn'] / timings['numpy']:>8.1f}x"
+              + f" {timings['sklearn'] / timings['table']:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-worker memory benchmark - bench_memory.py
+
+Starts N worker processes that each load a predictor the way a uvicorn
+worker would, then reports RSS / PSS / USS for each of them while they're
+all alive at once (PSS splits shared pages between the processes sharing
+them, so they all have to be running).
+
+Two setups:
+- pickle: joblib.load the forests and build the engine in every worker
+  (how every worker started before serving artifacts existed)
+- mmap:   np.load(mmap_mode='r') on the serving artifacts
+
+Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage (from the backend folder):
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --workers 8 --engine numpy
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import serving_artifacts  # noqa: E402
+
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+MB = 1024 * 1024
+
+
+def load_predictor(mode: str, engine: str):
+    if mode == 'mmap':
+        predictor = serving_artifacts.load(BACKEND_DIR, engine)
+        if predictor is None:
+            raise SystemExit("No up-to-date serving artifacts - run train_model.py first")
+        return predictor
+
+    import lookup_table
+    import tree_engine
+    model, breakdown_models, metadata = lookup_table.load_artifacts(BACKEND_DIR)
+    if engine == 'table':
+        return lookup_table.build_table(model, breakdown_models, metadata)
+    return tree_engine.from_models(model, breakdown_models)
+
+
+def worker(mode: str, engine: str, loaded, done, results):
+    predictor = load_predictor(mode, engine)
+
+    # Touch every page of the arrays like real traffic eventually would
+    for name in predictor.ARRAYS:
+        getattr(predictor, name).sum()
+
+    loaded.wait()
+    results.put((os.getpid(), serving_artifacts.process_memory()))
+    done.wait()
+
+
+def run(mode: str, engine: str, n_workers: int) -> list:
+    context = multiprocessing.get_context('spawn')
+    loaded = context.Barrier(n_workers + 1)
+    done = context.Barrier(n_workers + 1)
+    results = context.Queue()
+
+    processes = [context.Process(target=worker, args=(mode, engine, loaded, done, results))
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+
+    loaded.wait()
+    memory = [results.get() for _ in processes]
+    done.wait()
+    for process in processes:
+        process.join()
+
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--engine', choices=['table', 'numpy'], default='table')
+    args = parser.parse_args()
+
+    if not serving_artifacts.process_memory():
+        raise SystemExit("Needs /proc/self/smaps_rollup (Linux)")
+
+    print(f"{args.workers} workers, {args.engine} engine\n")
+    print(f"{'mode':>6} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}   (per worker, averaged)")
+    for mode in ('pickle', 'mmap'):
+        memory = [m for _, m in run(mode, args.engine, args.workers)]
+        average = {key: sum(m[key] for m in memory) / len(memory) / MB
+                   for key in ('rss_bytes', 'pss_bytes', 'uss_bytes')}
+        print(f"{mode:>6} {average['rss_bytes']:>9.1f} {average['pss_bytes']:>9.1f} "
+              f"{average['uss_bytes']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
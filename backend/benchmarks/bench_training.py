@@ -0,0 +1,109 @@
+"""
+Training pipeline benchmark - bench_training.py
+
+Runs the whole train_model.py pipeline (load CSV, encode, train every
+forest, save the artifacts and serving arrays) on synthetic datasets of a
+few sizes and reports the wall time for each. The synthetic rows are the
+real 70 rows resampled with a bit of noise, so the forests grow like they
+would on real data instead of on pure noise.
+
+Everything gets written to a temp folder - the models in backend/ aren't
+touched.
+
+Usage (from the backend folder):
+    python benchmarks/bench_training.py
+    python benchmarks/bench_training.py --sizes 1000 100000 --fused
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import train_model  # noqa: E402
+
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+COST_COLS = ['rent', 'food', 'transportation', 'utilities']
+
+# Relative noise added to every cost, so resampled rows aren't exact copies
+COST_NOISE = 0.05
+
+
+def synthetic_dataset(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """n_rows resampled from the real data, with the numbers jittered."""
+    source = pd.read_csv(os.path.join(train_model.DATA_DIR, 'cost_of_living_data.csv'))
+    rng = np.random.default_rng(seed)
+
+    df = source.iloc[rng.integers(len(source), size=n_rows)].reset_index(drop=True)
+    df['dining_frequency'] = np.clip(
+        df['dining_frequency'] + rng.integers(-1, 2, n_rows), 0, 15)
+    df['commute_miles'] = np.clip(
+        df['commute_miles'] + rng.normal(0, 2, n_rows), 0, 100).round(1)
+    for col in COST_COLS:
+        df[col] = (df[col] * rng.normal(1, COST_NOISE, n_rows)).round(2)
+    df['total_monthly_cost'] = df[COST_COLS].sum(axis=1)
+
+    return df
+
+
+def time_training(n_rows: int, fused: bool = False) -> float:
+    """Wall seconds for one train_model.main() run on n_rows synthetic rows."""
+    work_dir = tempfile.mkdtemp(prefix='livecost-bench-train-')
+    data_dir = os.path.join(work_dir, 'data')
+    model_dir = os.path.join(work_dir, 'models')
+    os.makedirs(data_dir)
+    os.makedirs(model_dir)
+    synthetic_dataset(n_rows).to_csv(os.path.join(data_dir, 'cost_of_living_data.csv'),
+                                     index=False)
+
+    real_data_dir = train_model.DATA_DIR
+    train_model.DATA_DIR = data_dir
+    try:
+        # train_model prints a full report every run - not useful here
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            train_model.main(fused=fused, model_dir=model_dir)
+            return time.perf_counter() - start
+    finally:
+        train_model.DATA_DIR = real_data_dir
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run(sizes: list, fused: bool = False, repeats: int = 1) -> list:
+    """Best-of-`repeats` training time for each dataset size."""
+    results = []
+    for size in sizes:
+        timings = [time_training(size, fused) for _ in range(repeats)]
+        results.append({'rows': size, 'fused': fused, 'runs': repeats,
+                        'seconds': min(timings)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[70, 1000, 10000, 100000])
+    parser.add_argument('--fused', action='store_true',
+                        help='train the fused multi-output model instead')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='train each size this many times and keep the fastest')
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'seconds':>9}")
+    for result in run(args.sizes, args.fused, args.repeats):
+        print(f"{result['rows']:>8} {result['seconds']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
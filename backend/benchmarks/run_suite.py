@@ -0,0 +1,224 @@
+"""
+Benchmark suite - run_suite.py
+
+Runs the /predict, database and training benchmarks, writes the results
+as JSON and compares them with a stored baseline. Exits with status 1 if
+anything got slower than its group's threshold allows, so it can gate a
+change:
+
+- predict:  /predict in-process through an ASGI client with a temp
+            DB_PATH (bench_concurrency.py) - p50/p95/p99, req/s and CPU
+            time per request at each concurrency level
+- database: get_query_statistics / get_recent_queries at 10k, 1M and 10M
+            synthetic rows (bench_database.py)
+- training: train_model.py wall time at a few dataset sizes
+            (bench_training.py)
+
+Baselines only mean something on the machine they were recorded on -
+save one before a change, then run again after it.
+
+Usage (from the backend folder):
+    python benchmarks/run_suite.py --save-baseline
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --only predict database --rows 10000 1000000
+    python benchmarks/run_suite.py --compare benchmarks/results/20251201-120000.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+SUITES = ('predict', 'database', 'training')
+
+# How much worse than the baseline a number can get before it counts as a
+# regression (0.25 = 25% slower, or 25% less throughput). The database
+# queries take tens of microseconds, so they get more room for noise.
+THRESHOLDS = {
+    'predict': 0.25,
+    'database': 0.5,
+    'training': 0.25
+}
+
+
+async def run_predict(levels: list, requests: int) -> list:
+    import bench_concurrency
+    async with bench_concurrency.make_client() as client:
+        return [result async for result in
+                bench_concurrency.run_levels(client, levels, requests)]
+
+
+def run_suites(args) -> dict:
+    results = {}
+    if 'predict' in args.only:
+        print("Running /predict benchmark...", file=sys.stderr)
+        results['predict'] = asyncio.run(run_predict(args.levels, args.requests))
+    if 'database' in args.only:
+        import bench_database
+        print("Running database benchmark...", file=sys.stderr)
+        results['database'] = bench_database.run(args.rows)
+    if 'training' in args.only:
+        import bench_training
+        print("Running training benchmark...", file=sys.stderr)
+        results['training'] = bench_training.run(args.train_sizes)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    """What the numbers were measured on - they don't compare across machines."""
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'engine': os.environ.get('LIVECOST_ENGINE', 'table')
+    }
+
+
+def flatten(results: dict) -> dict:
+    """
+    Every comparable number as name -> (group, value, higher_is_better).
+
+    Names are stable across runs (e.g. 'predict.c8.p95_ms',
+    'database.1000000.statistics.median_ms') so a baseline recorded with
+    more levels or sizes than the current run still lines up.
+    """
+    metrics = {}
+    for result in results.get('predict', []):
+        prefix = f"predict.c{result['concurrency']}"
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            metrics[f'{prefix}.{key}'] = ('predict', result[key], False)
+        metrics[f'{prefix}.throughput_rps'] = ('predict', result['throughput_rps'], True)
+        # Older results files don't have it
+        if 'cpu_ms_per_request' in result:
+            metrics[f'{prefix}.cpu_ms_per_request'] = ('predict', result['cpu_ms_per_request'], False)
+    for result in results.get('database', []):
+        metrics[f"database.{result['rows']}.{result['query']}.median_ms"] = (
+            'database', result['median_ms'], False)
+    for result in results.get('training', []):
+        model = 'fused' if result['fused'] else 'separate'
+        metrics[f"training.{result['rows']}.{model}.seconds"] = (
+            'training', result['seconds'], False)
+    return metrics
+
+
+def compare(current: dict, baseline: dict, thresholds: dict) -> list:
+    """
+    One row per metric in both runs: (name, baseline, current, change, regressed).
+
+    change is how much worse it got as a fraction (negative = better).
+    """
+    old = flatten(baseline['results'])
+    rows = []
+    for name, (group, value, higher_is_better) in flatten(current['results']).items():
+        if name not in old:
+            continue
+        before = old[name][1]
+        if before <= 0:
+            continue
+        change = (before - value) / before if higher_is_better else (value - before) / before
+        rows.append((name, before, value, change, change > thresholds[group]))
+    return rows
+
+
+def print_comparison(rows: list, thresholds: dict):
+    print(f"{'metric':<48} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, before, value, change, regressed in rows:
+        flag = '  REGRESSED' if regressed else ''
+        print(f"{name:<48} {before:>11.3f} {value:>11.3f} {change:>+7.1%}{flag}")
+
+    regressions = sum(1 for row in rows if row[4])
+    limits = ', '.join(f'{group} {limit:.0%}' for group, limit in thresholds.items())
+    print(f"\n{len(rows)} metrics compared, {regressions} regressed (thresholds: {limits})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--only', nargs='+', choices=SUITES, default=list(SUITES),
+                        help='which benchmarks to run (default: all)')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='/predict concurrency levels')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='/predict requests per concurrency level')
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[10_000, 1_000_000, 10_000_000],
+                        help='synthetic user_queries rows for the database benchmark')
+    parser.add_argument('--train-sizes', type=int, nargs='+', default=[70, 1000, 10000],
+                        help='dataset sizes for the training benchmark')
+    parser.add_argument('--output', help='where to write the results '
+                        '(default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='baseline to compare against (default: benchmarks/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save this run as the baseline instead of comparing')
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help='compare an earlier results file instead of running anything')
+    parser.add_argument('--threshold', type=float,
+                        help='one regression threshold for every group (e.g. 0.1 = 10%%)')
+    args = parser.parse_args()
+
+    thresholds = dict(THRESHOLDS)
+    if args.threshold is not None:
+        thresholds = {group: args.threshold for group in thresholds}
+
+    if args.compare:
+        with open(args.compare) as f:
+            current = json.load(f)
+    else:
+        parameters = {'only': args.only, 'levels': args.levels, 'requests': args.requests,
+                      'rows': args.rows, 'train_sizes': args.train_sizes}
+        current = {'environment': environment(), 'parameters': parameters,
+                   'results': run_suites(args)}
+
+        output = args.output or os.path.join(
+            RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to: {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} - run with --save-baseline first")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    print(f"\nBaseline from {baseline['environment']['created_at']} "
+          f"(commit {baseline['environment']['git_commit']})\n")
+    rows = compare(current, baseline, thresholds)
+    print_comparison(rows, thresholds)
+
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
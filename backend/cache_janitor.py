@@ -0,0 +1,171 @@
+"""
+LiveCost Cache Janitor - cache_janitor.py
+
+Background housekeeping for the api_cache table.
+
+cleanup_expired_cache() existed but nothing ever called it, so expired
+rows sat on disk until the same key happened to get written again, and
+nothing stopped the table from growing forever. The janitor runs every
+INTERVAL_SECONDS from the startup hook and on each sweep:
+
+1. Deletes expired entries, BATCH_ROWS at a time (each batch is its own
+   short transaction so /predict writes never wait long on the lock)
+2. If the table is still over MAX_ROWS or MAX_BYTES, evicts the oldest
+   entries until it fits
+3. Runs an incremental VACUUM so the freed pages actually leave the file
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional
+
+from database import (
+    delete_expired_cache_batch_async,
+    evict_oldest_cache_batch_async,
+    get_cache_size_async,
+    incremental_vacuum_async
+)
+
+# How often to sweep
+INTERVAL_SECONDS = 300
+
+# Rows per DELETE
+BATCH_ROWS = 500
+
+# Size caps - oldest entries get evicted past either one (0 = no cap)
+MAX_ROWS = 10000
+MAX_BYTES = 50 * 1024 * 1024
+
+
+class CacheJanitor:
+    """Periodically trims api_cache down to live entries within the size caps."""
+
+    def __init__(self, interval_seconds: float = INTERVAL_SECONDS,
+                 batch_rows: int = BATCH_ROWS,
+                 max_rows: int = MAX_ROWS,
+                 max_bytes: int = MAX_BYTES):
+        self.interval = interval_seconds
+        self.batch_rows = batch_rows
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        # Counters for stats()
+        self.sweeps = 0
+        self.sweep_errors = 0
+        self.expired_deleted = 0
+        self.evicted = 0
+        self.pages_vacuumed = 0
+        self.last_sweep: Dict[str, Any] = {}
+        self.total_sweep_ms = 0.0
+
+    async def start(self):
+        """Start sweeping in the background (call from the startup hook)."""
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task. A sweep in progress finishes first."""
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def _rows_over_cap(self, rows: int, total_bytes: int) -> int:
+        """How many of the oldest rows have to go to get under both caps."""
+        excess = 0
+        if self.max_rows and rows > self.max_rows:
+            excess = rows - self.max_rows
+        if self.max_bytes and total_bytes > self.max_bytes and rows:
+            # Rows vary in size, so this is an estimate - the loop in
+            # sweep() re-checks and goes again if it wasn't enough
+            average_row = total_bytes / rows
+            excess = max(excess, math.ceil((total_bytes - self.max_bytes) / average_row))
+        return excess
+
+    async def sweep(self) -> Dict[str, Any]:
+        """Run one full sweep now and return what it did."""
+        start = time.perf_counter()
+
+        expired = 0
+        while True:
+            deleted = await delete_expired_cache_batch_async(self.batch_rows)
+            expired += deleted
+            if deleted < self.batch_rows:
+                break
+
+        evicted = 0
+        while True:
+            rows, total_bytes = await get_cache_size_async()
+            excess = self._rows_over_cap(rows, total_bytes)
+            if excess <= 0:
+                break
+            deleted = await evict_oldest_cache_batch_async(min(excess, self.batch_rows))
+            evicted += deleted
+            if deleted == 0:
+                break
+
+        pages = 0
+        if expired or evicted:
+            pages = await incremental_vacuum_async()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.sweeps += 1
+        self.expired_deleted += expired
+        self.evicted += evicted
+        self.pages_vacuumed += pages
+        self.total_sweep_ms += elapsed_ms
+        self.last_sweep = {
+            'expired_deleted': expired,
+            'evicted': evicted,
+            'pages_vacuumed': pages,
+            'rows_left': rows,
+            'bytes_left': total_bytes,
+            'elapsed_ms': round(elapsed_ms, 3)
+        }
+
+        if expired or evicted:
+            print(f"Cache sweep: {expired} expired, {evicted} evicted, "
+                  f"{pages} pages freed in {elapsed_ms:.1f} ms")
+
+        return self.last_sweep
+
+    async def _run(self):
+        # Sweep right away so a backlog from before the restart gets cleared
+        while not self._stopping:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.sweep_errors += 1
+                print(f"Cache sweep failed ({e}) - will try again next interval")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals across sweeps plus what the last sweep did."""
+        return {
+            'interval_seconds': self.interval,
+            'max_rows': self.max_rows,
+            'max_bytes': self.max_bytes,
+            'sweeps': self.sweeps,
+            'sweep_errors': self.sweep_errors,
+            'expired_deleted': self.expired_deleted,
+            'evicted': self.evicted,
+            'pages_vacuumed': self.pages_vacuumed,
+            'avg_sweep_ms': round(self.total_sweep_ms / self.sweeps, 3) if self.sweeps else 0.0,
+            'last_sweep': self.last_sweep
+        }
@@ -18,8 +18,15 @@ Date: December 2025
 import sqlite3
 import json
 import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+# Async SQLite - runs each connection on its own thread so the FastAPI
+# event loop doesn't sit blocked while SQLite reads or syncs to disk
+import aiosqlite
 
 # Database file lives in the same folder as this script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,27 +36,412 @@ DB_PATH = os.path.join(SCRIPT_DIR, 'livecost.db')
 CACHE_EXPIRATION_HOURS = 24
 
 
+# ---- SQL ----
+# Shared by the sync and async functions below so they can't drift apart
+
+INSERT_USER_QUERY_SQL = '''
+    INSERT INTO user_queries
+    (city, apartment_size, dining_frequency, car_type, commute_miles,
+     predicted_cost, breakdown)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Same insert but with the id filled in - used by the write-behind logger,
+# which hands out ids from a reserved block (see reserve_query_ids_async)
+INSERT_USER_QUERY_WITH_ID_SQL = '''
+    INSERT INTO user_queries
+    (id, city, apartment_size, dining_frequency, car_type, commute_miles,
+     predicted_cost, breakdown)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# sqlite_sequence holds the last AUTOINCREMENT id per table. Bumping it
+# reserves a block of ids nobody else's insert will ever get.
+ENSURE_QUERY_SEQUENCE_SQL = '''
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'user_queries', COALESCE((SELECT MAX(id) FROM user_queries), 0)
+    WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'user_queries')
+'''
+
+SELECT_QUERY_SEQUENCE_SQL = "SELECT seq FROM sqlite_sequence WHERE name = 'user_queries'"
+
+BUMP_QUERY_SEQUENCE_SQL = "UPDATE sqlite_sequence SET seq = seq + ? WHERE name = 'user_queries'"
+
+SELECT_CACHED_RESPONSE_SQL = '''
+    SELECT response_data, expires_at FROM api_cache
+    WHERE cache_key = ? AND expires_at > ?
+'''
+
+UPSERT_CACHED_RESPONSE_SQL = '''
+    INSERT OR REPLACE INTO api_cache (cache_key, response_data, created_at, expires_at)
+    VALUES (?, ?, datetime('now'), ?)
+'''
+
+# Newest first, with id breaking ties between queries logged in the same
+# second. The timestamp indexes end in the rowid, so SQLite reads these
+# straight off the index in order - no scan, no sort. Paging uses the
+# last id seen as the cursor (keyset pagination), so page 10,000 costs
+# the same as page 1, unlike OFFSET.
+SELECT_RECENT_QUERIES_SQL = '''
+    SELECT * FROM user_queries
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+'''
+
+# Where the cursor row sits in that order. If the row isn't there any more
+# (pruned) or yet (an id the write-behind logger reserved but hasn't
+# flushed), the closest older id stands in for it - otherwise the
+# comparison is NULL and paging would just stop.
+CURSOR_TIMESTAMP_SQL = '''COALESCE(
+        (SELECT timestamp FROM user_queries WHERE id = ?),
+        (SELECT timestamp FROM user_queries WHERE id < ? ORDER BY id DESC LIMIT 1))'''
+
+SELECT_RECENT_QUERIES_AFTER_SQL = f'''
+    SELECT * FROM user_queries
+    WHERE (timestamp, id) < ({CURSOR_TIMESTAMP_SQL}, ?)
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+'''
+
+SELECT_RECENT_QUERIES_BY_CITY_SQL = '''
+    SELECT * FROM user_queries
+    WHERE city = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+'''
+
+SELECT_RECENT_QUERIES_BY_CITY_AFTER_SQL = f'''
+    SELECT * FROM user_queries
+    WHERE city = ?
+      AND (timestamp, id) < ({CURSOR_TIMESTAMP_SQL}, ?)
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+'''
+
+# ---- api_cache housekeeping (see cache_janitor.py) ----
+# expires_at is written by Python (_cache_expiry), so it has to be compared
+# against a Python timestamp too, here and in SELECT_CACHED_RESPONSE_SQL.
+# SQLite's datetime('now') is UTC and uses a space instead of the 'T', so
+# string comparisons against it were wrong.
+DELETE_EXPIRED_CACHE_SQL = 'DELETE FROM api_cache WHERE expires_at < ?'
+
+# Small batches so no single delete holds the write lock for long
+DELETE_EXPIRED_CACHE_BATCH_SQL = '''
+    DELETE FROM api_cache
+    WHERE id IN (
+        SELECT id FROM api_cache
+        WHERE expires_at < ?
+        ORDER BY expires_at
+        LIMIT ?
+    )
+'''
+
+# INSERT OR REPLACE gives a rewritten entry a new id, so lowest id is the
+# entry that was written longest ago
+DELETE_OLDEST_CACHE_BATCH_SQL = '''
+    DELETE FROM api_cache
+    WHERE id IN (
+        SELECT id FROM api_cache
+        ORDER BY id
+        LIMIT ?
+    )
+'''
+
+CACHE_SIZE_SQL = '''
+    SELECT COUNT(*) as row_count,
+           COALESCE(SUM(LENGTH(cache_key) + LENGTH(response_data)), 0) as total_bytes
+    FROM api_cache
+'''
+
+# /statistics reads the running totals in query_stats (kept up to date by
+# triggers on user_queries) instead of scanning every query ever logged
+SELECT_QUERY_STATS_SQL = '''
+    SELECT city, query_count, cost_sum
+    FROM query_stats
+    WHERE query_count > 0
+    ORDER BY query_count DESC
+'''
+
+SELECT_ALL_QUERY_STATS_SQL = 'SELECT city, query_count, cost_sum FROM query_stats'
+
+# The full scan the triggers save us from - only used to (re)build query_stats
+AGGREGATE_QUERY_STATS_SQL = '''
+    SELECT city, COUNT(*) as query_count, SUM(predicted_cost) as cost_sum
+    FROM user_queries
+    GROUP BY city
+'''
+
+REBUILD_QUERY_STATS_SQL = '''
+    INSERT INTO query_stats (city, query_count, cost_sum)
+    SELECT city, COUNT(*), SUM(predicted_cost)
+    FROM user_queries
+    GROUP BY city
+'''
+
+# Every path that writes user_queries (single inserts, batches, the
+# write-behind logger's executemany) goes through these, in the same
+# transaction as the insert itself
+QUERY_STATS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_queries_stats_insert
+    AFTER INSERT ON user_queries
+    BEGIN
+        INSERT INTO query_stats (city, query_count, cost_sum)
+        VALUES (NEW.city, 1, NEW.predicted_cost)
+        ON CONFLICT(city) DO UPDATE SET
+            query_count = query_count + 1,
+            cost_sum = cost_sum + excluded.cost_sum;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_queries_stats_delete
+    AFTER DELETE ON user_queries
+    BEGIN
+        UPDATE query_stats
+        SET query_count = query_count - 1,
+            cost_sum = cost_sum - OLD.predicted_cost
+        WHERE city = OLD.city;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_queries_stats_update
+    AFTER UPDATE OF city, predicted_cost ON user_queries
+    BEGIN
+        UPDATE query_stats
+        SET query_count = query_count - 1,
+            cost_sum = cost_sum - OLD.predicted_cost
+        WHERE city = OLD.city;
+
+        INSERT INTO query_stats (city, query_count, cost_sum)
+        VALUES (NEW.city, 1, NEW.predicted_cost)
+        ON CONFLICT(city) DO UPDATE SET
+            query_count = query_count + 1,
+            cost_sum = cost_sum + excluded.cost_sum;
+    END
+    '''
+]
+
+# user_queries write counter, so /statistics can tell whether anything
+# changed without reading the totals. `generation` is random per database
+# file, so a fresh livecost.db starting back at 0 writes can't look like
+# an old one.
+CREATE_QUERY_WRITES_SQL = '''
+    CREATE TABLE IF NOT EXISTS query_writes (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        generation TEXT NOT NULL,
+        writes INTEGER NOT NULL DEFAULT 0,
+        updated_at INTEGER NOT NULL
+    )
+'''
+
+INIT_QUERY_WRITES_SQL = '''
+    INSERT OR IGNORE INTO query_writes (id, generation, writes, updated_at)
+    VALUES (1, lower(hex(randomblob(8))), 0, CAST(strftime('%s', 'now') AS INTEGER))
+'''
+
+BUMP_QUERY_WRITES_SQL = '''
+    UPDATE query_writes
+    SET writes = writes + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    WHERE id = 1
+'''
+
+SELECT_QUERY_WRITES_SQL = '''
+    SELECT generation, writes, updated_at FROM query_writes WHERE id = 1
+'''
+
+# Same deal as QUERY_STATS_TRIGGERS - every write path bumps the counter
+# in the insert's own transaction
+QUERY_WRITES_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS user_queries_writes_{event.lower()}
+    AFTER {event} ON user_queries
+    BEGIN
+        {BUMP_QUERY_WRITES_SQL};
+    END
+    '''
+    for event in ('INSERT', 'DELETE', 'UPDATE')
+]
+
+# cost_sum is a float that gets added to (and maybe subtracted from) one
+# row at a time, so it won't exactly match a fresh SUM() - only report
+# drift bigger than rounding
+COST_SUM_TOLERANCE = 1e-6
+
+
+SELECT_PREDICTION_RESULT_SQL = '''
+    SELECT total_cost, rent, food, transportation, utilities
+    FROM prediction_results
+    WHERE query_hash = ?
+'''
+
+INSERT_PREDICTION_RESULT_SQL = '''
+    INSERT OR IGNORE INTO prediction_results
+    (query_hash, city, total_cost, rent, food, transportation, utilities, model_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+DELETE_STALE_PREDICTION_RESULTS_SQL = '''
+    DELETE FROM prediction_results
+    WHERE model_version IS NULL OR model_version != ?
+'''
+
+
+def _query_params(query: Dict[str, Any]) -> tuple:
+    """Parameters for INSERT_USER_QUERY_SQL from a save_user_query-style dict."""
+    return (
+        query['city'],
+        query['apartment_size'],
+        query['dining_frequency'],
+        query['car_type'],
+        query['commute_miles'],
+        query['predicted_cost'],
+        json.dumps(query['breakdown'])
+    )
+
+
+def seconds_until_expiry(expires_at: str) -> float:
+    """How long until an api_cache expires_at timestamp passes."""
+    return (datetime.fromisoformat(expires_at) - datetime.now()).total_seconds()
+
+
+def _query_params_with_id(query_id: int, query: Dict[str, Any]) -> tuple:
+    """Parameters for INSERT_USER_QUERY_WITH_ID_SQL."""
+    return (query_id,) + _query_params(query)
+
+
+def _recent_queries_query(limit: int, after: Optional[int],
+                          city: Optional[str]) -> Tuple[str, tuple]:
+    """Pick the recent-queries statement (and its parameters) for a page."""
+    if city is None and after is None:
+        return SELECT_RECENT_QUERIES_SQL, (limit,)
+    if city is None:
+        return SELECT_RECENT_QUERIES_AFTER_SQL, (after, after, after, limit)
+    if after is None:
+        return SELECT_RECENT_QUERIES_BY_CITY_SQL, (city, limit)
+    return SELECT_RECENT_QUERIES_BY_CITY_AFTER_SQL, (city, after, after, after, limit)
+
+
+def _cache_expiry() -> str:
+    """Expiry timestamp for a cache entry written right now."""
+    expires_at = datetime.now() + timedelta(hours=CACHE_EXPIRATION_HOURS)
+    return expires_at.isoformat()
+
+
+# ---- Connection settings ----
+# Opening a connection was a visible chunk of every request, so connections
+# are long-lived now: one per thread for the sync functions and a small
+# pool for the async ones. These get applied to every connection we open.
+CONNECTION_PRAGMAS = [
+    'PRAGMA busy_timeout = 5000',      # wait up to 5s for a lock instead of failing
+    'PRAGMA synchronous = NORMAL',     # safe with WAL, skips an fsync per commit
+    'PRAGMA cache_size = -16000',      # 16 MB page cache (negative = KB)
+    'PRAGMA mmap_size = 268435456',    # read the file through a 256 MB memory map
+    'PRAGMA temp_store = MEMORY',
+]
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Max aiosqlite connections (each one is its own thread). SQLite only
+# allows one writer at a time anyway, so more than a few doesn't help.
+ASYNC_POOL_SIZE = 4
+
+_local = threading.local()
+_open_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+def _configure_connection(conn):
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
 def get_connection():
     """
-    Get a database connection.
+    Get this thread's database connection.
 
     Using row_factory=sqlite3.Row so we can access columns by name
     instead of index. Way easier to work with.
+
+    Each thread keeps one connection open and reuses it instead of
+    connecting on every call. A new one gets opened if DB_PATH changes
+    or close_connections() was called.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DB_PATH and _local.generation == _generation:
+        return conn
+
+    # check_same_thread=False only so close_connections() can close it
+    # from the main thread - it's still only ever used by its own thread
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
+
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.generation = _generation
+    with _connections_lock:
+        _open_connections.append(conn)
+
     return conn
 
 
+def release_connection(conn):
+    """
+    Done with a connection from get_connection().
+
+    It stays open for the next call - this just makes sure nothing is
+    left half-done in a transaction if a function bailed out early.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+
+
+def close_connections():
+    """Close every pooled sync connection (server shutdown, tests)."""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _open_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _open_connections.clear()
+
+
 def init_database():
     """
     Create the database tables if they don't exist.
 
     Safe to call multiple times - IF NOT EXISTS prevents errors.
+
+    Also switches the database to WAL mode. It's saved in the file so it
+    only has to happen once, and it lets readers (like /statistics) run
+    while a prediction is being written instead of waiting on each other.
+
+    Same for auto_vacuum = INCREMENTAL, which lets the cache janitor give
+    freed pages back to the disk a few at a time. A brand new database
+    gets it for free. Older ones need a full VACUUM to switch over, which
+    rewrites the whole file under an exclusive lock - way too much for
+    every worker's startup, so that's a separate command
+    (python database.py --incremental-vacuum).
     """
     conn = get_connection()
     cursor = conn.cursor()
 
+    if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        if cursor.execute('PRAGMA page_count').fetchone()[0] == 0:
+            # Nothing written yet, so it just takes effect
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        else:
+            print("Incremental vacuum is off for this database - the cache janitor "
+                  "can't shrink the file until `python database.py --incremental-vacuum` "
+                  "has been run once")
+
+    cursor.execute('PRAGMA journal_mode = WAL')
+
     # Table for storing every prediction request
     # Good for analytics and could be used for a history feature
     cursor.execute('''
@@ -78,7 +470,8 @@ def init_database():
         )
     ''')
 
-    # Detailed prediction results (could use for deeper analysis)
+    # Detailed prediction results - doubles as the persistent memo of
+    # model outputs, keyed on a hash of the model inputs + model version
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS prediction_results (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -89,16 +482,114 @@ def init_database():
             food REAL NOT NULL,
             transportation REAL NOT NULL,
             utilities REAL NOT NULL,
+            model_version TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
 
+    # Older databases have prediction_results without model_version
+    columns = [row['name'] for row in cursor.execute('PRAGMA table_info(prediction_results)')]
+    if 'model_version' not in columns:
+        cursor.execute('ALTER TABLE prediction_results ADD COLUMN model_version TEXT')
+
+    # Memo lookups go by query_hash, so it needs an index (unique, since
+    # the same inputs + model always give the same outputs)
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_prediction_results_query_hash
+        ON prediction_results(query_hash)
+    ''')
+
+    # Indexes for the history view (newest first, optionally per city) and
+    # for clearing out expired cache entries. IF NOT EXISTS means older
+    # databases just pick them up the next time the server starts.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_queries_timestamp
+        ON user_queries(timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_queries_city_timestamp
+        ON user_queries(city, timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_api_cache_expires_at
+        ON api_cache(expires_at)
+    ''')
+
     conn.commit()
-    conn.close()
+
+    _create_query_stats(cursor)
+
+    conn.commit()
+
+    _create_query_writes(cursor)
+
+    conn.commit()
+    release_connection(conn)
 
     print(f"Database initialized at: {DB_PATH}")
 
 
+def enable_incremental_vacuum() -> bool:
+    """
+    Switch an existing database to auto_vacuum = INCREMENTAL.
+
+    Runs a full VACUUM, which rewrites the whole file and holds an
+    exclusive lock until it's done - run it with the server stopped.
+    Returns False if it was already on.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        release_connection(conn)
+        return False
+
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    cursor.execute('VACUUM')
+    release_connection(conn)
+    return True
+
+
+def _create_query_stats(cursor):
+    """
+    Set up the query_stats summary table and the triggers that maintain it.
+
+    Runs in one write transaction, so if the table is new and there are
+    already queries logged, nothing can get inserted between the backfill
+    and the triggers going live.
+    """
+    cursor.execute('BEGIN IMMEDIATE')
+
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'query_stats'"
+    ).fetchone()
+
+    # Running totals per city - total count and average are just sums of these
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS query_stats (
+            city TEXT PRIMARY KEY,
+            query_count INTEGER NOT NULL DEFAULT 0,
+            cost_sum REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+    for trigger_sql in QUERY_STATS_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+    # Databases from before query_stats existed need one full scan
+    if not exists:
+        cursor.execute(REBUILD_QUERY_STATS_SQL)
+
+
+def _create_query_writes(cursor):
+    """Set up the query_writes counter row and the triggers that bump it."""
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(CREATE_QUERY_WRITES_SQL)
+    cursor.execute(INIT_QUERY_WRITES_SQL)
+    for trigger_sql in QUERY_WRITES_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+
 def save_user_query(
     city: str,
     apartment_size: str,
@@ -118,12 +609,7 @@ def save_user_query(
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        INSERT INTO user_queries
-        (city, apartment_size, dining_frequency, car_type, commute_miles,
-         predicted_cost, breakdown)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    cursor.execute(INSERT_USER_QUERY_SQL, (
         city,
         apartment_size,
         dining_frequency,
@@ -136,11 +622,34 @@ def save_user_query(
     query_id = cursor.lastrowid
 
     conn.commit()
-    conn.close()
+    release_connection(conn)
 
     return query_id
 
 
+def save_user_queries(queries: List[Dict[str, Any]]) -> List[int]:
+    """
+    Save a whole batch of prediction queries in one transaction.
+
+    Each dict has the same fields as save_user_query's arguments.
+    One connection and one commit for the batch instead of one per
+    row - commit() is the expensive part since it syncs to disk.
+    Returns the query IDs in the same order as the input.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    query_ids = []
+    for query in queries:
+        cursor.execute(INSERT_USER_QUERY_SQL, _query_params(query))
+        query_ids.append(cursor.lastrowid)
+
+    conn.commit()
+    release_connection(conn)
+
+    return query_ids
+
+
 def get_cached_api_response(cache_key: str) -> Optional[Dict[str, Any]]:
     """
     Check if we have a cached response for this key.
@@ -150,13 +659,10 @@ def get_cached_api_response(cache_key: str) -> Optional[Dict[str, Any]]:
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT response_data, expires_at FROM api_cache
-        WHERE cache_key = ? AND expires_at > datetime('now')
-    ''', (cache_key,))
+    cursor.execute(SELECT_CACHED_RESPONSE_SQL, (cache_key, datetime.now().isoformat()))
 
     row = cursor.fetchone()
-    conn.close()
+    release_connection(conn)
 
     if row:
         return json.loads(row['response_data'])
@@ -173,92 +679,439 @@ def cache_api_response(cache_key: str, response_data: Dict[str, Any]):
     conn = get_connection()
     cursor = conn.cursor()
 
-    expires_at = datetime.now() + timedelta(hours=CACHE_EXPIRATION_HOURS)
-
-    cursor.execute('''
-        INSERT OR REPLACE INTO api_cache (cache_key, response_data, created_at, expires_at)
-        VALUES (?, ?, datetime('now'), ?)
-    ''', (cache_key, json.dumps(response_data), expires_at.isoformat()))
+    cursor.execute(UPSERT_CACHED_RESPONSE_SQL,
+                   (cache_key, json.dumps(response_data), _cache_expiry()))
 
     conn.commit()
-    conn.close()
+    release_connection(conn)
 
 
-def get_recent_queries(limit: int = 10) -> list:
-    """Get the most recent prediction queries."""
+def get_recent_queries(limit: int = 10, after: Optional[int] = None,
+                       city: Optional[str] = None) -> list:
+    """
+    Get the most recent prediction queries, newest first.
+
+    For the next page pass the id of the last query you got as `after`.
+    `city` only returns queries for that city.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT * FROM user_queries
-        ORDER BY timestamp DESC
-        LIMIT ?
-    ''', (limit,))
+    cursor.execute(*_recent_queries_query(limit, after, city))
 
     rows = cursor.fetchall()
-    conn.close()
+    release_connection(conn)
 
     return [dict(row) for row in rows]
 
 
+def _summarize_query_stats(rows) -> Dict[str, Any]:
+    """Build the /statistics response from query_stats rows."""
+    queries_by_city = {row['city']: row['query_count'] for row in rows}
+    total_queries = sum(queries_by_city.values())
+    cost_sum = sum(row['cost_sum'] for row in rows)
+    avg_cost = cost_sum / total_queries if total_queries else 0
+
+    return {
+        'total_queries': total_queries,
+        'queries_by_city': queries_by_city,
+        'average_predicted_cost': round(avg_cost, 2)
+    }
+
+
 def get_query_statistics() -> Dict[str, Any]:
     """
     Get aggregate stats from stored queries.
 
     Useful for an analytics dashboard or understanding usage patterns.
+    Reads the per-city running totals, so it costs the same whether
+    there are 10 queries logged or 10 million.
     """
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Total queries
-    cursor.execute('SELECT COUNT(*) as count FROM user_queries')
-    total_queries = cursor.fetchone()['count']
+    cursor.execute(SELECT_QUERY_STATS_SQL)
+    rows = cursor.fetchall()
 
-    # Queries by city
-    cursor.execute('''
-        SELECT city, COUNT(*) as count
-        FROM user_queries
-        GROUP BY city
-        ORDER BY count DESC
-    ''')
-    queries_by_city = {row['city']: row['count'] for row in cursor.fetchall()}
+    release_connection(conn)
+
+    return _summarize_query_stats(rows)
 
-    # Average cost
-    cursor.execute('SELECT AVG(predicted_cost) as avg_cost FROM user_queries')
-    avg_cost = cursor.fetchone()['avg_cost'] or 0
 
-    conn.close()
+def rebuild_query_stats() -> Dict[str, Any]:
+    """
+    Recompute query_stats from scratch and report any drift.
+
+    The triggers should keep it exact, but if someone edits user_queries
+    with the triggers dropped (or restores an old backup) this puts it
+    right. Returns the new totals plus every city whose stored numbers
+    didn't match.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Hold the write lock so no inserts land between reading and replacing
+    cursor.execute('BEGIN IMMEDIATE')
+
+    stored = {row['city']: (row['query_count'], row['cost_sum'])
+              for row in cursor.execute(SELECT_ALL_QUERY_STATS_SQL)}
+    actual = {row['city']: (row['query_count'], row['cost_sum'])
+              for row in cursor.execute(AGGREGATE_QUERY_STATS_SQL)}
+
+    drift = {}
+    for city in sorted(set(stored) | set(actual)):
+        stored_count, stored_sum = stored.get(city, (0, 0.0))
+        actual_count, actual_sum = actual.get(city, (0, 0.0))
+        sum_off = abs(stored_sum - actual_sum) > COST_SUM_TOLERANCE * max(1.0, abs(actual_sum))
+        if stored_count != actual_count or sum_off:
+            drift[city] = {
+                'stored_count': stored_count,
+                'actual_count': actual_count,
+                'stored_cost_sum': stored_sum,
+                'actual_cost_sum': actual_sum
+            }
+
+    cursor.execute('DELETE FROM query_stats')
+    cursor.execute(REBUILD_QUERY_STATS_SQL)
+
+    # The totals may have just changed without a user_queries write
+    cursor.execute(BUMP_QUERY_WRITES_SQL)
+
+    conn.commit()
+    release_connection(conn)
 
     return {
-        'total_queries': total_queries,
-        'queries_by_city': queries_by_city,
-        'average_predicted_cost': round(avg_cost, 2)
+        'cities': len(actual),
+        'total_queries': sum(count for count, _ in actual.values()),
+        'drift': drift
     }
 
 
+def purge_stale_prediction_results(model_version: str) -> int:
+    """
+    Delete memoized predictions that came from a different model.
+
+    Called whenever models get loaded - results from old artifacts would
+    be wrong for the new ones. Returns how many rows were removed.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(DELETE_STALE_PREDICTION_RESULTS_SQL, (model_version,))
+    deleted_count = cursor.rowcount
+
+    conn.commit()
+    release_connection(conn)
+
+    return deleted_count
+
+
 def cleanup_expired_cache():
     """
     Delete old cache entries.
 
-    Could run this on a schedule or when the cache gets too big.
+    Deletes everything expired in one go - the server uses the
+    CacheJanitor instead, which works in small batches.
     """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        DELETE FROM api_cache
-        WHERE expires_at < datetime('now')
-    ''')
+    cursor.execute(DELETE_EXPIRED_CACHE_SQL, (datetime.now().isoformat(),))
 
     deleted_count = cursor.rowcount
 
     conn.commit()
-    conn.close()
+    release_connection(conn)
 
     return deleted_count
 
 
+# ---- Async versions ----
+# The FastAPI endpoints are async, and calling the sqlite3 functions above
+# from them blocks the whole event loop while SQLite works (including the
+# disk sync on every commit) - so uvicorn ends up serving one request at a
+# time. These run the same SQL through a pool of aiosqlite connections.
+
+class AsyncConnectionPool:
+    """
+    A few long-lived aiosqlite connections shared by the async functions.
+
+    Each aiosqlite connection is a thread with its own sqlite3
+    connection, so opening one per query meant spinning up a thread per
+    query too. Callers borrow a connection with `async with
+    pool.connection()` and hand it back when they're done.
+    """
+
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[aiosqlite.Connection] = []
+        self._all: List[aiosqlite.Connection] = []
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = aiosqlite.connect(self.db_path)
+        # Daemon thread so a pool nobody closed can't keep the process alive
+        conn.daemon = True
+        await conn
+        conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        self._all.append(conn)
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._open()
+            try:
+                yield conn
+            finally:
+                # Same idea as release_connection() - never hand back a
+                # connection that's stuck in a transaction
+                if conn.in_transaction:
+                    await conn.rollback()
+                self._idle.append(conn)
+
+    async def close(self):
+        for conn in self._all:
+            await conn.close()
+        self._all.clear()
+        self._idle.clear()
+
+
+_async_pool: Optional[AsyncConnectionPool] = None
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    """The async pool for the running event loop (made on first use)."""
+    global _async_pool
+    loop = asyncio.get_running_loop()
+    if _async_pool is None or _async_pool.loop is not loop or _async_pool.db_path != DB_PATH:
+        _async_pool = AsyncConnectionPool(DB_PATH, ASYNC_POOL_SIZE)
+    return _async_pool
+
+
+async def close_async_pool():
+    """Close the async pool's connections (server shutdown)."""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+async def save_user_queries_async(queries: List[Dict[str, Any]]) -> List[int]:
+    """Async version of save_user_queries() - one transaction for the batch."""
+    async with get_async_pool().connection() as conn:
+        query_ids = []
+        for query in queries:
+            cursor = await conn.execute(INSERT_USER_QUERY_SQL, _query_params(query))
+            query_ids.append(cursor.lastrowid)
+        await conn.commit()
+
+    return query_ids
+
+
+async def reserve_query_ids_async(count: int) -> int:
+    """
+    Reserve `count` user_queries ids and return the first one.
+
+    The write-behind logger uses this so it can give out query ids right
+    away without waiting for the row to actually be written. BEGIN
+    IMMEDIATE takes the write lock up front so two processes can't grab
+    the same block.
+    """
+    async with get_async_pool().connection() as conn:
+        await conn.execute('BEGIN IMMEDIATE')
+        await conn.execute(ENSURE_QUERY_SEQUENCE_SQL)
+        cursor = await conn.execute(SELECT_QUERY_SEQUENCE_SQL)
+        last_id = (await cursor.fetchone())['seq']
+        await conn.execute(BUMP_QUERY_SEQUENCE_SQL, (count,))
+        await conn.commit()
+
+    return last_id + 1
+
+
+async def insert_user_queries_async(rows: List[tuple]) -> None:
+    """
+    Write already-numbered queries in one transaction.
+
+    rows are (query_id, query_dict) pairs with ids from
+    reserve_query_ids_async(). One executemany and one commit no matter
+    how many rows.
+    """
+    async with get_async_pool().connection() as conn:
+        await conn.executemany(
+            INSERT_USER_QUERY_WITH_ID_SQL,
+            [_query_params_with_id(query_id, query) for query_id, query in rows]
+        )
+        await conn.commit()
+
+
+async def get_cached_api_entry_async(cache_key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """
+    Like get_cached_api_response_async() but also returns expires_at.
+
+    The in-memory cache in front of this uses it so its copy expires at
+    the same time as the SQLite one.
+    """
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(SELECT_CACHED_RESPONSE_SQL,
+                                    (cache_key, datetime.now().isoformat()))
+        row = await cursor.fetchone()
+
+    if row:
+        return json.loads(row['response_data']), row['expires_at']
+
+    return None
+
+
+async def get_cached_api_response_async(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Async version of get_cached_api_response()."""
+    entry = await get_cached_api_entry_async(cache_key)
+    return entry[0] if entry else None
+
+
+async def cache_api_response_async(cache_key: str, response_data: Dict[str, Any]) -> str:
+    """Async version of cache_api_response(). Returns the expires_at it stored."""
+    expires_at = _cache_expiry()
+    async with get_async_pool().connection() as conn:
+        await conn.execute(UPSERT_CACHED_RESPONSE_SQL,
+                           (cache_key, json.dumps(response_data), expires_at))
+        await conn.commit()
+
+    return expires_at
+
+
+async def get_prediction_result_async(query_hash: str) -> Optional[Tuple[float, ...]]:
+    """Memoized (total, rent, food, transportation, utilities) for a query hash."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(SELECT_PREDICTION_RESULT_SQL, (query_hash,))
+        row = await cursor.fetchone()
+
+    return tuple(row) if row else None
+
+
+async def save_prediction_result_async(query_hash: str, city: str,
+                                       outputs: Tuple[float, ...], model_version: str):
+    """Memoize the model outputs for a query hash (first write wins)."""
+    async with get_async_pool().connection() as conn:
+        await conn.execute(INSERT_PREDICTION_RESULT_SQL,
+                           (query_hash, city, *outputs, model_version))
+        await conn.commit()
+
+
+async def delete_expired_cache_batch_async(limit: int) -> int:
+    """Delete up to `limit` expired api_cache rows. Returns how many went."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(DELETE_EXPIRED_CACHE_BATCH_SQL,
+                                    (datetime.now().isoformat(), limit))
+        deleted_count = cursor.rowcount
+        await conn.commit()
+
+    return deleted_count
+
+
+async def evict_oldest_cache_batch_async(limit: int) -> int:
+    """Delete the `limit` oldest api_cache rows, expired or not."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(DELETE_OLDEST_CACHE_BATCH_SQL, (limit,))
+        deleted_count = cursor.rowcount
+        await conn.commit()
+
+    return deleted_count
+
+
+async def get_cache_size_async() -> Tuple[int, int]:
+    """(rows, bytes of keys + JSON) currently in api_cache."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(CACHE_SIZE_SQL)
+        row = await cursor.fetchone()
+
+    return row['row_count'], row['total_bytes']
+
+
+async def incremental_vacuum_async(max_pages: int = 0) -> int:
+    """
+    Hand free pages back to the filesystem (0 = all of them).
+
+    Returns how many pages were released.
+    """
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute('PRAGMA freelist_count')
+        free_before = (await cursor.fetchone())[0]
+
+        # incremental_vacuum frees one page per step, and execute() only
+        # steps it once - executescript() runs it to the end
+        await conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)});')
+
+        cursor = await conn.execute('PRAGMA freelist_count')
+        free_after = (await cursor.fetchone())[0]
+
+    return free_before - free_after
+
+
+async def get_recent_queries_async(limit: int = 10, after: Optional[int] = None,
+                                   city: Optional[str] = None) -> list:
+    """Async version of get_recent_queries()."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(*_recent_queries_query(limit, after, city))
+        rows = await cursor.fetchall()
+
+    return [dict(row) for row in rows]
+
+
+async def get_query_statistics_async() -> Dict[str, Any]:
+    """Async version of get_query_statistics()."""
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(SELECT_QUERY_STATS_SQL)
+        rows = await cursor.fetchall()
+
+    return _summarize_query_stats(rows)
+
+
+async def get_query_writes_async() -> Tuple[str, int, int]:
+    """
+    (generation, writes, updated_at) from the user_queries write counter.
+
+    writes goes up with every insert, delete or update, and updated_at is
+    the unix time of the last one.
+    """
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(SELECT_QUERY_WRITES_SQL)
+        row = await cursor.fetchone()
+
+    return row['generation'], row['writes'], row['updated_at']
+
+
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Set up the LiveCost database')
+    parser.add_argument('--rebuild-stats', action='store_true',
+                        help='recompute the /statistics totals from user_queries')
+    parser.add_argument('--incremental-vacuum', action='store_true',
+                        help='switch an existing database to incremental vacuum '
+                             '(full VACUUM - stop the server first)')
+    args = parser.parse_args()
+
     # Run this directly to set up the database
     init_database()
     print("Database setup complete!")
+
+    if args.rebuild_stats:
+        result = rebuild_query_stats()
+        print(f"Rebuilt stats for {result['cities']} cities "
+              f"({result['total_queries']} queries)")
+        if result['drift']:
+            print("Drift found:")
+            for city, numbers in result['drift'].items():
+                print(f"  {city}: {numbers}")
+        else:
+            print("No drift - stored stats matched")
+
+    if args.incremental_vacuum:
+        if enable_incremental_vacuum():
+            print("Switched to incremental vacuum")
+        else:
+            print("Incremental vacuum was already on")
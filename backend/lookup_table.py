@@ -0,0 +1,312 @@
+"""
+LiveCost Prediction Lookup Table - lookup_table.py
+
+Precomputes every prediction the models can possibly make so /predict
+can answer with an array index instead of running five forests.
+
+This works because almost all of our inputs are discrete:
+- 10 cities, 4 apartment sizes, 4 car types
+- dining_frequency is an int from 0 to 15
+- commute_miles is the only continuous one (0-100)
+
+A random forest is piecewise-constant along commute_miles - the output
+only changes when the value crosses one of the split thresholds some
+tree learned. So if we collect every commute threshold from every tree,
+each gap between two thresholds gives exactly one output per combo of
+the discrete inputs. That's ~36 gaps * 2560 combos, which is tiny.
+
+The table gets saved with the other serving artifacts (see
+serving_artifacts.py) whenever train_model.py runs.
+
+Usage:
+    python lookup_table.py           # build the table and print its stats
+    python lookup_table.py --verify  # check the saved table against model.predict
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from tree_engine import SklearnEnsemble, model_forests
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The files the table is derived from - if any of these change the
+# table is stale and has to be rebuilt
+ARTIFACT_FILES = ['livecost_model.pkl', 'breakdown_models.pkl',
+                  'livecost_fused_model.pkl', 'model_metadata.json']
+
+# Column positions in the feature matrix (same order as training)
+COMMUTE_FEATURE = 4
+
+# dining_frequency is validated to 0-15 in PredictionRequest
+DINING_VALUES = np.arange(16)
+
+
+def artifact_signature(model_dir: str = SCRIPT_DIR) -> str:
+    """Hash the model artifacts so we can tell when the table is stale."""
+    digest = hashlib.sha256()
+    for filename in ARTIFACT_FILES:
+        path = os.path.join(model_dir, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def sklearn_outputs(model, breakdown_models: Optional[Dict],
+                    features: np.ndarray) -> np.ndarray:
+    """Total plus each breakdown category, straight from sklearn (N x 5)."""
+    return SklearnEnsemble(model, breakdown_models).predict(features)
+
+
+def collect_commute_thresholds(forests: List) -> np.ndarray:
+    """
+    Every split threshold on commute_miles across every tree, sorted.
+
+    Two thresholds can land closer together than one float32 step (bigger
+    training sets make this pretty likely). No float32 fits between them,
+    so after sklearn's cast no input can ever fall in that gap - we keep
+    just the first one so every gap in the table can actually be reached.
+    """
+    thresholds = set()
+    for forest in forests:
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            thresholds.update(tree.threshold[tree.feature == COMMUTE_FEATURE].tolist())
+
+    kept = []
+    for threshold in sorted(thresholds):
+        if kept and float(largest_float32_at_most(threshold)) <= kept[-1]:
+            continue
+        kept.append(threshold)
+    return np.array(kept, dtype=np.float64)
+
+
+def largest_float32_at_most(value: float) -> np.float32:
+    rep = np.float32(value)
+    if float(rep) > value:
+        rep = np.nextafter(rep, np.float32(-np.inf))
+    return rep
+
+
+def commute_key(commute_miles: np.ndarray) -> np.ndarray:
+    """
+    Round commute_miles the same way sklearn does before comparing.
+
+    sklearn casts X to float32 and then checks `x <= threshold` against
+    float64 thresholds, so we have to do the same cast or values right
+    next to a threshold can land in the wrong gap.
+    """
+    return np.asarray(commute_miles, dtype=np.float32).astype(np.float64)
+
+
+def commute_representatives(thresholds: np.ndarray) -> np.ndarray:
+    """
+    Pick one commute value inside each gap between thresholds.
+
+    Gap i is (t[i-1], t[i]] since the trees send `x <= t` left. Using the
+    biggest float32 that's still <= t[i] keeps the pick inside the gap
+    after sklearn's float32 cast. The last gap is everything above the
+    biggest threshold.
+    """
+    reps = np.empty(len(thresholds) + 1, dtype=np.float64)
+
+    for i, threshold in enumerate(thresholds):
+        reps[i] = float(largest_float32_at_most(threshold))
+
+    if len(thresholds):
+        rep = np.float32(thresholds[-1])
+        while float(rep) <= thresholds[-1]:
+            rep = np.nextafter(rep, np.float32(np.inf))
+        reps[-1] = float(rep)
+    else:
+        reps[-1] = 0.0
+
+    # Every pick has to sit strictly above the previous threshold
+    if np.any(commute_key(reps[1:]) <= thresholds):
+        raise ValueError("Commute thresholds too close together to build a table")
+
+    return reps
+
+
+def grid_shape(metadata: Dict, n_gaps: int) -> tuple:
+    """(cities, apartment sizes, dining values, car types, commute gaps)"""
+    encoders = metadata['encoders']
+    return (
+        len(encoders['city']['classes']),
+        len(encoders['apartment_size']['classes']),
+        len(DINING_VALUES),
+        len(encoders['car_type']['classes']),
+        n_gaps
+    )
+
+
+def grid_features(shape: tuple, commute_values: np.ndarray) -> np.ndarray:
+    """
+    Feature matrix for every cell of the grid, in C order.
+
+    commute_values has one entry per commute gap.
+    """
+    cities, apartments, dining, cars, _ = shape
+    grids = np.meshgrid(
+        np.arange(cities),
+        np.arange(apartments),
+        DINING_VALUES,
+        np.arange(cars),
+        commute_values,
+        indexing='ij'
+    )
+    return np.stack([g.ravel() for g in grids], axis=1).astype(np.float64)
+
+
+class PredictionTable:
+    """
+    Every distinct model output, addressed by the discrete inputs plus a
+    bisect on commute_miles.
+
+    `values` holds the unique (total, rent, food, transportation,
+    utilities) rows and `index` maps each grid cell to a row in it, so
+    repeated outputs only get stored once.
+    """
+
+    ARRAYS = ['thresholds', 'index', 'values']
+
+    def __init__(self, thresholds: np.ndarray, index: np.ndarray,
+                 values: np.ndarray, signature: str):
+        self.thresholds = thresholds
+        self.index = index
+        self.values = values
+        self.signature = signature
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Same N x 5 output as running the forests, via array lookups."""
+        codes = features[:, :COMMUTE_FEATURE].astype(np.intp)
+        gaps = np.searchsorted(self.thresholds, commute_key(features[:, COMMUTE_FEATURE]),
+                               side='left')
+        rows = self.index[codes[:, 0], codes[:, 1], codes[:, 2], codes[:, 3], gaps]
+        return self.values[rows]
+
+
+def build_table(model, breakdown_models: Optional[Dict], metadata: Dict,
+                signature: str = '') -> PredictionTable:
+    """Run the forests once over the whole input space and keep the results."""
+    thresholds = collect_commute_thresholds(model_forests(model, breakdown_models))
+    reps = commute_representatives(thresholds)
+    shape = grid_shape(metadata, len(reps))
+
+    outputs = sklearn_outputs(model, breakdown_models, grid_features(shape, reps))
+    values, inverse = np.unique(outputs, axis=0, return_inverse=True)
+    index = inverse.astype(np.int32).reshape(shape)
+
+    return PredictionTable(thresholds, index, values, signature)
+
+
+def verify_table(table: PredictionTable, model, breakdown_models: Optional[Dict],
+                 metadata: Dict, samples_per_gap: int = 3, seed: int = 42) -> int:
+    """
+    Check the table against model.predict across the whole grid.
+
+    For every gap we test the stored pick, the smallest float32 just
+    above the lower threshold and some random values in between.
+    Returns the number of grid cells that didn't match exactly.
+    """
+    thresholds = table.thresholds
+    rng = np.random.default_rng(seed)
+
+    lower = np.concatenate([[0.0], thresholds])
+    upper = np.concatenate([thresholds, [100.0]])
+
+    # Just above each lower threshold (after the float32 cast)
+    just_above = np.empty(len(lower))
+    for i, bound in enumerate(lower):
+        value = np.float32(bound)
+        while float(value) <= bound and i > 0:
+            value = np.nextafter(value, np.float32(np.inf))
+        just_above[i] = float(value)
+
+    sample_sets = [commute_representatives(thresholds), just_above]
+    for _ in range(samples_per_gap):
+        sample_sets.append(rng.uniform(lower, np.maximum(upper, lower)))
+
+    mismatches = 0
+    shape = table.index.shape
+    for commute_values in sample_sets:
+        features = grid_features(shape, commute_values)
+        expected = sklearn_outputs(model, breakdown_models, features)
+        actual = table.predict(features)
+        mismatches += int(np.sum(np.any(expected != actual, axis=1)))
+
+    return mismatches
+
+
+def load_artifacts(model_dir: str = SCRIPT_DIR):
+    """
+    Load the models + metadata that train_model.py saved.
+
+    breakdown_models comes back as None when the metadata says the
+    models were trained fused (one forest for all 5 outputs).
+    """
+    with open(os.path.join(model_dir, 'model_metadata.json'), 'r') as f:
+        metadata = json.load(f)
+
+    if metadata.get('model_type') == 'fused':
+        model = joblib.load(os.path.join(model_dir, 'livecost_fused_model.pkl'))
+        breakdown_models = None
+    else:
+        model = joblib.load(os.path.join(model_dir, 'livecost_model.pkl'))
+        breakdown_models = joblib.load(os.path.join(model_dir, 'breakdown_models.pkl'))
+
+    return model, breakdown_models, metadata
+
+
+def build_from_artifacts(model_dir: str = SCRIPT_DIR) -> PredictionTable:
+    """Load the saved models and build the table from them."""
+    model, breakdown_models, metadata = load_artifacts(model_dir)
+
+    start = time.perf_counter()
+    table = build_table(model, breakdown_models, metadata, artifact_signature(model_dir))
+    elapsed = time.perf_counter() - start
+
+    print_table_stats(table, elapsed)
+    return table
+
+
+def print_table_stats(table: PredictionTable, elapsed: float):
+    print("Prediction table built")
+    print(f"  Grid: {' x '.join(str(n) for n in table.index.shape)} "
+          f"({table.index.size} cells, {len(table.thresholds)} commute thresholds)")
+    print(f"  Distinct outputs: {len(table.values)}")
+    print(f"  Size: {(table.index.nbytes + table.values.nbytes) / 1024:.0f} KB")
+    print(f"  Build time: {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    if '--verify' not in sys.argv:
+        build_from_artifacts()
+        sys.exit(0)
+
+    # Check the table the API actually serves, not a freshly built one
+    import serving_artifacts
+
+    table = serving_artifacts.load(SCRIPT_DIR, 'table')
+    if table is None:
+        print("No up-to-date serving artifacts - run train_model.py first")
+        sys.exit(1)
+
+    model, breakdown_models, metadata = load_artifacts()
+    mismatches = verify_table(table, model, breakdown_models, metadata)
+    if mismatches:
+        print(f"VERIFY FAILED: {mismatches} cells differ from model.predict")
+        sys.exit(1)
+    print("Verified: table matches model.predict everywhere")
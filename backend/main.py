@@ -15,28 +15,76 @@ Date: December 2025
 """
 
 # FastAPI stuff
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 
 # Pydantic for validation - this was a lifesaver for catching bad input
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
-from typing import Optional, Dict, List, Literal
+from typing import Any, Optional, Dict, List, Literal, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
 import joblib
 import json
 import os
+import sys
+import time
 import numpy as np
 import httpx
 from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+
+# Alternatives to calling sklearn's predict() - see each file for details
+import lookup_table
+import tree_engine
+
+# Memory-mapped arrays shared by every worker - see serving_artifacts.py
+import serving_artifacts
+
+# Versioned model folders for retraining - see model_store.py
+import model_store
+
+# Counters and latency histograms for GET /metrics - see metrics.py
+import metrics
+
+# On-demand profiling of live requests - see profiler.py
+from profiler import ProfileSession
+
+# Optional batched query logging - see query_logger.py
+from query_logger import QueryLogger
+from cache_janitor import CacheJanitor
+
+# In-memory cache in front of SQLite - see memory_cache.py
+from memory_cache import TTLCache
+
+# orjson is optional - it serializes the /predict responses several times
+# faster than the json module, but everything works without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # My database module - kept it separate to stay organized
+# The endpoints use the async versions so SQLite never blocks the event loop
 from database import (
     init_database,
-    save_user_query,
-    get_cached_api_response,
-    cache_api_response,
-    get_recent_queries,
-    get_query_statistics
+    close_connections,
+    close_async_pool,
+    save_user_queries_async,
+    get_cached_api_entry_async,
+    cache_api_response_async,
+    seconds_until_expiry,
+    get_prediction_result_async,
+    save_prediction_result_async,
+    purge_stale_prediction_results,
+    CACHE_EXPIRATION_HOURS,
+    get_recent_queries_async,
+    get_query_statistics_async,
+    get_query_writes_async
 )
 
 
@@ -49,72 +97,608 @@ app = FastAPI(
 
 # CORS setup - spent way too long debugging this the first time
 # Without this, React can't talk to FastAPI because of browser security
+FRONTEND_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Request counts by status and latency by path, for GET /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for bodies the server built itself.
+
+    Returning one of these skips FastAPI's response_model check and its
+    jsonable_encoder pass - the content goes straight to orjson (or a
+    compact json.dumps without it).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                          separators=(',', ':')).encode('utf-8')
+
 
 # Where the script lives - need this for finding model files
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Global vars for the ML models - load once, use everywhere
-model = None
-breakdown_models = None
-metadata = None
 
+class InputCodes(NamedTuple):
+    """
+    The training encodings for each categorical input, as flat
+    value -> float dicts.
+
+    Built once per bundle, so encoding a request is one dict lookup per
+    column instead of digging through metadata['encoders'] every time.
+    """
+    city: Dict[str, float]
+    apartment_size: Dict[str, float]
+    car_type: Dict[str, float]
+
+
+def compile_input_codes(metadata: Dict) -> InputCodes:
+    encoders = metadata['encoders']
+    return InputCodes(**{
+        column: {value: float(code) for value, code in encoders[column]['mapping'].items()}
+        for column in InputCodes._fields
+    })
 
-def load_models():
+
+class ModelBundle(NamedTuple):
+    """
+    Everything from one training run that serving needs, kept together.
+
+    Used to be separate globals (model, metadata, ...), which was fine
+    until models could get swapped while the server is running - a request
+    could read the old metadata and then the new model. Now each request
+    grabs active_bundle once and only uses that, and a swap is a single
+    assignment, so requests already running just finish on the old bundle.
+    """
+    model: Any
+    breakdown_models: Optional[Dict]
+    metadata: Dict
+
+    # Whatever actually runs the predictions - all of them take the N x 5
+    # feature matrix and give back N x 5 (total + 4 categories)
+    predictor: Any
+    inference_engine: str
+
+    # Hash of the model artifacts - memoized predictions are only valid
+    # for the exact models that produced them
+    model_version: str
+
+    model_dir: str
+    load_ms: Dict[str, float]
+
+    input_codes: InputCodes
+
+
+# The bundle serving requests right now - load once, use everywhere
+active_bundle: Optional[ModelBundle] = None
+
+# Which engine to serve with (set LIVECOST_ENGINE to override):
+# - 'table':   precomputed lookup table (lookup_table.py) - fastest
+# - 'numpy':   flattened forests walked with NumPy (tree_engine.py)
+# - 'sklearn': plain model.predict() calls
+INFERENCE_ENGINES = ('table', 'numpy', 'sklearn')
+INFERENCE_ENGINE = os.environ.get('LIVECOST_ENGINE', 'table')
+
+# predict() is CPU-bound, so it runs on its own small thread pool instead
+# of the event loop. Bounded so a burst of traffic queues up instead of
+# piling a thread on every request.
+INFERENCE_WORKERS = int(os.environ.get('LIVECOST_INFERENCE_WORKERS',
+                                       min(4, os.cpu_count() or 1)))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS,
+                                        thread_name_prefix='inference')
+
+# Write-behind logging for user_queries (LIVECOST_WRITE_BEHIND=1 to turn on).
+# Predictions get queued and written in batches instead of one commit each.
+USE_WRITE_BEHIND = os.environ.get('LIVECOST_WRITE_BEHIND', '0') == '1'
+query_logger = None
+
+# api_cache housekeeping (see cache_janitor.py). Interval 0 turns it off.
+CACHE_JANITOR_INTERVAL = float(os.environ.get('LIVECOST_CACHE_JANITOR_INTERVAL', '300'))
+CACHE_MAX_ROWS = int(os.environ.get('LIVECOST_CACHE_MAX_ROWS', '10000'))
+CACHE_MAX_BYTES = int(os.environ.get('LIVECOST_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+cache_janitor = None
+
+# ---- Startup / readiness ----
+# Unpickling the forests takes a while, and during a rolling deploy the
+# whole worker used to sit there not answering anything until it was done.
+# Now the startup hook hands the database setup and model loading to a
+# background task and returns right away - /health/live answers
+# immediately, /health/ready only once everything is loaded, and /predict
+# says 503 + Retry-After until then.
+STARTUP_RETRY_AFTER_SECONDS = 2
+database_ready = False
+models_state = 'loading'    # loading -> ready, missing (not trained) or failed
+startup_error = None
+startup_task = None
+
+
+def timed_load(path: str):
+    """joblib.load one artifact and time it."""
+    start = time.perf_counter()
+    artifact = joblib.load(path)
+    return artifact, (time.perf_counter() - start) * 1000
+
+
+def load_artifacts_parallel(paths: Dict[str, str], load_ms: Dict[str, float]) -> Dict[str, object]:
+    """joblib.load several artifacts at once, recording how long each one took."""
+    loaded = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(paths))) as pool:
+        futures = {name: pool.submit(timed_load, path) for name, path in paths.items()}
+        for name, future in futures.items():
+            loaded[name], load_ms[name] = future.result()
+    return loaded
+
+
+def load_bundle(model_dir: str, engine: str = INFERENCE_ENGINE) -> Optional[ModelBundle]:
     """
-    Load the trained ML models from disk.
+    Load the trained ML models in model_dir into a new bundle.
+
+    Doesn't touch what's being served - that's up to the caller. Returns
+    None if the folder doesn't have a complete set of artifacts.
+
+    `engine` picks what serves predictions (see INFERENCE_ENGINES). They
+    all give the exact same numbers, just at different speeds.
+    """
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}' - use one of {INFERENCE_ENGINES}")
+
+    model_path = os.path.join(model_dir, 'livecost_model.pkl')
+    breakdown_path = os.path.join(model_dir, 'breakdown_models.pkl')
+    fused_path = os.path.join(model_dir, 'livecost_fused_model.pkl')
+    metadata_path = os.path.join(model_dir, 'model_metadata.json')
+
+    if not os.path.exists(metadata_path):
+        return None
+
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    print("Metadata loaded successfully")
+
+    load_ms = {}
+    model_version = lookup_table.artifact_signature(model_dir)[:16]
+
+    # Table and numpy engines serve straight from memory-mapped arrays -
+    # no unpickling, and every worker shares one copy in the page cache
+    if engine != 'sklearn':
+        start = time.perf_counter()
+        predictor = serving_artifacts.load(model_dir, engine)
+        if predictor is not None:
+            load_ms['serving_artifacts'] = (time.perf_counter() - start) * 1000
+            print(f"Serving artifacts memory-mapped ({engine} engine)")
+            return ModelBundle(
+                model=None,
+                breakdown_models=None,
+                metadata=metadata,
+                predictor=predictor,
+                inference_engine=engine,
+                model_version=model_version,
+                model_dir=model_dir,
+                load_ms=load_ms,
+                input_codes=compile_input_codes(metadata)
+            )
+        print("No up-to-date serving artifacts - loading the pickles")
+
+    # Metadata says which kind of model train_model.py produced last
+    model_type = metadata.get('model_type', 'separate')
+
+    # The pickles don't depend on each other, so they load side by side
+    if model_type == 'fused':
+        # One forest predicts the total + all 4 categories together
+        artifact_paths = {'fused_model': fused_path}
+    else:
+        artifact_paths = {'model': model_path, 'breakdown_models': breakdown_path}
+    if not all(os.path.exists(path) for path in artifact_paths.values()):
+        return None
+
+    loaded = load_artifacts_parallel(artifact_paths, load_ms)
+
+    if model_type == 'fused':
+        model = loaded['fused_model']
+        breakdown_models = None
+        print("Fused model loaded successfully")
+    else:
+        model = loaded['model']
+        breakdown_models = loaded['breakdown_models']
+        print("Main model loaded successfully")
+        print("Breakdown models loaded successfully")
+
+    start = time.perf_counter()
+    if engine == 'table':
+        predictor = lookup_table.build_table(
+            model, breakdown_models, metadata, lookup_table.artifact_signature(model_dir)
+        )
+        print(f"Prediction table ready ({len(predictor.values)} distinct outputs)")
+    elif engine == 'numpy':
+        predictor = tree_engine.from_models(model, breakdown_models)
+        print(f"NumPy tree engine ready ({len(predictor.feature)} nodes)")
+    else:
+        predictor = tree_engine.SklearnEnsemble(model, breakdown_models,
+                                                timers=forest_timers(breakdown_models))
+    load_ms[f'{engine}_engine'] = (time.perf_counter() - start) * 1000
+
+    # Save the arrays so the next start (and the other workers) can map
+    # them instead of doing all of this again
+    if engine != 'sklearn':
+        try:
+            serving_artifacts.export(
+                model, breakdown_models, metadata, model_dir,
+                table=predictor if engine == 'table' else None,
+                ensemble=predictor if engine == 'numpy' else None
+            )
+        except OSError as e:
+            print(f"Couldn't save serving artifacts ({e}) - serving from memory")
+
+    return ModelBundle(
+        model=model,
+        breakdown_models=breakdown_models,
+        metadata=metadata,
+        predictor=predictor,
+        inference_engine=engine,
+        model_version=model_version,
+        model_dir=model_dir,
+        load_ms=load_ms,
+        input_codes=compile_input_codes(metadata)
+    )
+
+
+def swap_bundle(bundle: ModelBundle):
+    """Start serving a new bundle (requests already running keep their old one)."""
+    global active_bundle, models_state
+
+    active_bundle = bundle
+    models_state = 'ready'
+
+    # Anything memoized in memory came from the previous models
+    prediction_cache.clear()
+    compare_cache.clear()
+
+
+def load_models(engine: str = INFERENCE_ENGINE):
+    """
+    Load the trained ML models from disk and start serving them.
 
     These get loaded once when the server starts. Tried loading them
     per-request at first and it was way too slow (~100ms each time).
+    Serves the last retrained version if there is one (see model_store.py),
+    otherwise whatever train_model.py put in the backend folder.
     """
-    global model, breakdown_models, metadata
+    global models_state
 
-    model_path = os.path.join(SCRIPT_DIR, 'livecost_model.pkl')
-    breakdown_path = os.path.join(SCRIPT_DIR, 'breakdown_models.pkl')
-    metadata_path = os.path.join(SCRIPT_DIR, 'model_metadata.json')
+    bundle = load_bundle(model_store.active_model_dir(), engine)
+    if bundle is None:
+        models_state = 'missing'
+        return
 
-    if os.path.exists(model_path):
-        model = joblib.load(model_path)
-        print("Main model loaded successfully")
+    swap_bundle(bundle)
 
-    if os.path.exists(breakdown_path):
-        breakdown_models = joblib.load(breakdown_path)
-        print("Breakdown models loaded successfully")
 
-    if os.path.exists(metadata_path):
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-        print("Metadata loaded successfully")
+def prepare_database():
+    """Create/migrate the tables and mark the database as ready."""
+    global database_ready
+    init_database()
+    database_ready = True
+
+
+async def warm_up():
+    """
+    Everything startup used to do inline, run in the background.
+
+    The blocking parts (SQLite setup, unpickling) run in threads so the
+    event loop keeps answering health checks the whole time.
+    """
+    global models_state, startup_error, cache_janitor
+
+    loop = asyncio.get_running_loop()
+
+    try:
+        await loop.run_in_executor(None, prepare_database)
+    except Exception as e:
+        startup_error = f"Database setup failed: {e}"
+        models_state = 'failed'
+        print(startup_error)
+        return
+
+    if CACHE_JANITOR_INTERVAL > 0:
+        cache_janitor = CacheJanitor(interval_seconds=CACHE_JANITOR_INTERVAL,
+                                     max_rows=CACHE_MAX_ROWS,
+                                     max_bytes=CACHE_MAX_BYTES)
+        await cache_janitor.start()
+
+    try:
+        await loop.run_in_executor(None, load_models)
+    except Exception as e:
+        startup_error = f"Loading models failed: {e}"
+        models_state = 'failed'
+        print(startup_error)
+        return
+
+    # Memoized results from older models can never match again (the hash
+    # includes the model version), so don't let them take up space
+    if active_bundle is None:
+        print("LiveCost API ready (models: missing)")
+        return
+    purged = await loop.run_in_executor(
+        None, purge_stale_prediction_results, active_bundle.model_version
+    )
+    if purged:
+        print(f"Removed {purged} memoized predictions from old models")
+
+    print(f"LiveCost API ready (models: {models_state})")
+
+
+def check_ready(need_models: bool = True):
+    """
+    Raise the right error if the server can't handle this request yet.
+
+    While still warming up that's a quick 503 with Retry-After, so load
+    balancers and clients just try again in a moment.
+    """
+    if not database_ready or (need_models and models_state == 'loading'):
+        if startup_error is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is starting up - models are still loading",
+                headers={"Retry-After": str(STARTUP_RETRY_AFTER_SECONDS)}
+            )
+        raise HTTPException(status_code=503, detail=startup_error)
+
+    if need_models and active_bundle is None:
+        if startup_error is not None:
+            raise HTTPException(status_code=503, detail=startup_error)
+        raise HTTPException(
+            status_code=500,
+            detail="Models not loaded. Run train_model.py first."
+        )
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Runs when server starts - set up DB and load models."""
-    init_database()
-    load_models()
-    print("LiveCost API started successfully!")
+    """
+    Runs when server starts - kicks off DB setup and model loading.
+
+    Doesn't wait for them (see warm_up) so the server is up right away.
+    """
+    global query_logger, startup_task, model_watch_task
+
+    if USE_WRITE_BEHIND:
+        query_logger = QueryLogger()
+        await query_logger.start()
+        print("Write-behind query logging enabled")
+
+    startup_task = asyncio.create_task(warm_up())
+
+    if MODEL_WATCH_INTERVAL > 0:
+        model_watch_task = asyncio.create_task(watch_model_version())
+
+    print("LiveCost API started - loading models in the background")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush any queued queries, then close the pooled database connections."""
+    global query_logger, cache_janitor, startup_task, model_watch_task
+
+    if model_watch_task is not None:
+        model_watch_task.cancel()
+        await asyncio.gather(model_watch_task, return_exceptions=True)
+        model_watch_task = None
+
+    # A retrain that's still going gets killed (its half-written version
+    # folder is never made active, so nothing is lost)
+    if retrain_task is not None and not retrain_task.done():
+        retrain_task.cancel()
+        await asyncio.gather(retrain_task, return_exceptions=True)
+
+    # Don't close connections out from under a warm-up that's still going
+    if startup_task is not None:
+        await startup_task
+        startup_task = None
+
+    if cache_janitor is not None:
+        await cache_janitor.stop()
+        cache_janitor = None
+
+    if query_logger is not None:
+        await query_logger.stop()
+        query_logger = None
+
+    await close_async_pool()
+    close_connections()
+
+
+# ---- Retraining ----
+# POST /admin/retrain trains a new set of models without restarting:
+# 1. train_model.py runs as a separate process (so it doesn't fight the
+#    server for the GIL) and writes into a new model_versions/ folder
+# 2. the new bundle gets loaded and prewarmed in a background thread
+# 3. swap_bundle() switches to it in one assignment - requests already
+#    running finish on the old bundle
+# Off unless LIVECOST_ADMIN_TOKEN is set, since it's an expensive thing
+# to let just anyone trigger.
+ADMIN_TOKEN = os.environ.get('LIVECOST_ADMIN_TOKEN')
+retrain_job: Optional[Dict[str, Any]] = None
+retrain_task = None
+
+# Under `uvicorn --workers N` the retrain runs in whichever worker got the
+# request, so the others check model_store's CURRENT pointer this often
+# (seconds) and load the new version when it moves. 0 turns it off.
+MODEL_WATCH_INTERVAL = float(os.environ.get('LIVECOST_MODEL_WATCH_INTERVAL', '5'))
+model_watch_task = None
+
+
+def prewarm_bundle(bundle: ModelBundle):
+    """
+    Run a new bundle over a grid of inputs before it serves anything.
+
+    Gets the first-call overhead (page faults, lazy setup) out of the way
+    so the first requests after the swap aren't slow, and doubles as a
+    sanity check - a bundle that predicts NaN never goes live.
+    """
+    encoders = bundle.metadata['encoders']
+    grid = np.array(np.meshgrid(
+        list(encoders['city']['mapping'].values()),
+        list(encoders['apartment_size']['mapping'].values()),
+        [0, 7, 15],
+        list(encoders['car_type']['mapping'].values()),
+        [0.0, 25.0, 50.0, 100.0],
+        indexing='ij'
+    ), dtype=np.float64).reshape(5, -1).T
+
+    outputs = bundle.predictor.predict(grid)
+    if outputs.shape != (len(grid), 5) or not np.isfinite(outputs).all():
+        raise RuntimeError("New models gave invalid predictions during prewarm")
+
+
+async def run_retrain(job: Dict[str, Any]):
+    """Train, load, prewarm and swap in a new bundle, updating job as it goes."""
+    process = None
+    try:
+        # In here so a full disk or bad permissions fails the job instead of
+        # leaving it 'training' forever (and every retrain after it a 409)
+        version_dir = model_store.new_version_dir()
+        log_path = os.path.join(version_dir, 'train.log')
+        job['version'] = os.path.basename(version_dir)
+        job['log'] = log_path
+
+        args = [sys.executable, os.path.join(SCRIPT_DIR, 'train_model.py'),
+                '--output-dir', version_dir]
+        if job['fused']:
+            args.append('--fused')
+        if job['incremental']:
+            args.append('--incremental')
+
+        start = time.perf_counter()
+        with open(log_path, 'w') as log:
+            process = await asyncio.create_subprocess_exec(
+                *args, cwd=SCRIPT_DIR, stdout=log, stderr=asyncio.subprocess.STDOUT
+            )
+            returncode = await process.wait()
+        job['train_seconds'] = round(time.perf_counter() - start, 2)
+
+        if job['incremental'] and returncode == model_store.NO_NEW_DATA_EXIT_CODE:
+            model_store.discard_version(version_dir)
+            job['state'] = 'succeeded'
+            job['detail'] = "No new data since the last training run - kept the current models"
+            job['finished_at'] = datetime.now().isoformat()
+            return
+
+        if returncode != 0:
+            raise RuntimeError(f"train_model.py exited with code {returncode} - see {log_path}")
+
+        job['state'] = 'loading'
+        loop = asyncio.get_running_loop()
+        engine = active_bundle.inference_engine if active_bundle else INFERENCE_ENGINE
+
+        start = time.perf_counter()
+        bundle = await loop.run_in_executor(None, load_bundle, version_dir, engine)
+        if bundle is None:
+            raise RuntimeError(f"Training finished but {version_dir} is missing artifacts")
+        await loop.run_in_executor(None, prewarm_bundle, bundle)
+        job['load_seconds'] = round(time.perf_counter() - start, 2)
+
+        old_version = active_bundle.model_version if active_bundle else None
+        swap_bundle(bundle)
+        model_store.set_active_version(version_dir)
+        model_store.prune_versions()
+
+        job['state'] = 'succeeded'
+        job['model_version'] = bundle.model_version
+        job['finished_at'] = datetime.now().isoformat()
+        print(f"Swapped models {old_version} -> {bundle.model_version}")
+
+        await loop.run_in_executor(None, purge_stale_prediction_results, bundle.model_version)
+
+    except asyncio.CancelledError:
+        if process is not None and process.returncode is None:
+            process.kill()
+        job['state'] = 'cancelled'
+        raise
+    except Exception as e:
+        job['state'] = 'failed'
+        job['error'] = str(e)
+        job['finished_at'] = datetime.now().isoformat()
+        print(f"Retrain failed: {e}")
+
+
+async def sync_model_version(seen: Optional[str]) -> Optional[str]:
+    """
+    Swap in the version CURRENT points at if it moved since `seen`.
+
+    Returns the version to compare against next time. A version that
+    fails to load doesn't get retried until CURRENT moves again.
+    """
+    version = model_store.current_version()
+    if version == seen or models_state == 'loading':
+        return seen
+
+    model_dir = model_store.active_model_dir()
+    if active_bundle is not None and \
+            os.path.abspath(active_bundle.model_dir) == os.path.abspath(model_dir):
+        return version  # this worker ran the retrain
+
+    loop = asyncio.get_running_loop()
+    engine = active_bundle.inference_engine if active_bundle else INFERENCE_ENGINE
+    try:
+        bundle = await loop.run_in_executor(None, load_bundle, model_dir, engine)
+        if bundle is None:
+            raise RuntimeError(f"{model_dir} is missing artifacts")
+        await loop.run_in_executor(None, prewarm_bundle, bundle)
+    except Exception as e:
+        print(f"Couldn't load model version {version}: {e}")
+        return version
+
+    old_version = active_bundle.model_version if active_bundle else None
+    swap_bundle(bundle)
+    print(f"Picked up models {old_version} -> {bundle.model_version} from {model_dir}")
+    return version
+
+
+async def watch_model_version():
+    """Keep this worker on the same models as the one that last retrained."""
+    seen = model_store.current_version()
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            seen = await sync_model_version(seen)
+        except Exception as e:
+            print(f"Model version check failed: {e}")
+
+
+# The running POST /admin/profile session, if any (see profiler.py)
+profile_session: Optional[ProfileSession] = None
+
+
+def check_admin(token: Optional[str]):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403,
+                            detail="Admin endpoints are off - set LIVECOST_ADMIN_TOKEN to enable")
+    # Constant-time, so response timing doesn't leak how much of it matched
+    if not hmac.compare_digest((token or '').encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 
 # ---- Request/Response Models ----
 # Pydantic handles all the validation automatically which is nice
 
-class PredictionRequest(BaseModel):
+class LifestyleProfile(BaseModel):
     """
-    All the inputs from the form.
+    The 8 lifestyle questions from the form.
 
     Using Literal types to restrict to valid options - learned this
     from the FastAPI docs. Keeps bad data from getting to the model.
     """
-    city: Literal['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
-                  'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
-
     # The 8 lifestyle questions
     apartment_size: Literal['studio', '1BR', '2BR', '3BR']
     dining_frequency: int = Field(..., ge=0, le=15,
@@ -136,6 +720,17 @@ class PredictionRequest(BaseModel):
         return v
 
 
+class PredictionRequest(LifestyleProfile):
+    """All the inputs from the form - the lifestyle answers plus a city."""
+    city: Literal['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
+                  'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
+
+
+class CompareRequest(LifestyleProfile):
+    """One lifestyle profile to price in every city, plus a salary."""
+    salary: float = Field(..., gt=0, description="Annual salary")
+
+
 # Cost lookup tables for the lifestyle-based categories
 # These don't need ML since they're pretty consistent across cities
 ENTERTAINMENT_COSTS = {
@@ -198,6 +793,99 @@ class CitiesResponse(BaseModel):
     count: int
 
 
+# Inputs /sweep can vary, with the range each one accepts (same as the form)
+SWEEP_RANGES = {
+    'commute_miles': (0.0, 100.0),
+    'dining_frequency': (0, 15)
+}
+APARTMENT_SIZES = ['studio', '1BR', '2BR', '3BR']
+
+# Where each sweepable input sits in the feature matrix (see encode_inputs)
+SWEEP_COLUMNS = {'apartment_size': 1, 'dining_frequency': 2, 'commute_miles': 4}
+
+# Most values one /sweep axis can have, and most points in a whole sweep
+MAX_SWEEP_STEPS = 101
+MAX_SWEEP_POINTS = 2500
+
+
+class SweepAxis(BaseModel):
+    """
+    One input for /sweep to vary.
+
+    commute_miles and dining_frequency go from start to stop in `steps`
+    evenly spaced values (the whole form range by default).
+    apartment_size always tries every size.
+    """
+    field: Literal['commute_miles', 'dining_frequency', 'apartment_size']
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: int = Field(11, ge=2, le=MAX_SWEEP_STEPS)
+
+    @model_validator(mode='after')
+    def check_range(self):
+        if self.field in SWEEP_RANGES:
+            low, high = SWEEP_RANGES[self.field]
+            start = low if self.start is None else self.start
+            stop = high if self.stop is None else self.stop
+            if not low <= start <= stop <= high:
+                raise ValueError(f'{self.field} sweep has to go up from {low} to at most {high}')
+        return self
+
+    def values(self) -> list:
+        """The values to try, in order."""
+        if self.field == 'apartment_size':
+            return APARTMENT_SIZES
+
+        low, high = SWEEP_RANGES[self.field]
+        values = np.linspace(low if self.start is None else self.start,
+                             high if self.stop is None else self.stop, self.steps)
+        if self.field == 'dining_frequency':
+            return np.unique(np.round(values)).astype(int).tolist()
+        return np.round(values, 2).tolist()
+
+
+class SweepRequest(PredictionRequest):
+    """A full profile plus the one or two inputs to vary (their values in the profile get ignored)."""
+    x: SweepAxis
+    y: Optional[SweepAxis] = None
+
+    @model_validator(mode='after')
+    def check_axes(self):
+        if self.y is not None and self.y.field == self.x.field:
+            raise ValueError('x and y have to vary different inputs')
+        return self
+
+
+class SweepResponse(BaseModel):
+    """
+    Total monthly cost at every point of a sweep.
+
+    One axis: totals[i] is at x.values[i] (a curve). Two axes:
+    totals[j][i] is at x.values[i], y.values[j] (a heatmap, one row per y value).
+    """
+    city: str
+    x: Dict[str, Any]
+    y: Optional[Dict[str, Any]]
+    totals: List
+    points: int
+
+
+class CityComparison(BaseModel):
+    """One city's row in a /compare response."""
+    city: str
+    rank: int
+    total_monthly_cost: float
+    breakdown: CostBreakdown
+    affordability_ratio: float
+    affordability: str
+
+
+class CompareResponse(BaseModel):
+    salary: float
+    confidence: str
+    cities: List[CityComparison]
+
+
 # City cost multipliers
 # In a real app these would come from Zillow/Numbeo APIs
 # but for the proof of concept I'm using realistic estimates
@@ -215,22 +903,102 @@ CITY_COST_MULTIPLIERS = {
     'Phoenix': {'rent': 0.8, 'food': 0.85, 'transport': 1.15, 'utilities': 1.0}
 }
 
+# Cap for /predict/batch so one request can't tie up the worker forever
+MAX_BATCH_SIZE = 10000
+
+# Every city /compare prices a profile in
+COMPARE_CITIES = list(CITY_COST_MULTIPLIERS)
+
+# Share of salary going to living costs - same cutoffs the affordability
+# map colors by (standard financial advice: under 30% is comfortable)
+AFFORDABLE_RATIO = 0.30
+MODERATE_RATIO = 0.40
+
+# input_summary strings for every dining_frequency the form allows
+DINING_SUMMARIES = [f"{times}x/week" for times in range(16)]
+
+# Largest page /recent-queries will return
+MAX_RECENT_QUERIES = 500
+
+
+# Parsed city cost data lives in memory (L1) in front of the SQLite
+# api_cache table (L2). Only 10 cities today, but the cap keeps it bounded
+# if that list grows.
+CITY_CACHE_MAX_ENTRIES = 256
+city_cache = TTLCache(max_entries=CITY_CACHE_MAX_ENTRIES,
+                      ttl_seconds=CACHE_EXPIRATION_HOURS * 3600)
+
+# Memo of model outputs keyed on the model inputs (see get_base_costs).
+# Most traffic is the same few presets from the form, so a small LRU in
+# front of the prediction_results table catches nearly all of it.
+PREDICTION_CACHE_MAX_ENTRIES = 10000
+prediction_cache = TTLCache(max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+                            ttl_seconds=float('inf'))
+prediction_db_hits = 0
+prediction_db_misses = 0
+
+
+# /compare results per profile. Salary isn't part of the key - the costs
+# don't depend on it, so the affordability ratios get worked out per request.
+COMPARE_CACHE_MAX_ENTRIES = 1024
+compare_cache = TTLCache(max_entries=COMPARE_CACHE_MAX_ENTRIES,
+                         ttl_seconds=CACHE_EXPIRATION_HOURS * 3600)
+
+
+# Conditional GETs for the endpoints the React app polls. /cities,
+# /model-info and /health only change with the models (or the server's
+# state), and /statistics only when a query gets logged, so each one gets
+# rendered to JSON once per version and answered with a 304 until the
+# version moves on.
+class RenderedResponse(NamedTuple):
+    version: Any
+    etag: str
+    last_modified: str
+    body: bytes
+
+
+rendered_responses: Dict[str, RenderedResponse] = {}
+
+# How long browsers and the CDN can reuse a response before checking back.
+# /health is always checked (a 304 is still cheap), /statistics only
+# briefly since it moves with every query.
+CACHE_CONTROL = {
+    'cities': 'public, max-age=300',
+    'model-info': 'public, max-age=60',
+    'health': 'no-cache',
+    'statistics': 'public, max-age=10'
+}
+
 
 async def get_city_cost_data(city: str) -> Dict:
     """
     Get cost data for a city, checking cache first.
 
     This is where real API calls would go. The caching pattern
-    would be the same - check SQLite first, call API if needed,
-    then cache the result.
+    would be the same - check memory first, then SQLite, call the API
+    if needed, then cache the result in both.
+
+    Hits in memory don't touch the database at all. If a bunch of
+    requests miss on the same city at once only one of them does the
+    lookup - the rest wait for its answer.
     """
     cache_key = f"city_costs_{city}"
+    return await city_cache.get_or_fill(cache_key, lambda: fetch_city_cost_data(city, cache_key))
+
 
+async def fetch_city_cost_data(city: str, cache_key: str):
+    """
+    The SQLite + "API" part of get_city_cost_data.
+
+    Returns (cost_data, seconds_left) so the memory cache expires its
+    copy at the same time as the SQLite entry.
+    """
     # Try cache first
-    cached = get_cached_api_response(cache_key)
+    cached = await get_cached_api_entry_async(cache_key)
     if cached:
         print(f"Cache hit for {city}")
-        return cached
+        cost_data, expires_at = cached
+        return cost_data, seconds_until_expiry(expires_at)
 
     print(f"Cache miss for {city} - fetching data")
 
@@ -240,71 +1008,469 @@ async def get_city_cost_data(city: str) -> Dict:
     })
 
     # Save to cache
-    cache_api_response(cache_key, cost_data)
+    expires_at = await cache_api_response_async(cache_key, cost_data)
+
+    return cost_data, seconds_until_expiry(expires_at)
+
+
+# How long each step of POST /predict takes (see predict_cost)
+PREDICT_STAGES = ('encode_input', 'city_cost_lookup', 'model_predict',
+                  'build_breakdown', 'save_user_query', 'serialize_response')
+stage_timers = {
+    stage: metrics.histogram('livecost_predict_stage_seconds',
+                             'Time spent in each stage of POST /predict', stage=stage)
+    for stage in PREDICT_STAGES
+}
+
+
+# Short names for the Server-Timing header (shows up in the browser
+# devtools Timing tab for each /predict call)
+SERVER_TIMING_NAMES = {
+    'encode_input': 'encode',
+    'city_cost_lookup': 'cache',
+    'model_predict': 'inference',
+    'build_breakdown': 'breakdown',
+    'save_user_query': 'db',
+    'serialize_response': 'serialize'
+}
+
+# Without this the browser hides Server-Timing from the React app's
+# origin (the API is on a different port)
+TIMING_ALLOW_ORIGIN = ', '.join(FRONTEND_ORIGINS)
+
+
+def server_timing(marks: List[float]) -> str:
+    """Server-Timing header value from the stage boundaries in predict_cost (ms)."""
+    parts = [f'{SERVER_TIMING_NAMES[stage]};dur={(end - begin) * 1000:.3f}'
+             for stage, begin, end in zip(PREDICT_STAGES, marks, marks[1:])]
+    parts.append(f'total;dur={(marks[-1] - marks[0]) * 1000:.3f}')
+    return ', '.join(parts)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match can be '*' or a list, and weak tags (W/) count as a match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag
+               for tag in if_none_match.split(','))
+
+
+def not_modified_since(if_modified_since: Optional[str], rendered: RenderedResponse) -> bool:
+    """Only checked when there's no If-None-Match (the ETag wins)."""
+    try:
+        return parsedate_to_datetime(if_modified_since) >= \
+            parsedate_to_datetime(rendered.last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+async def conditional_response(name: str, version: Any, render,
+                               if_none_match: Optional[str],
+                               if_modified_since: Optional[str]) -> Response:
+    """
+    The JSON for `name` at `version`, or a 304 if the client already has it.
+
+    render() only runs the first time a version is seen - it returns
+    (body, last modified unix time), and may be async. Every request
+    after that reuses the same bytes.
+    """
+    rendered = rendered_responses.get(name)
+    if rendered is None or rendered.version != version:
+        result = render()
+        if asyncio.iscoroutine(result):
+            result = await result
+        body, modified_at = result
+        rendered = RenderedResponse(
+            version=version,
+            etag='"' + hashlib.sha256(repr(version).encode()).hexdigest()[:16] + '"',
+            last_modified=formatdate(modified_at, usegmt=True),
+            body=JSONResponse(content=jsonable_encoder(body)).body
+        )
+        rendered_responses[name] = rendered
 
-    return cost_data
+    headers = {
+        'ETag': rendered.etag,
+        'Last-Modified': rendered.last_modified,
+        'Cache-Control': CACHE_CONTROL[name]
+    }
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, rendered.etag)
+    else:
+        not_modified = not_modified_since(if_modified_since, rendered)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered.body, media_type='application/json', headers=headers)
+
+
+def forest_timers(breakdown_models: Optional[Dict]) -> List[metrics.Histogram]:
+    """
+    One predict() timer per model for the sklearn engine.
+
+    The table and numpy engines answer for every model in one pass, so
+    for those there's only the model_predict stage to look at.
+    """
+    names = ['total'] if breakdown_models is None else ['total'] + list(breakdown_models)
+    return [metrics.histogram('livecost_model_predict_seconds',
+                              'Time spent in each model\'s predict() (sklearn engine)', model=name)
+            for name in names]
+
+
+def encode_inputs(bundle: ModelBundle, requests: List[PredictionRequest]) -> np.ndarray:
+    """
+    Convert a whole list of form inputs into one N x 5 feature matrix.
+
+    Same encodings as training (studio=3, 1BR=0, etc.) - the mappings
+    get looked up once per batch instead of once per row, and each
+    column is filled in one shot so the models can score every row
+    in a single predict() call.
+    """
+    codes = bundle.input_codes
+
+    # Has to be in the same order as training
+    features = np.empty((len(requests), 5), dtype=np.float64)
+    features[:, 0] = [codes.city.get(r.city, 0.0) for r in requests]
+    features[:, 1] = [codes.apartment_size.get(r.apartment_size, 0.0) for r in requests]
+    features[:, 2] = [r.dining_frequency for r in requests]
+    features[:, 3] = [codes.car_type.get(r.car_type, 0.0) for r in requests]
+    features[:, 4] = [r.commute_miles for r in requests]
+
+    return features
 
 
-def encode_input(request: PredictionRequest) -> np.ndarray:
+def encode_input(bundle: ModelBundle, request: PredictionRequest,
+                 out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Convert the form inputs into numbers for the ML model.
 
     The model was trained with specific encodings (studio=3, 1BR=0, etc.)
     so we have to use the exact same ones here. Took me a while to
     figure out why predictions were weird before I realized this.
+
+    Fills in `out` (a 1 x 5 row from feature_buffers) if it's given
+    instead of allocating a new one.
     """
-    if metadata is None:
-        raise HTTPException(status_code=500, detail="Model metadata not loaded")
+    codes = bundle.input_codes
+    features = np.empty((1, 5), dtype=np.float64) if out is None else out
+    features[0] = (codes.city.get(request.city, 0.0),
+                   codes.apartment_size.get(request.apartment_size, 0.0),
+                   request.dining_frequency,
+                   codes.car_type.get(request.car_type, 0.0),
+                   request.commute_miles)
+    return features
 
-    encoders = metadata['encoders']
 
-    # Use the saved mappings from training
-    city_encoded = encoders['city']['mapping'].get(request.city, 0)
-    apartment_encoded = encoders['apartment_size']['mapping'].get(request.apartment_size, 0)
-    car_encoded = encoders['car_type']['mapping'].get(request.car_type, 0)
+class FeatureBuffers:
+    """
+    Reusable 1 x 5 feature rows for /predict.
 
-    # Has to be in the same order as training
-    features = np.array([[
-        city_encoded,
-        apartment_encoded,
-        request.dining_frequency,
-        car_encoded,
-        request.commute_miles
-    ]])
+    A request holds on to its row across awaits (the models might be
+    running it on the inference pool), so every request in flight needs
+    its own. This keeps the finished ones on a free list instead of
+    allocating a new array per request. Only ever touched from the event
+    loop, so no lock.
+    """
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self._free: List[np.ndarray] = []
+
+    def acquire(self) -> np.ndarray:
+        if self._free:
+            return self._free.pop()
+        return np.empty((1, 5), dtype=np.float64)
+
+    def release(self, features: np.ndarray):
+        if len(self._free) < self.keep:
+            self._free.append(features)
+
+
+# Feature rows kept around for reuse - more than this many requests in
+# flight at once just allocate their own
+FEATURE_BUFFERS_KEEP = 256
+feature_buffers = FeatureBuffers(keep=FEATURE_BUFFERS_KEEP)
+
+
+def predict_base_costs(bundle: ModelBundle, features: np.ndarray) -> np.ndarray:
+    """
+    Run the main model and every breakdown model over a feature matrix.
+
+    Returns an N x 5 array: column 0 is the total, then one column per
+    breakdown category (rent, food, transportation, utilities). Whichever
+    engine the bundle was loaded with gets called once for the whole matrix,
+    no matter how many rows there are - and with a fused model that's a
+    single forest instead of five.
+    """
+    return bundle.predictor.predict(features)
+
+
+def prediction_hash(bundle: ModelBundle, request: PredictionRequest) -> str:
+    """
+    Stable hash of everything the models see, plus the model version.
+
+    Only the 5 model inputs go in - the lifestyle answers (entertainment,
+    groceries...) don't affect the model outputs, so two requests that
+    only differ there share a memo entry.
+    """
+    canonical = json.dumps({
+        'city': request.city,
+        'apartment_size': request.apartment_size,
+        'dining_frequency': int(request.dining_frequency),
+        'car_type': request.car_type,
+        'commute_miles': float(request.commute_miles),
+        'model_version': bundle.model_version
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def uses_prediction_memo(bundle: Optional[ModelBundle]) -> bool:
+    """Whether /predict goes through prediction_cache (everything but the table engine)."""
+    engine = bundle.inference_engine if bundle is not None else INFERENCE_ENGINE
+    return engine != 'table'
+
+
+async def get_base_costs(bundle: ModelBundle, request: PredictionRequest,
+                         features: np.ndarray) -> np.ndarray:
+    """
+    Model outputs for one request, memoized.
+
+    Checks the in-memory LRU, then the prediction_results table, and only
+    runs the models if neither has it. The lookup table engine skips all
+    of that - it already is a precomputed memo of every possible output
+    and answers faster than even the LRU lookup would.
+    """
+    if not uses_prediction_memo(bundle):
+        return predict_base_costs(bundle, features)[0]
+
+    query_hash = prediction_hash(bundle, request)
+    return await prediction_cache.get_or_fill(
+        query_hash, lambda: compute_base_costs(bundle, request, features, query_hash)
+    )
+
+
+async def compute_base_costs(bundle: ModelBundle, request: PredictionRequest,
+                             features: np.ndarray, query_hash: str):
+    """Memo miss in memory - try the database, then actually run the models."""
+    global prediction_db_hits, prediction_db_misses
+
+    stored = await get_prediction_result_async(query_hash)
+    if stored is not None:
+        prediction_db_hits += 1
+        return np.array(stored), None
+
+    prediction_db_misses += 1
+    base_costs = (await run_inference(predict_base_costs, bundle, features))[0]
+
+    await save_prediction_result_async(
+        query_hash, request.city, tuple(float(v) for v in base_costs), bundle.model_version
+    )
+
+    return base_costs, None
+
+
+async def run_inference(func, *args):
+    """Run a CPU-bound function on the inference pool and wait for it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, func, *args)
 
-    return features
+
+def build_breakdown(bundle: ModelBundle, request: LifestyleProfile,
+                    base_costs: np.ndarray, city_costs: Dict) -> Dict[str, float]:
+    """
+    Turn one row of model outputs into the 8-category breakdown.
+
+    Applies the city multipliers to the ML categories and adds the
+    lifestyle-based costs from the lookup tables.
+    """
+    breakdown = {}
+    for i, category in enumerate(bundle.metadata['categories'], start=1):
+        base_prediction = float(base_costs[i])
+
+        # Apply city multiplier
+        multiplier_key = 'transport' if category == 'transportation' else category
+        multiplier = city_costs.get(multiplier_key, 1.0)
+
+        breakdown[category] = round(base_prediction * multiplier, 2)
+
+    # Add the lifestyle-based costs (these use the lookup tables)
+    breakdown.update(lifestyle_breakdown(request, city_costs))
+
+    return breakdown
+
+
+def lifestyle_breakdown(request: LifestyleProfile, city_costs: Dict) -> Dict[str, float]:
+    """The 4 categories that come from the lookup tables instead of the models."""
+    return {
+        'entertainment': round(
+            ENTERTAINMENT_COSTS.get(request.entertainment_budget, 175) *
+            city_costs.get('food', 1.0),
+            2
+        ),
+        'groceries': round(
+            GROCERY_COSTS.get(request.grocery_habits, 400) *
+            city_costs.get('food', 1.0),
+            2
+        ),
+        'fitness': round(
+            FITNESS_COSTS.get(request.fitness_routine, 0) *
+            city_costs.get('utilities', 1.0),
+            2
+        ),
+        'healthcare': round(
+            HEALTHCARE_COSTS.get(request.healthcare_needs, 150) *
+            city_costs.get('utilities', 1.0),
+            2
+        )
+    }
+
+
+def get_confidence(bundle: ModelBundle) -> str:
+    """Figure out confidence based on model R² score."""
+    r2_score = bundle.metadata['metrics']['test']['r2']
+
+    if r2_score > 0.9:
+        return "High"
+    elif r2_score > 0.75:
+        return "Medium"
+    else:
+        return "Low"  # Our model is here unfortunately
+
+
+def build_response(request: PredictionRequest, breakdown: Dict[str, float],
+                   breakdown_total: float, confidence: str,
+                   query_id: int) -> Dict[str, Any]:
+    """
+    Package everything up the way the frontend expects it.
+
+    Same shape as PredictionResponse, but as a plain dict - everything in
+    it was built right here from already-validated input, so running it
+    back through Pydantic (PredictionResponse(), CostBreakdown(**...),
+    then FastAPI checking it against response_model) was just re-checking
+    our own work on every request.
+    """
+    return {
+        "city": request.city,
+        "total_monthly_cost": round(breakdown_total, 2),
+        "breakdown": breakdown,
+        "confidence": confidence,
+        "input_summary": {
+            "apartment_size": request.apartment_size,
+            "dining_frequency": DINING_SUMMARIES[request.dining_frequency],
+            "car_type": request.car_type,
+            "commute_miles": f"{request.commute_miles} miles/day",
+            "entertainment": request.entertainment_budget,
+            "groceries": request.grocery_habits,
+            "fitness": request.fitness_routine,
+            "healthcare": request.healthcare_needs
+        },
+        "query_id": query_id,
+        "timestamp": datetime.now().isoformat()
+    }
 
 
 # ---- API Endpoints ----
 
+def health_status() -> str:
+    if models_state == 'ready' and database_ready:
+        return "healthy"
+    if models_state == 'loading':
+        return "starting"
+    return "degraded"
+
+
+async def health_response(if_none_match: Optional[str],
+                          if_modified_since: Optional[str]) -> Response:
+    """
+    Health check, re-rendered only when the server's state changes.
+
+    timestamp is when it changed to this state.
+    """
+    bundle = active_bundle
+    version = (health_status(), bundle is not None, database_ready,
+               bundle.model_version if bundle else None)
+
+    def render():
+        return HealthResponse(
+            status=version[0],
+            model_loaded=version[1],
+            database_ready=version[2],
+            timestamp=datetime.now().isoformat()
+        ), time.time()
+
+    return await conditional_response('health', version, render,
+                                      if_none_match, if_modified_since)
+
+
 @app.get("/", response_model=HealthResponse)
-async def root():
+async def root(if_none_match: Optional[str] = Header(None),
+               if_modified_since: Optional[str] = Header(None)):
     """Basic health check."""
-    return HealthResponse(
-        status="healthy",
-        model_loaded=model is not None,
-        database_ready=True,
-        timestamp=datetime.now().isoformat()
-    )
+    return await health_response(if_none_match, if_modified_since)
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(if_none_match: Optional[str] = Header(None),
+                       if_modified_since: Optional[str] = Header(None)):
     """More detailed health check."""
-    return HealthResponse(
-        status="healthy",
-        model_loaded=model is not None and breakdown_models is not None,
-        database_ready=True,
-        timestamp=datetime.now().isoformat()
-    )
+    return await health_response(if_none_match, if_modified_since)
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness - the process is up and the event loop is answering."""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Readiness - 200 once the database and models are loaded, 503 until then.
+
+    Includes how long each artifact took to load, to keep an eye on
+    cold-start time.
+    """
+    bundle = active_bundle
+    ready = database_ready and bundle is not None
+    body = {
+        "ready": ready,
+        "database_ready": database_ready,
+        "models": models_state,
+        "inference_engine": bundle.inference_engine if bundle else None,
+        "model_version": bundle.model_version if bundle else None,
+        "error": startup_error,
+        "artifact_load_ms": {name: round(ms, 1) for name, ms in bundle.load_ms.items()}
+        if bundle else {},
+        "timestamp": datetime.now().isoformat()
+    }
+    if ready:
+        return body
+
+    headers = {"Retry-After": str(STARTUP_RETRY_AFTER_SECONDS)} if models_state == 'loading' else None
+    return JSONResponse(status_code=503, content=body, headers=headers)
+
+
+def model_modified_at(bundle: Optional[ModelBundle]) -> float:
+    """When the serving models were trained (their metadata file's mtime)."""
+    if bundle is None:
+        return time.time()
+    return os.path.getmtime(os.path.join(bundle.model_dir, 'model_metadata.json'))
 
 
 @app.get("/cities", response_model=CitiesResponse)
-async def get_cities():
+async def get_cities(if_none_match: Optional[str] = Header(None),
+                     if_modified_since: Optional[str] = Header(None)):
     """Return available cities for the dropdown."""
-    cities = ['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
-              'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
-    return CitiesResponse(cities=cities, count=len(cities))
+    bundle = active_bundle
+
+    def render():
+        cities = ['NYC', 'LA', 'Chicago', 'Austin', 'Miami',
+                  'Seattle', 'Boston', 'Denver', 'Dallas', 'Phoenix']
+        return CitiesResponse(cities=cities, count=len(cities)), model_modified_at(bundle)
+
+    return await conditional_response('cities', bundle.model_version if bundle else None,
+                                      render, if_none_match, if_modified_since)
 
 
 @app.post("/predict", response_model=PredictionResponse)
@@ -315,132 +1481,604 @@ async def predict_cost(request: PredictionRequest):
     Takes all the form inputs, runs them through the ML model,
     adds in the lifestyle-based costs, and returns the breakdown.
     """
-    if model is None or breakdown_models is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Models not loaded. Run train_model.py first."
-        )
+    check_ready()
+
+    # Same bundle start to finish, even if a retrain swaps models mid-request
+    bundle = active_bundle
+
+    # Where each stage ended - each stage's timer returns the time it
+    # stopped, which is where the next one starts, so timing costs one
+    # perf_counter() per stage. Also used for the Server-Timing header.
+    marks = [time.perf_counter()]
 
     try:
-        # Encode inputs for the model
-        features = encode_input(request)
+        # Encode inputs for the model (into a reused row, not a new array)
+        features = encode_input(bundle, request, out=feature_buffers.acquire())
+        marks.append(stage_timers['encode_input'].since(marks[-1]))
 
         # Get city multipliers (checks cache)
         city_costs = await get_city_cost_data(request.city)
+        marks.append(stage_timers['city_cost_lookup'].since(marks[-1]))
 
-        # Run predictions for each category
-        total_prediction = float(model.predict(features)[0])
+        # Run predictions for each category (memoized - see get_base_costs).
+        # Table lookups take a few microseconds, so those run inline - the
+        # real models run on the inference pool, off the event loop.
+        base_costs = await get_base_costs(bundle, request, features)
+        marks.append(stage_timers['model_predict'].since(marks[-1]))
 
-        breakdown = {}
-        for category, cat_model in breakdown_models.items():
-            base_prediction = float(cat_model.predict(features)[0])
+        # Done with the row once the models have answered. Only handed back
+        # here - if the request got cancelled mid-predict, the pool could
+        # still be reading it, so it's left for the garbage collector.
+        feature_buffers.release(features)
 
-            # Apply city multiplier
-            multiplier_key = 'transport' if category == 'transportation' else category
-            multiplier = city_costs.get(multiplier_key, 1.0)
+        breakdown = build_breakdown(bundle, request, base_costs, city_costs)
 
-            breakdown[category] = round(base_prediction * multiplier, 2)
+        # Total it up
+        breakdown_total = sum(breakdown.values())
+        marks.append(stage_timers['build_breakdown'].since(marks[-1]))
 
-        # Add the lifestyle-based costs (these use the lookup tables)
-        breakdown['entertainment'] = round(
-            ENTERTAINMENT_COSTS.get(request.entertainment_budget, 175) *
-            city_costs.get('food', 1.0),
-            2
-        )
+        # Save to database for analytics
+        query_ids = await log_queries([{
+            'city': request.city,
+            'apartment_size': request.apartment_size,
+            'dining_frequency': request.dining_frequency,
+            'car_type': request.car_type,
+            'commute_miles': request.commute_miles,
+            'predicted_cost': breakdown_total,
+            'breakdown': breakdown
+        }])
+        marks.append(stage_timers['save_user_query'].since(marks[-1]))
+
+        # Serialized here instead of by FastAPI so it can be timed too -
+        # same JSON either way
+        response = FastJSONResponse(build_response(request, breakdown, breakdown_total,
+                                                   get_confidence(bundle), query_ids[0]))
+        marks.append(stage_timers['serialize_response'].since(marks[-1]))
+
+        response.headers['Server-Timing'] = server_timing(marks)
+        response.headers['Timing-Allow-Origin'] = TIMING_ALLOW_ORIGIN
+        return response
 
-        breakdown['groceries'] = round(
-            GROCERY_COSTS.get(request.grocery_habits, 400) *
-            city_costs.get('food', 1.0),
-            2
-        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        breakdown['fitness'] = round(
-            FITNESS_COSTS.get(request.fitness_routine, 0) *
-            city_costs.get('utilities', 1.0),
-            2
-        )
+    finally:
+        if profile_session is not None:
+            profile_session.request_done()
 
-        breakdown['healthcare'] = round(
-            HEALTHCARE_COSTS.get(request.healthcare_needs, 150) *
-            city_costs.get('utilities', 1.0),
-            2
+
+async def log_queries(queries: List[Dict]) -> List[int]:
+    """
+    Save prediction queries for analytics and return their ids.
+
+    Goes through the write-behind logger if it's on (ids come back
+    right away, rows get written in the background), otherwise straight
+    to the database in one transaction.
+    """
+    if query_logger is not None:
+        return await query_logger.log_many(queries)
+    return await save_user_queries_async(queries)
+
+
+def score_batch(bundle: ModelBundle, requests: List[PredictionRequest],
+                city_costs: Dict[str, Dict]):
+    """Encode, predict and build breakdowns for a whole batch (runs on the pool)."""
+    features = encode_inputs(bundle, requests)
+    base_costs = predict_base_costs(bundle, features)
+
+    breakdowns = [
+        build_breakdown(bundle, request, base_costs[i], city_costs[request.city])
+        for i, request in enumerate(requests)
+    ]
+    totals = [sum(breakdown.values()) for breakdown in breakdowns]
+
+    return breakdowns, totals
+
+
+@app.post("/predict/batch", response_model=List[PredictionResponse])
+async def predict_cost_batch(requests: List[PredictionRequest]):
+    """
+    Score a whole list of profiles in one pass.
+
+    HR relocation packages need thousands of these at a time, and going
+    through /predict meant thousands of round trips that each paid
+    sklearn's overhead five times. Here every model runs once over one
+    N x 5 matrix, city multipliers get looked up once per city, and all
+    the queries get saved in a single transaction.
+    """
+    check_ready()
+    bundle = active_bundle
+
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large - max {MAX_BATCH_SIZE} profiles per request"
         )
 
-        # Total it up
-        breakdown_total = sum(breakdown.values())
+    if not requests:
+        return []
 
-        # Figure out confidence based on model R² score
-        r2_score = metadata['metrics']['test']['r2'] if metadata else 0.8
+    try:
+        # Only 10 cities, so this is at most 10 cache lookups per batch
+        city_costs = {}
+        for request in requests:
+            if request.city not in city_costs:
+                city_costs[request.city] = await get_city_cost_data(request.city)
+
+        # Encoding, predicting and building thousands of breakdowns is all
+        # CPU work, so the whole thing goes to the inference pool
+        breakdowns, totals = await run_inference(score_batch, bundle, requests, city_costs)
+
+        query_ids = await log_queries([
+            {
+                'city': request.city,
+                'apartment_size': request.apartment_size,
+                'dining_frequency': request.dining_frequency,
+                'car_type': request.car_type,
+                'commute_miles': request.commute_miles,
+                'predicted_cost': total,
+                'breakdown': breakdown
+            }
+            for request, breakdown, total in zip(requests, breakdowns, totals)
+        ])
+
+        confidence = get_confidence(bundle)
+
+        return FastJSONResponse([
+            build_response(request, breakdown, total, confidence, query_id)
+            for request, breakdown, total, query_id
+            in zip(requests, breakdowns, totals, query_ids)
+        ])
 
-        if r2_score > 0.9:
-            confidence = "High"
-        elif r2_score > 0.75:
-            confidence = "Medium"
-        else:
-            confidence = "Low"  # Our model is here unfortunately
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Save to database for analytics
-        query_id = save_user_query(
-            city=request.city,
-            apartment_size=request.apartment_size,
-            dining_frequency=request.dining_frequency,
-            car_type=request.car_type,
-            commute_miles=request.commute_miles,
-            predicted_cost=breakdown_total,
-            breakdown=breakdown
+
+def score_cities(bundle: ModelBundle, profile: LifestyleProfile,
+                 city_costs: List[Dict]) -> List[Dict[str, float]]:
+    """
+    One profile's 8-category breakdown in every city at once.
+
+    Builds a feature matrix with a row per COMPARE_CITIES where only the
+    city column changes and runs the models once over it. Each row then
+    goes through build_breakdown, so every city gets exactly the numbers
+    /predict gives for it - doing the rounding as array math instead was
+    off by a cent now and then.
+    """
+    codes = bundle.input_codes
+
+    features = np.empty((len(COMPARE_CITIES), 5), dtype=np.float64)
+    features[:, 0] = [codes.city.get(city, 0.0) for city in COMPARE_CITIES]
+    features[:, 1] = codes.apartment_size.get(profile.apartment_size, 0.0)
+    features[:, 2] = profile.dining_frequency
+    features[:, 3] = codes.car_type.get(profile.car_type, 0.0)
+    features[:, 4] = profile.commute_miles
+
+    base_costs = predict_base_costs(bundle, features)
+    return [build_breakdown(bundle, profile, base_costs[i], city_costs[i])
+            for i in range(len(COMPARE_CITIES))]
+
+
+def compare_key(bundle: ModelBundle, profile: LifestyleProfile) -> str:
+    """Hash of every lifestyle answer plus the model version."""
+    canonical = json.dumps({
+        **profile.model_dump(include=set(LifestyleProfile.model_fields)),
+        'model_version': bundle.model_version
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def compute_comparison(bundle: ModelBundle, profile: LifestyleProfile):
+    """Every city's (city, total, breakdown) for a profile, cheapest first."""
+    city_costs = [await get_city_cost_data(city) for city in COMPARE_CITIES]
+
+    # Table lookups take microseconds - real models go to the inference pool
+    if bundle.inference_engine == 'table':
+        breakdowns = score_cities(bundle, profile, city_costs)
+    else:
+        breakdowns = await run_inference(score_cities, bundle, profile, city_costs)
+
+    # Totalled the same way /predict does it
+    rows = [(city, round(sum(breakdown.values()), 2), breakdown)
+            for city, breakdown in zip(COMPARE_CITIES, breakdowns)]
+    rows.sort(key=lambda row: row[1])
+    return rows, None
+
+
+def affordability_label(ratio: float) -> str:
+    if ratio < AFFORDABLE_RATIO:
+        return "Affordable"
+    if ratio <= MODERATE_RATIO:
+        return "Moderate"
+    return "Expensive"
+
+
+@app.post("/compare", response_model=CompareResponse)
+async def compare_cities(request: CompareRequest):
+    """
+    Price one lifestyle profile in every city, cheapest first.
+
+    The affordability map could only color the selected city, since every
+    other city needed its own /predict call. This does all of them with
+    one model call over a 10-row matrix, and the costs get cached per
+    profile. affordability_ratio is yearly cost over salary.
+
+    Nothing gets logged to user_queries - these are what-ifs, not
+    predictions someone asked for.
+    """
+    check_ready()
+    bundle = active_bundle
+
+    try:
+        rows = await compare_cache.get_or_fill(
+            compare_key(bundle, request), lambda: compute_comparison(bundle, request)
         )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return PredictionResponse(
-            city=request.city,
-            total_monthly_cost=round(breakdown_total, 2),
+    cities = []
+    for rank, (city, total, breakdown) in enumerate(rows, start=1):
+        ratio = round(total * 12 / request.salary, 4)
+        cities.append(CityComparison(
+            city=city,
+            rank=rank,
+            total_monthly_cost=total,
             breakdown=CostBreakdown(**breakdown),
-            confidence=confidence,
-            input_summary={
-                "apartment_size": request.apartment_size,
-                "dining_frequency": f"{request.dining_frequency}x/week",
-                "car_type": request.car_type,
-                "commute_miles": f"{request.commute_miles} miles/day",
-                "entertainment": request.entertainment_budget,
-                "groceries": request.grocery_habits,
-                "fitness": request.fitness_routine,
-                "healthcare": request.healthcare_needs
-            },
-            query_id=query_id,
-            timestamp=datetime.now().isoformat()
+            affordability_ratio=ratio,
+            affordability=affordability_label(ratio)
+        ))
+
+    return CompareResponse(salary=request.salary, confidence=get_confidence(bundle),
+                           cities=cities)
+
+
+def sweep_totals(bundle: ModelBundle, request: SweepRequest, x_values: list,
+                 y_values: Optional[list], city_costs: Dict) -> np.ndarray:
+    """
+    Total monthly cost at every point of the sweep grid, in one model call.
+
+    Every point gets its own feature row - the profile's inputs with the
+    swept ones swapped in - and the whole grid is scored at once. Only
+    the model categories change across the grid, so the lookup-table
+    categories get added as one number.
+    """
+    apartment_codes = bundle.input_codes.apartment_size
+
+    def encoded(field, values):
+        if field == 'apartment_size':
+            return [apartment_codes.get(v, 0.0) for v in values]
+        return values
+
+    # Rows go y-major, so reshaping gives one row of the heatmap per y value
+    grid_shape = (len(y_values) if y_values else 1, len(x_values))
+    features = np.tile(encode_input(bundle, request)[0], (grid_shape[0] * grid_shape[1], 1))
+
+    features[:, SWEEP_COLUMNS[request.x.field]] = np.tile(
+        encoded(request.x.field, x_values), grid_shape[0])
+    if y_values:
+        features[:, SWEEP_COLUMNS[request.y.field]] = np.repeat(
+            encoded(request.y.field, y_values), grid_shape[1])
+
+    base_costs = predict_base_costs(bundle, features)
+
+    multipliers = np.array([city_costs.get('transport' if category == 'transportation' else category, 1.0)
+                            for category in bundle.metadata['categories']])
+    model_costs = round_cents(base_costs[:, 1:5] * multipliers)
+
+    # Added up column by column in build_breakdown's order, same as the
+    # sum() in /predict, so each point is exactly what /predict would say
+    totals = model_costs[:, 0].copy()
+    for i in range(1, model_costs.shape[1]):
+        totals += model_costs[:, i]
+    for cost in lifestyle_breakdown(request, city_costs).values():
+        totals += cost
+
+    return round_cents(totals).reshape(grid_shape)
+
+
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    np.round(values, 2), but always agreeing with Python's round().
+
+    np.round rounds values * 100, and that product has already been
+    rounded once - right at half a cent it can tip the other way. Those
+    few values get Python's round() instead.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in zip(*np.nonzero(near_half)):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+@app.post("/sweep", response_model=SweepResponse)
+async def sweep_cost(request: SweepRequest):
+    """
+    What-if curve or heatmap: how the total changes as one or two inputs vary.
+
+    Saves clicking "Calculate" over and over to see what moving closer to
+    work or eating out less would do. The whole grid is one model call,
+    and none of the points get logged to user_queries. Capped at
+    MAX_SWEEP_POINTS points.
+    """
+    check_ready()
+    bundle = active_bundle
+
+    x_values = request.x.values()
+    y_values = request.y.values() if request.y is not None else None
+    points = len(x_values) * (len(y_values) if y_values else 1)
+    if points > MAX_SWEEP_POINTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Sweep too large - {points} points, max {MAX_SWEEP_POINTS}"
         )
 
+    try:
+        city_costs = await get_city_cost_data(request.city)
+
+        # Table lookups take microseconds - real models go to the inference pool
+        if bundle.inference_engine == 'table':
+            totals = sweep_totals(bundle, request, x_values, y_values, city_costs)
+        else:
+            totals = await run_inference(sweep_totals, bundle, request,
+                                         x_values, y_values, city_costs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return SweepResponse(
+        city=request.city,
+        x={'field': request.x.field, 'values': x_values},
+        y={'field': request.y.field, 'values': y_values} if y_values else None,
+        totals=totals.tolist() if y_values else totals[0].tolist(),
+        points=points
+    )
+
 
 @app.get("/statistics")
-async def get_statistics():
-    """Get query statistics - useful for analytics."""
-    stats = get_query_statistics()
-    return stats
+async def get_statistics(if_none_match: Optional[str] = Header(None),
+                         if_modified_since: Optional[str] = Header(None)):
+    """
+    Get query statistics - useful for analytics.
+
+    Only re-read when the user_queries write counter has moved, so the
+    dashboard polling it mostly gets 304s.
+    """
+    check_ready(need_models=False)
+    generation, writes, updated_at = await get_query_writes_async()
+
+    async def render():
+        return await get_query_statistics_async(), updated_at
+
+    return await conditional_response('statistics', (generation, writes), render,
+                                      if_none_match, if_modified_since)
 
 
 @app.get("/recent-queries")
-async def get_recent():
-    """Get recent predictions - could use this for a history feature."""
-    queries = get_recent_queries(limit=10)
-    return {"queries": queries}
+async def get_recent(
+    limit: int = Query(10, ge=1, le=MAX_RECENT_QUERIES),
+    after: Optional[int] = Query(None, ge=1, description="id of the last query from the previous page"),
+    city: Optional[str] = None
+):
+    """
+    Get recent predictions, newest first - used for the history view.
 
+    Pages with a cursor instead of an offset: pass next_cursor from one
+    response as `after` to get the next page. That way every page is one
+    index lookup no matter how far back you go.
+    """
+    check_ready(need_models=False)
 
-@app.get("/model-info")
-async def get_model_info():
-    """Return info about the model - helps with debugging."""
-    if metadata is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    # Fetch one extra row to find out if there's another page
+    queries = await get_recent_queries_async(limit=limit + 1, after=after, city=city)
+
+    next_cursor = None
+    if len(queries) > limit:
+        queries = queries[:limit]
+        next_cursor = queries[-1]['id']
+
+    return {"queries": queries, "next_cursor": next_cursor}
+
+
+@app.get("/query-log/stats")
+async def get_query_log_stats():
+    """Queue depth and flush timings for the write-behind logger."""
+    if query_logger is None:
+        return {"enabled": False}
+    return {"enabled": True, **query_logger.stats()}
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss/eviction counters for the in-memory caches.
+
+    The table engine doesn't use the prediction memo at all (see
+    get_base_costs), so there are no counters for it to show then.
+    """
+    if uses_prediction_memo(active_bundle):
+        memo = prediction_cache.stats()
+        lookups = memo['hits'] + memo['misses']
+        memo.update({
+            'enabled': True,
+            'db_hits': prediction_db_hits,
+            'db_misses': prediction_db_misses,
+            # Requests answered without running a model, from memory or SQLite
+            'overall_hit_ratio': round((memo['hits'] + prediction_db_hits) / lookups, 4)
+            if lookups else 0.0
+        })
+    else:
+        memo = {"enabled": False, "reason": "the table engine is already a memo of every output"}
+    return {
+        "city_cache": city_cache.stats(),
+        "prediction_cache": memo,
+        "compare_cache": compare_cache.stats(),
+        "janitor": cache_janitor.stats() if cache_janitor is not None else {"enabled": False}
+    }
+
+
+@app.get("/memory")
+async def get_memory():
+    """
+    This worker's memory use (each uvicorn worker answers for itself).
 
+    uss is what the worker has to itself - that's what goes up per extra
+    worker. With memory-mapped serving artifacts the model arrays show
+    up under shared instead, since every worker maps the same pages.
+    """
+    bundle = active_bundle
     return {
-        "metrics": metadata['metrics'],
-        "features": metadata['feature_cols'],
-        "categories": metadata['categories'],
-        "encoders": {
-            k: v['classes'] for k, v in metadata['encoders'].items()
-        }
+        "pid": os.getpid(),
+        **serving_artifacts.process_memory(),
+        "model_arrays_mapped_bytes": serving_artifacts.mapped_bytes(bundle.predictor) if bundle else 0,
+        "pickled_models_loaded": bundle is not None and bundle.model is not None
+    }
+
+
+def cache_hit_ratios():
+    ratios = [({'cache': 'city'}, city_cache.stats()['hit_ratio'])]
+    if uses_prediction_memo(active_bundle):
+        ratios.append(({'cache': 'prediction'}, prediction_cache.stats()['hit_ratio']))
+    return ratios
+
+
+def model_info():
+    bundle = active_bundle
+    if bundle is None:
+        return []
+    return [({'version': bundle.model_version,
+              'engine': bundle.inference_engine,
+              'model_type': bundle.metadata.get('model_type', 'separate')}, 1)]
+
+
+def process_memory_bytes():
+    return [({'kind': kind[:-len('_bytes')]}, value)
+            for kind, value in serving_artifacts.process_memory().items()]
+
+
+metrics.register_gauge('livecost_cache_hit_ratio',
+                       'Hit ratio of the in-memory caches since startup', cache_hit_ratios)
+metrics.register_gauge('livecost_model_info',
+                       'The model bundle being served (always 1)', model_info)
+metrics.register_gauge('livecost_process_memory_bytes',
+                       'This worker\'s memory from /proc/self/smaps_rollup', process_memory_bytes)
+metrics.register_gauge('livecost_ready', '1 once the database and models are ready',
+                       lambda: [({}, int(models_state == 'ready' and database_ready))])
+metrics.register_gauge('livecost_query_log_queue_depth',
+                       'Rows waiting in the write-behind query logger',
+                       lambda: [({}, query_logger.stats()['queue_depth'])]
+                       if query_logger is not None else [])
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Everything above in the Prometheus text format, for scraping.
+
+    Like /memory this is per worker - with several uvicorn workers,
+    each scrape lands on whichever one picks it up.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/admin/retrain", status_code=202)
+async def start_retrain(fused: bool = False, incremental: bool = False,
+                        x_admin_token: Optional[str] = Header(None)):
+    """
+    Retrain the models in the background and hot-swap them in.
+
+    incremental=true only adds trees for rows appended to the data since
+    the served models were trained (train_model.py --incremental).
+    Returns right away - poll GET /admin/retrain for progress.
+    """
+    global retrain_job, retrain_task
+    check_admin(x_admin_token)
+
+    if retrain_job is not None and retrain_job['state'] in ('training', 'loading'):
+        raise HTTPException(status_code=409, detail="A retrain is already running")
+
+    retrain_job = {
+        'state': 'training',
+        'fused': fused,
+        'incremental': incremental,
+        'started_at': datetime.now().isoformat()
     }
+    retrain_task = asyncio.create_task(run_retrain(retrain_job))
+    return retrain_job
+
+
+@app.get("/admin/retrain")
+async def get_retrain_status(x_admin_token: Optional[str] = Header(None)):
+    """Progress of the latest retrain (training -> loading -> succeeded/failed)."""
+    check_admin(x_admin_token)
+    if retrain_job is None:
+        return {'state': 'idle'}
+    return retrain_job
+
+
+@app.post("/admin/profile")
+async def profile_requests(mode: Literal['cprofile', 'sample'] = 'sample',
+                           requests: int = Query(100, ge=1),
+                           seconds: float = Query(30, gt=0, le=300),
+                           x_admin_token: Optional[str] = Header(None)):
+    """
+    Profile the next `requests` /predict calls (or `seconds`, whichever
+    comes first) and return the dump.
+
+    Blocks until it's done. mode=sample gives collapsed stacks for a
+    flame graph, mode=cprofile a pstats file:
+
+        curl -X POST -H "X-Admin-Token: ..." \\
+            "localhost:8000/admin/profile?mode=cprofile&requests=200" > predict.prof
+        python -m pstats predict.prof
+    """
+    global profile_session
+    check_admin(x_admin_token)
+
+    if profile_session is not None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    session = ProfileSession(mode, requests, seconds)
+    profile_session = session
+    try:
+        session.start()
+        await session.wait()
+    finally:
+        profile_session = None
+
+    content, media_type = session.result()
+    summary = session.summary()
+    print(f"Profiled {summary['requests']} requests over {summary['seconds']}s ({mode})")
+    return Response(content=content, media_type=media_type, headers={
+        'X-Profile-Requests': str(summary['requests']),
+        'X-Profile-Seconds': str(summary['seconds'])
+    })
+
+
+@app.get("/model-info")
+async def get_model_info(if_none_match: Optional[str] = Header(None),
+                         if_modified_since: Optional[str] = Header(None)):
+    """Return info about the model - helps with debugging."""
+    check_ready()
+    bundle = active_bundle
+    metadata = bundle.metadata
+
+    def render():
+        return {
+            "metrics": metadata['metrics'],
+            "output_metrics": metadata.get('output_metrics', {}),
+            "model_type": metadata.get('model_type', 'separate'),
+            "inference_engine": bundle.inference_engine,
+            "model_version": bundle.model_version,
+            "features": metadata['feature_cols'],
+            "categories": metadata['categories'],
+            "encoders": {
+                k: v['classes'] for k, v in metadata['encoders'].items()
+            }
+        }, model_modified_at(bundle)
+
+    return await conditional_response('model-info', bundle.model_version, render,
+                                      if_none_match, if_modified_since)
 
 
 if __name__ == "__main__":
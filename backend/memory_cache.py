@@ -0,0 +1,153 @@
+"""
+LiveCost In-Memory Cache - memory_cache.py
+
+Small in-process cache that sits in front of SQLite (the L2 cache).
+
+Even a cache hit in api_cache meant a trip to SQLite plus parsing the
+JSON blob again on every single request, for data that only has 10
+possible keys. This keeps the parsed values in memory:
+
+- Per-entry TTL so nothing outlives the SQLite entry it came from
+- LRU eviction once it hits max_entries (for when the city list grows)
+- Single-flight fills: if 50 requests miss on the same key at once,
+  only one of them goes to the database and the rest wait for it
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Returned by get() when there's nothing usable for the key, since None
+# could be a real cached value
+MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU cache where every entry also has its own expiry time.
+
+    Not thread-safe - it's meant to be used from the event loop, which is
+    the only place the async endpoints touch it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (value, expires_at on the monotonic clock)
+        self._entries: OrderedDict = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.fills = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value for key, or MISSING if it's not there or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_fill(self, key: Hashable,
+                          fill: Callable[[], Awaitable[Tuple[Any, Optional[float]]]]) -> Any:
+        """
+        Cached value for key, calling fill() on a miss.
+
+        fill() returns (value, ttl_seconds) - ttl_seconds can be None to
+        use the default. Only one fill runs per key at a time; anyone else
+        who misses on that key while it's running just waits for its result.
+        If fill() raises, the waiters get the same exception. If the caller
+        running it gets cancelled, one of the waiters runs the fill again.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            value = await asyncio.shield(inflight)
+            if value is not MISSING:
+                return value
+            # The request doing the fill got cancelled (client went away,
+            # shutdown...) - that's not our problem, so take over the fill
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value, ttl = await fill()
+            self.fills += 1
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            # A real failure - everyone waiting on this fill gets it too
+            future.set_exception(e)
+            # Mark it retrieved so asyncio doesn't warn when nobody was waiting
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled - tell the waiters to retry instead of cancelling them
+            future.set_result(MISSING)
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'fills': self.fills,
+            'coalesced_fills': self.coalesced
+        }
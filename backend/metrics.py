@@ -0,0 +1,267 @@
+"""
+LiveCost Metrics - metrics.py
+
+Prometheus-style counters and histograms for GET /metrics, without
+pulling in prometheus_client.
+
+The point was to see where /predict time actually goes, so observing has
+to be cheap enough to leave on all the time - a few hundred nanoseconds
+per observation:
+
+- No locks on the hot path. Every thread gets its own shard of counts
+  (the event loop thread, each inference pool thread...) and /metrics
+  adds the shards up when it's scraped. Only creating a new shard takes
+  a lock, once per thread per metric.
+- Stage timing is one perf_counter() call per stage: since(start)
+  records the time since `start` and hands back "now" as the start of
+  the next stage.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds - 10us up to 2.5s, since most
+# stages are microseconds but a cold database write can take a while
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5)
+
+# Everything that shows up on /metrics, in registration order
+_metrics: List = []
+_gauges: List[Tuple[str, str, Callable]] = []
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded(ABC):
+    """Per-thread shards that get merged when /metrics is scraped."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List = []
+        self._shards_lock = threading.Lock()
+
+    @abstractmethod
+    def _new_shard(self):
+        """A zeroed shard for the calling thread."""
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._new_shard()
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+
+class Histogram(_Sharded):
+    """One labelled histogram series (e.g. stage="encode_input")."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self.bounds = tuple(buckets)
+        _metrics.append(self)
+
+    def _new_shard(self):
+        # One count per bucket (not cumulative - that happens at scrape
+        # time), one for +Inf, then the running sum at the end
+        return [0] * (len(self.bounds) + 1) + [0.0]
+
+    def observe(self, seconds: float):
+        shard = self._shard()
+        shard[bisect_left(self.bounds, seconds)] += 1
+        shard[-1] += seconds
+
+    def since(self, start: float) -> float:
+        """Record the time since `start` and return now (the next stage's start)."""
+        now = time.perf_counter()
+        self.observe(now - start)
+        return now
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(per-bucket counts incl. +Inf, sum) across every thread."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for shard in shards:
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        return counts, total
+
+    def render(self) -> List[str]:
+        counts, total = self.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels({**self.labels, 'le': _format_value(float(bound))})
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labels)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Counter(_Sharded):
+    """Counter keyed on a tuple of label values (e.g. method, path, status)."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        _metrics.append(self)
+
+    def _new_shard(self):
+        return {}
+
+    def inc(self, label_values: Tuple = (), amount: float = 1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals: Dict[Tuple, float] = {}
+        for shard in shards:
+            # list() because the owning thread may add keys while we read
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0) + value
+        return [f'{self.name}{_format_labels(dict(zip(self.label_names, key)))} {_format_value(value)}'
+                for key, value in sorted(totals.items())]
+
+
+def register_gauge(name: str, help_text: str,
+                   collect: Callable[[], List[Tuple[Dict[str, str], float]]]):
+    """A gauge read at scrape time - collect() returns [(labels, value), ...]."""
+    _gauges.append((name, help_text, collect))
+
+
+def render() -> str:
+    """Everything in the Prometheus text exposition format (version 0.0.4)."""
+    # Series of the same histogram have to be listed together under one
+    # HELP/TYPE header, even if they got created at different times
+    families: Dict[str, List] = {}
+    for metric in list(_metrics):
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, series in families.items():
+        lines.append(f'# HELP {name} {series[0].help_text}')
+        lines.append(f'# TYPE {name} {series[0].type_name}')
+        for metric in series:
+            lines.extend(metric.render())
+
+    for name, help_text, collect in _gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in collect():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# PlainTextResponse adds the charset
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# ---- HTTP request metrics ----
+HTTP_REQUESTS = Counter('livecost_http_requests_total',
+                        'HTTP requests by method, path and status code',
+                        ('method', 'path', 'status'))
+
+_histograms: Dict[Tuple, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name: str, help_text: str, **labels: str) -> Histogram:
+    """The series for `labels`, created the first time it's asked for."""
+    key = (name, tuple(sorted(labels.items())))
+    series = _histograms.get(key)
+    if series is None:
+        with _histograms_lock:
+            series = _histograms.get(key)
+            if series is None:
+                series = _histograms[key] = Histogram(name, help_text, labels)
+    return series
+
+
+def request_duration(path: str) -> Histogram:
+    return histogram('livecost_http_request_duration_seconds',
+                     'Time from request received to response sent, by path', path=path)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware that counts and times every HTTP request.
+
+    Not Starlette's BaseHTTPMiddleware - that one adds tens of
+    microseconds per request on its own. Paths that aren't real routes
+    (404 scans etc.) all get counted as "other" so the label set can't
+    grow without limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = self._label_path(scope)
+            HTTP_REQUESTS.inc((scope['method'], path, str(status)))
+            request_duration(path).since(start)
+
+    def _label_path(self, scope) -> str:
+        if self._route_paths is None:
+            app = scope.get('app')
+            routes = getattr(app, 'routes', None)
+            if routes is None:
+                return 'other'
+            self._route_paths = {getattr(route, 'path', None) for route in routes}
+        return scope['path'] if scope['path'] in self._route_paths else 'other'
@@ -0,0 +1,104 @@
+"""
+LiveCost Model Store - model_store.py
+
+Keeps track of versioned model artifacts for retraining.
+
+Running train_model.py by hand writes straight into the backend folder,
+same as always. A retrain from the API (POST /admin/retrain) trains into
+its own folder under model_versions/ instead, so the files the server
+is currently serving never get overwritten underneath it. Once the new
+models load and check out, CURRENT gets pointed at that folder, so a
+restart keeps serving them.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_VERSIONS_DIR = os.path.join(SCRIPT_DIR, 'model_versions')
+
+# Holds the folder name of the version being served
+CURRENT_FILE = os.path.join(MODEL_VERSIONS_DIR, 'CURRENT')
+
+# Old versions to keep around (besides the active one) in case we want to
+# look at or roll back to them
+KEEP_VERSIONS = 3
+
+# train_model.py --incremental exits with this when there's no new data to
+# train on, so a retrain from the API can tell that apart from a failure
+NO_NEW_DATA_EXIT_CODE = 3
+
+
+def new_version_dir() -> str:
+    """Create an empty folder for a new set of artifacts and return its path."""
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    path = os.path.join(MODEL_VERSIONS_DIR, name)
+    os.makedirs(path)
+    return path
+
+
+def current_version() -> Optional[str]:
+    """Name of the version CURRENT points at, or None (cheap enough to poll)."""
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def active_model_dir() -> str:
+    """Folder the server should load models from."""
+    try:
+        with open(CURRENT_FILE) as f:
+            version_dir = os.path.join(MODEL_VERSIONS_DIR, f.read().strip())
+    except FileNotFoundError:
+        return SCRIPT_DIR
+
+    if os.path.isdir(version_dir):
+        return version_dir
+
+    print(f"Model version in {CURRENT_FILE} is missing - using {SCRIPT_DIR}")
+    return SCRIPT_DIR
+
+
+def set_active_version(version_dir: str):
+    """Point CURRENT at a version folder (atomically - it's a rename)."""
+    temp_path = CURRENT_FILE + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(os.path.basename(version_dir))
+    os.replace(temp_path, CURRENT_FILE)
+
+
+def clear_active_version():
+    """Go back to serving the artifacts in the backend folder."""
+    try:
+        os.remove(CURRENT_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def discard_version(version_dir: str):
+    """Delete a version folder that never went live."""
+    shutil.rmtree(version_dir, ignore_errors=True)
+
+
+def prune_versions(keep: int = KEEP_VERSIONS):
+    """Delete all but the newest `keep` inactive version folders."""
+    if not os.path.isdir(MODEL_VERSIONS_DIR):
+        return
+
+    active = os.path.basename(active_model_dir())
+    versions = sorted(
+        name for name in os.listdir(MODEL_VERSIONS_DIR)
+        if os.path.isdir(os.path.join(MODEL_VERSIONS_DIR, name)) and name != active
+    )
+
+    for name in versions[:max(0, len(versions) - keep)]:
+        shutil.rmtree(os.path.join(MODEL_VERSIONS_DIR, name), ignore_errors=True)
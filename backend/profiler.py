@@ -0,0 +1,160 @@
+"""
+LiveCost Profiler - profiler.py
+
+On-demand profiling of the live server (POST /admin/profile).
+
+/metrics says which stage of /predict got slow, but not which function
+inside it. A session profiles the next N /predict requests or T seconds,
+whichever comes first, and hands back a dump. Two modes:
+
+- 'cprofile': deterministic, every call on the event loop thread gets
+  counted. Returns a binary pstats dump (python -m pstats, snakeviz...).
+  Doesn't see the inference pool threads, and slows things down a lot
+  while it's on.
+- 'sample': a background thread grabs every thread's stack every few
+  milliseconds. Returns collapsed stacks ("thread;outer;inner count"
+  lines) for flamegraph.pl or speedscope. Much lower overhead and
+  covers the pool threads too.
+
+When no session is running, the only cost per request is main.py
+checking a global for None.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+MODES = ('cprofile', 'sample')
+
+# Hard cap on how long one session can run
+MAX_SECONDS = 300
+
+# Time between stack samples in 'sample' mode
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+class StackSampler:
+    """Background thread counting how often each stack shows up."""
+
+    def __init__(self, interval_seconds: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval_seconds
+        self.samples = 0
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='livecost-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                key = ';'.join([names.get(thread_id, str(thread_id))] + frame_names(frame))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, heaviest stacks first."""
+        lines = [f'{stack} {count}' for stack, count
+                 in sorted(self.stacks.items(), key=lambda item: -item[1])]
+        return '\n'.join(lines) + '\n'
+
+
+def frame_names(frame) -> list:
+    """Function names from the outermost frame in, like 'predict_cost (main.py:1050)'."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class ProfileSession:
+    """
+    One profiling run. Create it, start() it, then await wait() for it to
+    finish - after that result() has the dump.
+
+    Everything except the sampler thread runs on the event loop thread,
+    which matters for cProfile - it only profiles the thread that
+    enabled it.
+    """
+
+    def __init__(self, mode: str, max_requests: int, max_seconds: float):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (pick one of {', '.join(MODES)})")
+        self.mode = mode
+        self.max_requests = max_requests
+        self.max_seconds = min(max_seconds, MAX_SECONDS)
+
+        self.requests = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._done = asyncio.Event()
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+
+    def request_done(self):
+        """Called by /predict as each request finishes."""
+        self.requests += 1
+        if self.requests >= self.max_requests:
+            self._done.set()
+
+    async def wait(self):
+        """Run until enough requests went through or time's up, then stop."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout=self.max_seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'requests': self.requests,
+            'seconds': round(self.elapsed, 3),
+            'samples': self._sampler.samples if self._sampler is not None else None
+        }
+
+    def result(self) -> Tuple[bytes, str]:
+        """(dump, media type) - a pstats file or collapsed stack text."""
+        if self._profile is not None:
+            # Same bytes Profile.dump_stats() would write to a file
+            self._profile.create_stats()
+            return marshal.dumps(self._profile.stats), 'application/octet-stream'
+        return self._sampler.collapsed().encode(), 'text/plain'
@@ -0,0 +1,238 @@
+"""
+LiveCost Write-Behind Query Logger - query_logger.py
+
+Optional replacement for calling save_user_query on every prediction.
+
+Every save_user_query is its own INSERT + commit, and the commit waits
+on the disk, so that latency landed directly on every /predict response.
+With the write-behind logger the request just drops the row in an
+in-memory queue and moves on. A background task writes everything queued
+up in one transaction every FLUSH_ROWS rows or FLUSH_INTERVAL_MS
+milliseconds, whichever comes first.
+
+The catch: query_id still has to go back in the response right away. So
+the logger reserves a block of ids from SQLite up front (bumps the
+AUTOINCREMENT counter) and hands them out from memory. Reserving only
+touches the database once every ID_BLOCK_SIZE queries.
+
+Trade-off to know about: rows sitting in the queue when the process gets
+killed -9 are lost (a normal shutdown flushes everything). That's fine
+for analytics logging, which is all user_queries is used for.
+
+A failed flush gets retried a few times, then the batch is split in
+halves to find the rows that actually fail. Those go to a small
+dead-letter list instead of blocking every row behind them, and get
+counted in stats(). Same if the database is down long enough for the
+queue to hit MAX_QUEUE_ROWS - the oldest rows get dropped.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from database import reserve_query_ids_async, insert_user_queries_async
+
+# Flush once this many rows are waiting...
+FLUSH_ROWS = 500
+
+# ...or once the oldest row has waited this long
+FLUSH_INTERVAL_MS = 50
+
+# How many query ids to reserve at a time
+ID_BLOCK_SIZE = 1000
+
+# If the database falls behind this badly, log() waits for a flush
+# instead of letting the queue eat all the memory - and if that flush
+# fails too, the oldest rows get dropped to stay under it
+MAX_QUEUE_ROWS = 50000
+
+# Flushes in a row a batch can fail before it gets split up
+MAX_FLUSH_RETRIES = 3
+
+# Dropped rows kept around to look at (the count keeps going past this)
+DEAD_LETTER_ROWS = 1000
+
+
+class QueryLogger:
+    """Queues prediction queries and writes them in batches."""
+
+    def __init__(self, flush_rows: int = FLUSH_ROWS,
+                 flush_interval_ms: float = FLUSH_INTERVAL_MS,
+                 id_block_size: int = ID_BLOCK_SIZE,
+                 max_queue_rows: int = MAX_QUEUE_ROWS,
+                 max_flush_retries: int = MAX_FLUSH_RETRIES):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.id_block_size = id_block_size
+        self.max_queue_rows = max_queue_rows
+        self.max_flush_retries = max_flush_retries
+
+        self._queue: List[tuple] = []
+        self._failed_flushes = 0
+
+        # (query_id, query, error) for the most recent rows that got dropped
+        self.dead_letter: deque = deque(maxlen=DEAD_LETTER_ROWS)
+        self._next_id = 0
+        self._block_end = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._id_lock: Optional[asyncio.Lock] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+        # Counters for stats()
+        self.rows_logged = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.rows_dropped = 0
+        self.max_queue_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    async def start(self):
+        """Start the background flush task (call from the startup hook)."""
+        self._wakeup = asyncio.Event()
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out everything still queued."""
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _reserve_ids(self, count: int):
+        """Make sure at least `count` ids are left in the current block."""
+        async with self._id_lock:
+            if self._block_end - self._next_id >= count:
+                return
+            block = max(self.id_block_size, count)
+            first_id = await reserve_query_ids_async(block)
+            self._next_id = first_id
+            self._block_end = first_id + block
+
+    async def log_many(self, queries: List[Dict[str, Any]]) -> List[int]:
+        """
+        Queue a list of queries (same dicts as save_user_queries) and
+        return their ids right away.
+        """
+        # Loop because other requests can use up the new block while we
+        # wait for the reservation - allocating below has no awaits in it
+        while self._block_end - self._next_id < len(queries):
+            await self._reserve_ids(len(queries))
+
+        first_id = self._next_id
+        self._next_id += len(queries)
+        query_ids = list(range(first_id, first_id + len(queries)))
+
+        self._queue.extend(zip(query_ids, queries))
+        self.rows_logged += len(queries)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+        if len(self._queue) >= self.max_queue_rows:
+            await self.flush()
+            # Still full means the database is failing - drop the oldest
+            # rows rather than growing without bound
+            overflow = len(self._queue) - self.max_queue_rows
+            if overflow > 0:
+                self._drop(self._queue[:overflow], 'queue full')
+                self._queue = self._queue[overflow:]
+        elif len(self._queue) >= self.flush_rows:
+            self._wakeup.set()
+
+        return query_ids
+
+    async def log(self, query: Dict[str, Any]) -> int:
+        """Queue one query and return its id."""
+        return (await self.log_many([query]))[0]
+
+    async def flush(self):
+        """Write everything queued so far in one transaction."""
+        async with self._flush_lock:
+            if not self._queue:
+                return
+
+            rows, self._queue = self._queue, []
+            start = time.perf_counter()
+            try:
+                await insert_user_queries_async(rows)
+            except Exception as e:
+                self.flush_errors += 1
+                self._failed_flushes += 1
+                if self._failed_flushes < self.max_flush_retries:
+                    # Put them back in front so the next flush retries them
+                    self._queue = rows + self._queue
+                    print(f"Query log flush failed ({e}) - will retry")
+                    return
+
+                print(f"Query log flush failed {self._failed_flushes} times ({e}) - "
+                      f"splitting the batch to find the bad rows")
+                written = await self._write_split(rows)
+            else:
+                written = len(rows)
+            self._failed_flushes = 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.rows_flushed += written
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    async def _write_split(self, rows: List[tuple]) -> int:
+        """
+        Write rows in smaller and smaller halves, dropping the single rows
+        that still fail. Returns how many got written.
+        """
+        try:
+            await insert_user_queries_async(rows)
+            return len(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                self._drop(rows, str(e))
+                return 0
+        middle = len(rows) // 2
+        return await self._write_split(rows[:middle]) + await self._write_split(rows[middle:])
+
+    def _drop(self, rows: List[tuple], error: str):
+        self.rows_dropped += len(rows)
+        self.dead_letter.extend((query_id, query, error) for query_id, query in rows)
+        print(f"Dropped {len(rows)} query log row(s): {error}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush counters."""
+        return {
+            'queue_depth': len(self._queue),
+            'max_queue_depth': self.max_queue_depth,
+            'rows_logged': self.rows_logged,
+            'rows_flushed': self.rows_flushed,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'rows_dropped': self.rows_dropped,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            'ids_left_in_block': self._block_end - self._next_id
+        }
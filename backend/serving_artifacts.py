@@ -0,0 +1,192 @@
+"""
+LiveCost Serving Artifacts - serving_artifacts.py
+
+Memory-mapped copies of what the API actually serves from.
+
+With `uvicorn --workers N` every worker used to joblib.load its own
+private copy of all five forests, so memory went up by a full set of
+models per worker. The forests don't even get used for serving with the
+table or numpy engines - just the arrays built from them.
+
+So train_model.py also saves those arrays - the flattened trees
+(tree_engine.py) and the lookup table (lookup_table.py) - as plain
+uncompressed .npy files in serving/. Workers open them with
+np.load(mmap_mode='r'): the OS keeps one copy in the page cache and every
+worker maps that same copy, and nothing gets unpickled at startup.
+
+manifest.json records the hash of the pickles the arrays came from, so
+stale arrays are never used (the server rebuilds them from the pickles
+instead). The sklearn engine still needs the real forests and loads the
+pickles like before.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+import lookup_table
+import tree_engine
+
+SERVING_DIRNAME = 'serving'
+MANIFEST_FILENAME = 'manifest.json'
+
+# Bump if the array layout changes so old folders get rebuilt
+FORMAT_VERSION = 1
+
+
+def serving_dir(model_dir: str) -> str:
+    return os.path.join(model_dir, SERVING_DIRNAME)
+
+
+def export(model, breakdown_models: Optional[Dict], metadata: Dict, model_dir: str,
+           table: Optional[lookup_table.PredictionTable] = None,
+           ensemble: Optional[tree_engine.TreeEnsemble] = None) -> str:
+    """
+    Write the serving arrays for the models in model_dir.
+
+    Builds whichever of the table / flattened trees wasn't passed in.
+    Everything gets written to a temp folder first and renamed into place,
+    so a worker starting up at the same time never sees half the files
+    (and two workers exporting at once can't clobber each other).
+    """
+    signature = lookup_table.artifact_signature(model_dir)
+
+    start = time.perf_counter()
+    if table is None:
+        table = lookup_table.build_table(model, breakdown_models, metadata, signature)
+    if ensemble is None:
+        ensemble = tree_engine.from_models(model, breakdown_models)
+
+    temp_dir = tempfile.mkdtemp(prefix='.serving-', dir=model_dir)
+    os.chmod(temp_dir, 0o755)  # mkdtemp makes it owner-only
+    arrays = {}
+    for prefix, source in (('table', table), ('tree', ensemble)):
+        for name in source.ARRAYS:
+            filename = f'{prefix}_{name}.npy'
+            array = np.ascontiguousarray(getattr(source, name))
+            np.save(os.path.join(temp_dir, filename), array)
+            arrays[filename] = array.nbytes
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'signature': signature,
+        'max_depth': ensemble.max_depth,
+        'arrays': arrays
+    }
+    with open(os.path.join(temp_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    final_dir = serving_dir(model_dir)
+    old_dir = f'{temp_dir}.old'
+    try:
+        if os.path.exists(final_dir):
+            os.rename(final_dir, old_dir)
+        os.rename(temp_dir, final_dir)
+    except OSError:
+        # Someone else swapped theirs in first - theirs is just as good
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"Serving artifacts saved to: {final_dir}")
+    print(f"  {sum(arrays.values()) / 1024:.0f} KB of arrays "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    return final_dir
+
+
+def read_manifest(model_dir: str) -> Optional[Dict]:
+    """The manifest if the serving arrays are there and match the pickles."""
+    path = os.path.join(serving_dir(model_dir), MANIFEST_FILENAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('format') != FORMAT_VERSION:
+        return None
+    if manifest.get('signature') != lookup_table.artifact_signature(model_dir):
+        return None
+    return manifest
+
+
+def load(model_dir: str, engine: str):
+    """
+    Memory-map the predictor for `engine` ('table' or 'numpy').
+
+    Returns None if there are no up-to-date serving arrays - the caller
+    falls back to the pickles.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        return None
+
+    folder = serving_dir(model_dir)
+
+    def mapped(prefix: str, name: str) -> np.ndarray:
+        return np.load(os.path.join(folder, f'{prefix}_{name}.npy'), mmap_mode='r')
+
+    try:
+        if engine == 'table':
+            arrays = {name: mapped('table', name)
+                      for name in lookup_table.PredictionTable.ARRAYS}
+            return lookup_table.PredictionTable(signature=manifest['signature'], **arrays)
+        if engine == 'numpy':
+            arrays = {name: mapped('tree', name)
+                      for name in tree_engine.TreeEnsemble.ARRAYS}
+            return tree_engine.TreeEnsemble(max_depth=manifest['max_depth'], **arrays)
+    except (OSError, ValueError) as e:
+        # The folder got swapped out mid-load or a file is damaged
+        print(f"Couldn't map serving artifacts ({e}) - loading the pickles instead")
+        return None
+
+    raise ValueError(f"No serving artifacts for the '{engine}' engine")
+
+
+def mapped_bytes(predictor) -> int:
+    """How much of a predictor's array data is memory-mapped (shared) vs its own."""
+    total = 0
+    for name in getattr(predictor, 'ARRAYS', []):
+        array = getattr(predictor, name)
+        if isinstance(array, np.memmap):
+            total += array.nbytes
+    return total
+
+
+def process_memory(pid: str = 'self') -> Dict[str, int]:
+    """
+    A process's memory use from /proc/<pid>/smaps_rollup (Linux only).
+
+    - rss: everything resident, shared pages counted in full
+    - pss: shared pages split evenly between the processes sharing them
+    - uss: pages only this process has - roughly what one more worker costs
+
+    Empty dict if the kernel doesn't give us smaps_rollup.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    fields = {}
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].endswith(':'):
+            fields[parts[0][:-1]] = int(parts[1]) * 1024  # reported in kB
+
+    return {
+        'rss_bytes': fields.get('Rss', 0),
+        'pss_bytes': fields.get('Pss', 0),
+        'uss_bytes': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared_bytes': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    }
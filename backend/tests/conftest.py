@@ -0,0 +1,45 @@
+"""
+Shared test setup - puts the backend folder on the import path so the
+tests can import main, database, etc. the same way the server does.
+
+Run from the backend folder:
+    python -m pytest -q
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh livecost.db in a temp folder, set up like the server does."""
+    import database
+
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'livecost.db'))
+    database.init_database()
+    yield database
+    database.close_connections()
+
+
+def run_async(coro):
+    """Run a coroutine, then close the async pool it opened on that loop."""
+    import database
+
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await database.close_async_pool()
+
+    return asyncio.run(wrapper())
+
+
+@pytest.fixture
+def run():
+    return run_async
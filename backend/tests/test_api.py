@@ -0,0 +1,471 @@
+"""Endpoint tests, run in-process against a temp database (main.py)."""
+
+import asyncio
+import marshal
+import os
+import shutil
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import model_store
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACTS = ['livecost_model.pkl', 'breakdown_models.pkl', 'model_metadata.json', 'serving']
+
+PROFILE = {
+    'city': 'Chicago',
+    'apartment_size': '2BR',
+    'dining_frequency': 4,
+    'car_type': 'suv',
+    'commute_miles': 18.0
+}
+
+
+@pytest.fixture
+def client(temp_db):
+    """The app on a temp database, without the startup hooks (no warm-up task)."""
+    main.prepare_database()
+    # Rendered bodies from an earlier test's database
+    main.rendered_responses.clear()
+    if main.active_bundle is None:
+        main.load_models()
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize('path', ['/cities', '/model-info', '/health', '/statistics'])
+def test_matching_etag_gets_304(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    assert first.headers['cache-control']
+    etag = first.headers['etag']
+
+    again = client.get(path, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.content == b''
+    assert again.headers['etag'] == etag
+
+    # Weak form and lists count as a match too
+    assert client.get(path, headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+    assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client):
+    first = client.get('/model-info')
+    last_modified = first.headers['last-modified']
+    assert client.get('/model-info', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/model-info', headers={
+        'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'}).status_code == 200
+
+
+def test_statistics_etag_changes_when_a_query_is_logged(client):
+    first = client.get('/statistics')
+    etag = first.headers['etag']
+
+    assert client.post('/predict', json=PROFILE).status_code == 200
+
+    after = client.get('/statistics', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['etag'] != etag
+    assert after.json()['total_queries'] == first.json()['total_queries'] + 1
+    assert client.get('/statistics', headers={
+        'If-None-Match': after.headers['etag']}).status_code == 304
+
+
+def test_recent_queries_cursor_pages(client):
+    ids = [client.post('/predict', json=PROFILE).json()['query_id'] for _ in range(5)]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor is not None:
+            params['after'] = cursor
+        page = client.get('/recent-queries', params=params).json()
+        seen += [query['id'] for query in page['queries']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+@pytest.fixture
+def model_versions(client, tmp_path, monkeypatch):
+    """model_versions/ in a temp folder, and the original bundle back afterwards."""
+    versions_dir = tmp_path / 'model_versions'
+    monkeypatch.setattr(model_store, 'MODEL_VERSIONS_DIR', str(versions_dir))
+    monkeypatch.setattr(model_store, 'CURRENT_FILE', str(versions_dir / 'CURRENT'))
+    serving = main.active_bundle
+    yield versions_dir
+    main.swap_bundle(serving)
+
+
+def copy_artifacts(model_dir):
+    # serving/ isn't committed - if it's not there, load_bundle builds it
+    for name in ARTIFACTS:
+        source = os.path.join(BACKEND_DIR, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(model_dir, name))
+        elif os.path.exists(source):
+            shutil.copy(source, model_dir)
+
+
+class FakeTraining:
+    """Stands in for the train_model.py subprocess - copies the committed models."""
+
+    def __init__(self, returncode=0):
+        self.returncode = returncode
+
+    async def __call__(self, *args, **kwargs):
+        if self.returncode == 0:
+            copy_artifacts(args[args.index('--output-dir') + 1])
+        return self
+
+    async def wait(self):
+        return self.returncode
+
+
+def new_job():
+    return {'state': 'training', 'fused': False, 'incremental': False}
+
+
+def test_retrain_swaps_in_the_new_version(model_versions, run, monkeypatch):
+    monkeypatch.setattr(main.asyncio, 'create_subprocess_exec', FakeTraining())
+    job = new_job()
+    run(main.run_retrain(job))
+
+    assert job['state'] == 'succeeded'
+    assert main.active_bundle.model_dir == str(model_versions / job['version'])
+    assert model_store.current_version() == job['version']
+
+
+def test_failed_training_leaves_the_old_models(model_versions, run, monkeypatch):
+    monkeypatch.setattr(main.asyncio, 'create_subprocess_exec', FakeTraining(returncode=1))
+    serving = main.active_bundle
+    job = new_job()
+    run(main.run_retrain(job))
+
+    assert job['state'] == 'failed'
+    assert main.active_bundle is serving
+    assert model_store.current_version() is None
+
+
+def test_retrain_fails_cleanly_when_the_version_folder_cant_be_made(model_versions, run,
+                                                                     monkeypatch):
+    def disk_full():
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(model_store, 'new_version_dir', disk_full)
+    job = new_job()
+    run(main.run_retrain(job))
+
+    assert job['state'] == 'failed'
+    assert 'No space left' in job['error']
+
+
+def test_other_workers_pick_up_a_new_version(model_versions, run):
+    # Another worker retrained and moved CURRENT
+    version_dir = model_versions / 'from-another-worker'
+    version_dir.mkdir(parents=True)
+    copy_artifacts(str(version_dir))
+    model_store.set_active_version(str(version_dir))
+
+    seen = run(main.sync_model_version(None))
+    assert seen == 'from-another-worker'
+    assert main.active_bundle.model_dir == str(version_dir)
+
+    # Nothing moved - nothing reloads
+    bundle = main.active_bundle
+    assert run(main.sync_model_version(seen)) == seen
+    assert main.active_bundle is bundle
+
+
+def test_broken_version_keeps_the_current_models(model_versions, run):
+    version_dir = model_versions / 'broken'
+    version_dir.mkdir(parents=True)
+    model_store.set_active_version(str(version_dir))
+    serving = main.active_bundle
+
+    assert run(main.sync_model_version(None)) == 'broken'
+    assert main.active_bundle is serving
+
+
+def test_predict_sends_server_timing(client):
+    response = client.post('/predict', json=PROFILE)
+    timings = dict(part.split(';dur=') for part in response.headers['server-timing'].split(', '))
+
+    assert list(timings) == ['encode', 'cache', 'inference', 'breakdown', 'db',
+                             'serialize', 'total']
+    assert all(float(ms) >= 0 for ms in timings.values())
+    assert 'timing-allow-origin' in response.headers
+
+
+@pytest.mark.parametrize('token', [None, 'wrong', 'secret-but-longer'])
+def test_admin_endpoints_need_the_token(client, monkeypatch, token):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+    headers = {'X-Admin-Token': token} if token else {}
+
+    assert client.get('/admin/retrain', headers=headers).status_code == 403
+    assert client.post('/admin/profile', headers=headers).status_code == 403
+    assert client.get('/admin/retrain', headers={'X-Admin-Token': 'secret'}).status_code == 200
+
+
+def test_admin_endpoints_are_off_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', None)
+    assert client.get('/admin/retrain', headers={'X-Admin-Token': ''}).status_code == 403
+
+
+def test_profile_covers_the_next_requests(client, run, monkeypatch):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+
+    async def scenario():
+        async with httpx.AsyncClient(app=main.app, base_url='http://test') as http:
+            profile = asyncio.create_task(http.post(
+                '/admin/profile', params={'mode': 'cprofile', 'requests': 3, 'seconds': 30},
+                headers={'X-Admin-Token': 'secret'}))
+            while main.profile_session is None:
+                await asyncio.sleep(0.01)
+            for _ in range(3):
+                await http.post('/predict', json=PROFILE)
+            return await profile
+
+    response = run(scenario())
+    assert response.status_code == 200
+    assert response.headers['x-profile-requests'] == '3'
+    # A pstats dump - (file, line, function) -> timings
+    stats = marshal.loads(response.content)
+    assert any(function == 'predict_cost' for _, _, function in stats)
+
+
+def prediction_results_rows(db):
+    conn = db.get_connection()
+    count = conn.execute('SELECT COUNT(*) FROM prediction_results').fetchone()[0]
+    db.release_connection(conn)
+    return count
+
+
+@pytest.fixture
+def numpy_engine(client):
+    """Serve with the numpy engine - the prediction memo only runs for numpy/sklearn."""
+    serving = main.active_bundle
+    main.swap_bundle(main.load_bundle(serving.model_dir, 'numpy'))
+    yield
+    main.swap_bundle(serving)
+
+
+def test_prediction_memo_under_the_numpy_engine(client, numpy_engine, temp_db):
+    before = client.get('/cache/stats').json()['prediction_cache']
+    assert before['enabled']
+
+    first = client.post('/predict', json=PROFILE).json()
+    second = client.post('/predict', json=PROFILE).json()
+    assert second['total_monthly_cost'] == first['total_monthly_cost']
+    assert prediction_results_rows(temp_db) == 1
+
+    # Gone from memory (a restart, say) - the prediction_results row answers
+    main.prediction_cache.clear()
+    third = client.post('/predict', json=PROFILE).json()
+    assert third['total_monthly_cost'] == first['total_monthly_cost']
+
+    after = client.get('/cache/stats').json()['prediction_cache']
+    assert after['hits'] - before['hits'] == 1
+    assert after['db_misses'] - before['db_misses'] == 1
+    assert after['db_hits'] - before['db_hits'] == 1
+
+
+def test_table_engine_skips_the_prediction_memo(client, temp_db):
+    assert main.active_bundle.inference_engine == 'table'
+    client.post('/predict', json=PROFILE)
+
+    assert prediction_results_rows(temp_db) == 0
+    assert client.get('/cache/stats').json()['prediction_cache']['enabled'] is False
+
+
+def test_batch_matches_one_predict_per_profile(client, temp_db):
+    profiles = [PROFILE,
+                {**PROFILE, 'city': 'NYC', 'commute_miles': 0.0},
+                {**PROFILE, 'city': 'Phoenix', 'apartment_size': 'studio',
+                 'dining_frequency': 15, 'car_type': 'electric',
+                 'entertainment_budget': 'high', 'fitness_routine': 'gym'}]
+
+    batch = client.post('/predict/batch', json=profiles)
+    assert batch.status_code == 200
+    singles = [client.post('/predict', json=profile).json() for profile in profiles]
+
+    for from_batch, single in zip(batch.json(), singles):
+        assert from_batch['city'] == single['city']
+        assert from_batch['total_monthly_cost'] == single['total_monthly_cost']
+        assert from_batch['breakdown'] == single['breakdown']
+
+    # Every profile got logged, each with its own id
+    ids = [row['query_id'] for row in batch.json()]
+    assert len(set(ids)) == 3
+    assert temp_db.get_query_statistics()['total_queries'] == 6
+
+
+def test_batch_limits(client, monkeypatch):
+    assert client.post('/predict/batch', json=[]).json() == []
+    assert client.post('/predict/batch', json=[PROFILE, {**PROFILE, 'city': 'Atlantis'}]) \
+        .status_code == 422
+
+    monkeypatch.setattr(main, 'MAX_BATCH_SIZE', 2)
+    assert client.post('/predict/batch', json=[PROFILE] * 3).status_code == 413
+
+
+def test_compare_prices_every_city_like_predict(client, temp_db):
+    profile = {key: value for key, value in PROFILE.items() if key != 'city'}
+    response = client.post('/compare', json={**profile, 'salary': 60000})
+    assert response.status_code == 200
+    cities = response.json()['cities']
+
+    assert sorted(row['city'] for row in cities) == sorted(main.CITY_COST_MULTIPLIERS)
+    assert [row['rank'] for row in cities] == list(range(1, 11))
+    totals = [row['total_monthly_cost'] for row in cities]
+    assert totals == sorted(totals)
+    # What-ifs - nothing gets logged
+    assert temp_db.get_query_statistics()['total_queries'] == 0
+
+    for row in cities:
+        single = client.post('/predict', json={**profile, 'city': row['city']}).json()
+        assert row['total_monthly_cost'] == single['total_monthly_cost']
+        assert row['breakdown'] == single['breakdown']
+        assert row['affordability_ratio'] == round(row['total_monthly_cost'] * 12 / 60000, 4)
+
+
+def test_compare_labels_and_cache(client):
+    profile = {key: value for key, value in PROFILE.items() if key != 'city'}
+    rich = client.post('/compare', json={**profile, 'salary': 10_000_000}).json()
+    poor = client.post('/compare', json={**profile, 'salary': 10_000}).json()
+
+    assert {row['affordability'] for row in rich['cities']} == {'Affordable'}
+    assert {row['affordability'] for row in poor['cities']} == {'Expensive'}
+    # Same profile, different salary - the second one came from the cache
+    assert main.compare_cache.stats()['hits'] >= 1
+    assert client.post('/compare', json={**profile, 'salary': 0}).status_code == 422
+
+
+def test_sweep_curve_matches_predict_at_every_point(client, temp_db):
+    response = client.post('/sweep', json={**PROFILE, 'x': {'field': 'commute_miles',
+                                                            'start': 0, 'stop': 50, 'steps': 11}})
+    assert response.status_code == 200
+    sweep = response.json()
+    assert sweep['x']['values'] == [float(miles) for miles in range(0, 55, 5)]
+    assert sweep['points'] == 11 and sweep['y'] is None
+    # What-ifs - nothing gets logged
+    assert temp_db.get_query_statistics()['total_queries'] == 0
+
+    for miles, total in zip(sweep['x']['values'], sweep['totals']):
+        single = client.post('/predict', json={**PROFILE, 'commute_miles': miles}).json()
+        assert total == single['total_monthly_cost']
+
+
+def test_sweep_heatmap_has_one_row_per_y_value(client):
+    sweep = client.post('/sweep', json={
+        **PROFILE,
+        'x': {'field': 'dining_frequency', 'steps': 16},
+        'y': {'field': 'apartment_size'}
+    }).json()
+
+    assert sweep['x']['values'] == list(range(16))
+    assert sweep['y']['values'] == main.APARTMENT_SIZES
+    assert len(sweep['totals']) == 4 and all(len(row) == 16 for row in sweep['totals'])
+
+    single = client.post('/predict', json={**PROFILE, 'apartment_size': '3BR',
+                                           'dining_frequency': 9}).json()
+    assert sweep['totals'][3][9] == single['total_monthly_cost']
+
+
+def test_sweep_limits(client, monkeypatch):
+    def sweep(**axes):
+        return client.post('/sweep', json={**PROFILE, **axes}).status_code
+
+    assert sweep(x={'field': 'commute_miles', 'start': 60, 'stop': 10}) == 422
+    assert sweep(x={'field': 'commute_miles', 'stop': 500}) == 422
+    assert sweep(x={'field': 'commute_miles'}, y={'field': 'commute_miles'}) == 422
+
+    monkeypatch.setattr(main, 'MAX_SWEEP_POINTS', 100)
+    assert sweep(x={'field': 'commute_miles', 'steps': 101}) == 413
+
+
+def test_round_cents_agrees_with_round():
+    # Exactly half a cent in decimal, but not in binary - np.round gets
+    # some of these wrong
+    values = np.array([[0.125, 1.005, 2.675, 1234.565, 8.345, 0.5, 3827.845]])
+    assert main.round_cents(values).tolist() == [[round(float(v), 2) for v in values[0]]]
+
+
+@pytest.fixture
+def warming_up(client, monkeypatch):
+    """Back to how a worker looks right after startup - the originals come back afterwards."""
+    monkeypatch.setattr(main, 'models_state', 'loading')
+    monkeypatch.setattr(main, 'active_bundle', None)
+    monkeypatch.setattr(main, 'startup_error', None)
+    monkeypatch.setattr(main, 'CACHE_JANITOR_INTERVAL', 0)
+
+
+def test_predict_says_retry_after_while_warming_up(client, warming_up):
+    response = client.post('/predict', json=PROFILE)
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == str(main.STARTUP_RETRY_AFTER_SECONDS)
+
+    assert client.get('/health/live').status_code == 200
+    ready = client.get('/health/ready')
+    assert ready.status_code == 503 and 'retry-after' in ready.headers
+    # Only needs the database, which is up
+    assert client.get('/recent-queries').status_code == 200
+
+
+def test_warm_up_gets_the_worker_ready(client, warming_up, run):
+    run(main.warm_up())
+
+    assert main.models_state == 'ready'
+    assert client.post('/predict', json=PROFILE).status_code == 200
+    ready = client.get('/health/ready')
+    assert ready.status_code == 200
+    assert set(ready.json()['artifact_load_ms'])
+
+
+def test_failed_warm_up_reports_the_error(client, warming_up, run, monkeypatch):
+    def broken():
+        raise OSError('livecost_model.pkl is corrupt')
+
+    monkeypatch.setattr(main, 'load_models', broken)
+    run(main.warm_up())
+
+    response = client.post('/predict', json=PROFILE)
+    assert response.status_code == 503
+    assert 'corrupt' in response.json()['detail']
+    # Trying again in 2 seconds won't help
+    assert 'retry-after' not in response.headers
+    assert client.get('/health/ready').json()['error'] == main.startup_error
+
+
+def scrape(client):
+    """/metrics as {'name{labels}': value}."""
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    return {series: float(value) for series, value in
+            (line.rsplit(' ', 1) for line in response.text.splitlines()
+             if line and not line.startswith('#'))}
+
+
+def test_metrics_count_requests_and_predict_stages(client):
+    before = scrape(client)
+    client.post('/predict', json=PROFILE)
+    client.get('/no-such-page')
+    after = scrape(client)
+
+    def moved(series):
+        return after.get(series, 0) - before.get(series, 0)
+
+    assert moved('livecost_http_requests_total{method="POST",path="/predict",status="200"}') == 1
+    # Unknown paths all share one label
+    assert moved('livecost_http_requests_total{method="GET",path="other",status="404"}') == 1
+    for stage in main.PREDICT_STAGES:
+        assert moved(f'livecost_predict_stage_seconds_count{{stage="{stage}"}}') == 1
+    assert after['livecost_ready'] == 1
+    assert any(series.startswith('livecost_model_info{') for series in after)
@@ -0,0 +1,99 @@
+"""Tests for the api_cache janitor (cache_janitor.py)."""
+
+from datetime import datetime, timedelta
+
+from cache_janitor import CacheJanitor
+
+
+def fill_cache(db, live=0, expired=0, size=100):
+    """Write `live` fresh and `expired` already-expired api_cache rows."""
+    now = datetime.now()
+    payload = 'x' * size
+    conn = db.get_connection()
+    rows = []
+    for i in range(expired):
+        rows.append((f'expired-{i}', f'{{"pad": "{payload}"}}',
+                     (now - timedelta(hours=1)).isoformat()))
+    for i in range(live):
+        rows.append((f'live-{i}', f'{{"pad": "{payload}"}}',
+                     (now + timedelta(hours=1)).isoformat()))
+    conn.executemany("INSERT INTO api_cache (cache_key, response_data, expires_at) "
+                     "VALUES (?, ?, ?)", rows)
+    conn.commit()
+    db.release_connection(conn)
+
+
+def cache_keys(db):
+    conn = db.get_connection()
+    keys = [row[0] for row in conn.execute("SELECT cache_key FROM api_cache ORDER BY id")]
+    db.release_connection(conn)
+    return keys
+
+
+def test_sweep_deletes_expired_rows_in_batches(temp_db, run):
+    fill_cache(temp_db, live=4, expired=10)
+    janitor = CacheJanitor(batch_rows=3, max_rows=0, max_bytes=0)
+
+    result = run(janitor.sweep())
+
+    assert result['expired_deleted'] == 10
+    assert result['evicted'] == 0
+    assert result['rows_left'] == 4
+    assert cache_keys(temp_db) == [f'live-{i}' for i in range(4)]
+
+
+def test_sweep_evicts_oldest_rows_past_the_row_cap(temp_db, run):
+    fill_cache(temp_db, live=10)
+    janitor = CacheJanitor(batch_rows=3, max_rows=4, max_bytes=0)
+
+    result = run(janitor.sweep())
+
+    assert result['evicted'] == 6
+    assert result['rows_left'] == 4
+    assert cache_keys(temp_db) == [f'live-{i}' for i in range(6, 10)]
+
+
+def test_sweep_evicts_until_under_the_byte_cap(temp_db, run):
+    fill_cache(temp_db, live=10, size=1000)
+    janitor = CacheJanitor(batch_rows=500, max_rows=0, max_bytes=3500)
+
+    result = run(janitor.sweep())
+
+    assert result['bytes_left'] <= 3500
+    assert result['rows_left'] == 10 - result['evicted']
+    assert cache_keys(temp_db)[-1] == 'live-9'
+
+
+def test_sweep_hands_freed_pages_back(temp_db, run):
+    conn = temp_db.get_connection()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == temp_db.AUTO_VACUUM_INCREMENTAL
+    temp_db.release_connection(conn)
+
+    fill_cache(temp_db, expired=200, size=2000)
+    janitor = CacheJanitor(batch_rows=50, max_rows=0, max_bytes=0)
+
+    result = run(janitor.sweep())
+
+    assert result['expired_deleted'] == 200
+    assert result['pages_vacuumed'] > 0
+    conn = temp_db.get_connection()
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    temp_db.release_connection(conn)
+
+
+def test_quiet_sweep_skips_the_vacuum_and_stats_add_up(temp_db, run):
+    fill_cache(temp_db, live=2, expired=5)
+    janitor = CacheJanitor(batch_rows=2, max_rows=0, max_bytes=0)
+
+    run(janitor.sweep())
+    second = run(janitor.sweep())
+
+    assert second['expired_deleted'] == 0
+    assert second['pages_vacuumed'] == 0
+
+    stats = janitor.stats()
+    assert stats['sweeps'] == 2
+    assert stats['sweep_errors'] == 0
+    assert stats['expired_deleted'] == 5
+    assert stats['evicted'] == 0
+    assert stats['last_sweep'] == second
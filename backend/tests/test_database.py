@@ -0,0 +1,133 @@
+"""Tests for the database layer (database.py)."""
+
+import pytest
+
+
+def make_query(city='Austin', cost=2000.0):
+    return {
+        'city': city,
+        'apartment_size': 'studio',
+        'dining_frequency': 2,
+        'car_type': 'compact',
+        'commute_miles': 5.0,
+        'predicted_cost': cost,
+        'breakdown': {'rent': 1200.0}
+    }
+
+
+def full_scan(db):
+    """What /statistics should say, worked out the slow way."""
+    conn = db.get_connection()
+    rows = conn.execute(db.AGGREGATE_QUERY_STATS_SQL).fetchall()
+    db.release_connection(conn)
+    counts = {row['city']: row['query_count'] for row in rows}
+    total = sum(counts.values())
+    cost_sum = sum(row['cost_sum'] for row in rows)
+    return counts, round(cost_sum / total, 2) if total else 0
+
+
+def test_stats_follow_inserts_updates_and_deletes(temp_db):
+    temp_db.save_user_queries([make_query('Austin', 2000.0), make_query('Austin', 3000.0),
+                               make_query('NYC', 5000.0)])
+    stats = temp_db.get_query_statistics()
+    assert stats['total_queries'] == 3
+    assert stats['queries_by_city'] == {'Austin': 2, 'NYC': 1}
+    assert stats['average_predicted_cost'] == 3333.33
+
+    conn = temp_db.get_connection()
+    conn.execute("UPDATE user_queries SET city = 'NYC', predicted_cost = 4000 "
+                 "WHERE predicted_cost = 2000")
+    conn.execute("DELETE FROM user_queries WHERE predicted_cost = 3000")
+    conn.commit()
+    temp_db.release_connection(conn)
+
+    stats = temp_db.get_query_statistics()
+    counts, average = full_scan(temp_db)
+    assert stats['queries_by_city'] == counts == {'NYC': 2}
+    assert stats['average_predicted_cost'] == average == 4500.0
+
+
+def test_rebuild_stats_finds_and_fixes_drift(temp_db):
+    temp_db.save_user_queries([make_query('Miami', 2500.0) for _ in range(4)])
+    assert temp_db.rebuild_query_stats()['drift'] == {}
+
+    conn = temp_db.get_connection()
+    conn.execute("UPDATE query_stats SET query_count = 99 WHERE city = 'Miami'")
+    conn.commit()
+    temp_db.release_connection(conn)
+
+    result = temp_db.rebuild_query_stats()
+    assert result['drift']['Miami']['stored_count'] == 99
+    assert result['drift']['Miami']['actual_count'] == 4
+    assert temp_db.get_query_statistics()['queries_by_city'] == {'Miami': 4}
+
+
+def test_write_counter_moves_with_every_write(temp_db, run):
+    async def writes():
+        return await temp_db.get_query_writes_async()
+
+    generation, before, _ = run(writes())
+    temp_db.save_user_queries([make_query(), make_query()])
+    conn = temp_db.get_connection()
+    conn.execute("DELETE FROM user_queries WHERE id = 1")
+    conn.commit()
+    temp_db.release_connection(conn)
+
+    same_generation, after, _ = run(writes())
+    assert same_generation == generation
+    assert after == before + 3
+
+
+@pytest.mark.parametrize('city', [None, 'Denver'])
+def test_keyset_pages_cover_every_row_once(temp_db, city):
+    # All inserted in the same second, so only the id tie-break keeps the
+    # pages apart
+    queries = [make_query('Denver' if i % 3 else 'Boston', 1000.0 + i) for i in range(40)]
+    ids = temp_db.save_user_queries(queries)
+    expected = [query_id for query_id, query in zip(ids, queries)
+                if city is None or query['city'] == city]
+    expected.sort(reverse=True)
+
+    seen = []
+    after = None
+    while True:
+        page = temp_db.get_recent_queries(limit=7, after=after, city=city)
+        if not page:
+            break
+        seen += [row['id'] for row in page]
+        after = page[-1]['id']
+
+    assert seen == expected
+
+
+def test_keyset_page_orders_newest_timestamp_first(temp_db):
+    ids = temp_db.save_user_queries([make_query() for _ in range(3)])
+    conn = temp_db.get_connection()
+    # The oldest id gets the newest timestamp - it should come first
+    conn.execute("UPDATE user_queries SET timestamp = '2099-01-01 00:00:00' WHERE id = ?",
+                 (ids[0],))
+    conn.commit()
+    temp_db.release_connection(conn)
+
+    first_page = temp_db.get_recent_queries(limit=2)
+    assert [row['id'] for row in first_page] == [ids[0], ids[2]]
+    rest = temp_db.get_recent_queries(limit=2, after=first_page[-1]['id'])
+    assert [row['id'] for row in rest] == [ids[1]]
+
+
+def test_paging_carries_on_past_a_deleted_cursor_row(temp_db):
+    ids = temp_db.save_user_queries([make_query(cost=1000.0 + i) for i in range(6)])
+    first_page = temp_db.get_recent_queries(limit=2)
+    assert [row['id'] for row in first_page] == [ids[5], ids[4]]
+
+    # The cursor row gets pruned before the next page is asked for
+    conn = temp_db.get_connection()
+    conn.execute("DELETE FROM user_queries WHERE id = ?", (ids[4],))
+    conn.commit()
+    temp_db.release_connection(conn)
+
+    rest = temp_db.get_recent_queries(limit=10, after=ids[4])
+    assert [row['id'] for row in rest] == [ids[3], ids[2], ids[1], ids[0]]
+    # An id that was never written (reserved, not flushed yet) works too
+    unflushed = temp_db.get_recent_queries(limit=10, after=ids[5] + 100)
+    assert [row['id'] for row in unflushed] == [ids[5], ids[3], ids[2], ids[1], ids[0]]
@@ -0,0 +1,113 @@
+"""
+The serving engines have to give exactly what sklearn gives
+(lookup_table.py, tree_engine.py, serving_artifacts.py).
+"""
+
+import os
+import shutil
+import warnings
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import lookup_table
+import serving_artifacts
+import tree_engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACTS = ['livecost_model.pkl', 'breakdown_models.pkl', 'model_metadata.json']
+
+
+@pytest.fixture(scope='module')
+def trained(tmp_path_factory):
+    """The committed models, copied so the serving arrays land in a temp folder."""
+    model_dir = str(tmp_path_factory.mktemp('models'))
+    for filename in ARTIFACTS:
+        shutil.copy(os.path.join(BACKEND_DIR, filename), model_dir)
+    model, breakdown_models, metadata = lookup_table.load_artifacts(model_dir)
+    return model_dir, model, breakdown_models, metadata
+
+
+def random_features(metadata, n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    encoders = metadata['encoders']
+    features = np.column_stack([
+        rng.integers(0, len(encoders['city']['classes']), n),
+        rng.integers(0, len(encoders['apartment_size']['classes']), n),
+        rng.integers(0, 16, n),
+        rng.integers(0, len(encoders['car_type']['classes']), n),
+        rng.uniform(0, 100, n)
+    ]).astype(np.float64)
+    # Whole and half miles too - where the split thresholds sit
+    features[:200, 4] = np.arange(200) / 2
+    return features
+
+
+def sklearn_outputs(model, breakdown_models, features):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return tree_engine.SklearnEnsemble(model, breakdown_models).predict(features)
+
+
+def test_table_matches_sklearn_exactly(trained):
+    model_dir, model, breakdown_models, metadata = trained
+    features = random_features(metadata)
+    table = lookup_table.build_table(model, breakdown_models, metadata,
+                                     lookup_table.artifact_signature(model_dir))
+
+    assert np.array_equal(table.predict(features),
+                          sklearn_outputs(model, breakdown_models, features))
+
+
+def test_table_verify_finds_no_mismatches(trained):
+    model_dir, model, breakdown_models, metadata = trained
+    table = lookup_table.build_table(model, breakdown_models, metadata,
+                                     lookup_table.artifact_signature(model_dir))
+    assert lookup_table.verify_table(table, model, breakdown_models, metadata) == 0
+
+
+def test_thresholds_closer_than_float32_share_a_gap():
+    # 12.5 and the next float64 up have no float32 between them
+    close = np.nextafter(12.5, 13.0)
+    tree = SimpleNamespace(threshold=np.array([12.5, close, 20.0, -2.0]),
+                           feature=np.array([4, 4, 4, -2]))
+    forest = SimpleNamespace(estimators_=[SimpleNamespace(tree_=tree)])
+
+    thresholds = lookup_table.collect_commute_thresholds([forest])
+    assert thresholds.tolist() == [12.5, 20.0]
+    lookup_table.commute_representatives(thresholds)  # used to raise
+
+
+def test_numpy_engine_matches_sklearn_exactly(trained):
+    _, model, breakdown_models, metadata = trained
+    features = random_features(metadata)
+    ensemble = tree_engine.from_models(model, breakdown_models)
+
+    assert np.array_equal(ensemble.predict(features),
+                          sklearn_outputs(model, breakdown_models, features))
+
+
+def test_memory_mapped_engines_match_sklearn_exactly(trained):
+    model_dir, model, breakdown_models, metadata = trained
+    serving_artifacts.export(model, breakdown_models, metadata, model_dir)
+    features = random_features(metadata, seed=1)
+    expected = sklearn_outputs(model, breakdown_models, features)
+
+    for engine in ('table', 'numpy'):
+        predictor = serving_artifacts.load(model_dir, engine)
+        assert predictor is not None
+        assert np.array_equal(predictor.predict(features), expected), engine
+
+
+def test_stale_serving_arrays_are_ignored(trained):
+    model_dir, model, breakdown_models, metadata = trained
+    serving_artifacts.export(model, breakdown_models, metadata, model_dir)
+
+    # Different pickles than the arrays were built from
+    stale_dir = os.path.join(model_dir, 'stale')
+    shutil.copytree(model_dir, stale_dir)
+    with open(os.path.join(stale_dir, 'model_metadata.json'), 'a') as f:
+        f.write(' ')
+
+    assert serving_artifacts.load(stale_dir, 'table') is None
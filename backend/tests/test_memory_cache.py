@@ -0,0 +1,85 @@
+"""Tests for the in-memory TTL cache (memory_cache.py)."""
+
+import asyncio
+
+import pytest
+
+from memory_cache import MISSING, TTLCache
+
+
+def test_concurrent_misses_share_one_fill():
+    async def scenario():
+        cache = TTLCache()
+        calls = 0
+
+        async def fill():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 'value', None
+
+        results = await asyncio.gather(*(cache.get_or_fill('key', fill) for _ in range(10)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ['value'] * 10
+    assert cache.stats()['coalesced_fills'] == 9
+
+
+def test_fill_errors_reach_every_waiter():
+    async def scenario():
+        cache = TTLCache()
+
+        async def fill():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream down')
+
+        return await asyncio.gather(*(cache.get_or_fill('key', fill) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_filler_does_not_cancel_waiters():
+    async def scenario():
+        cache = TTLCache()
+        started = asyncio.Event()
+        calls = 0
+
+        async def fill():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.05)
+            return f'value {calls}', None
+
+        filler = asyncio.create_task(cache.get_or_fill('key', fill))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_fill('key', fill))
+        await asyncio.sleep(0)
+
+        filler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await filler
+
+        # The waiter takes over the fill instead of getting CancelledError
+        return await waiter, calls, cache
+
+    value, calls, cache = asyncio.run(scenario())
+    assert value == 'value 2'
+    assert calls == 2
+    assert cache.get('key') == 'value 2'
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,67 @@
+"""Tests for the sharded counters and histograms behind /metrics (metrics.py)."""
+
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Keep these test series off the real /metrics output."""
+    monkeypatch.setattr(metrics, '_metrics', [])
+    monkeypatch.setattr(metrics, '_gauges', [])
+    monkeypatch.setattr(metrics, '_histograms', {})
+
+
+def run_in_threads(target, threads=4):
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def test_histogram_adds_up_every_threads_shard():
+    histogram = metrics.Histogram('test_seconds', 'help', {'stage': 'encode'},
+                                  buckets=(0.001, 0.01))
+
+    def observe():
+        for seconds in (0.0005, 0.005, 0.5):
+            histogram.observe(seconds)
+
+    run_in_threads(observe)
+    counts, total = histogram.snapshot()
+    assert counts == [4, 4, 4]
+    assert total == pytest.approx(4 * 0.5055)
+
+    lines = histogram.render()
+    assert lines[:3] == ['test_seconds_bucket{stage="encode",le="0.001"} 4',
+                         'test_seconds_bucket{stage="encode",le="0.01"} 8',
+                         'test_seconds_bucket{stage="encode",le="+Inf"} 12']
+    assert lines[-1] == 'test_seconds_count{stage="encode"} 12'
+
+
+def test_counter_and_gauge_rendering():
+    counter = metrics.Counter('test_requests_total', 'Requests', ('path', 'status'))
+    run_in_threads(lambda: counter.inc(('/predict', '200')))
+    counter.inc(('/say "hi"\n', '404'))
+    metrics.register_gauge('test_ready', 'Ready', lambda: [({}, 1)])
+
+    text = metrics.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{path="/predict",status="200"} 4' in text
+    assert 'test_requests_total{path="/say \\"hi\\"\\n",status="404"} 1' in text
+    assert '# TYPE test_ready gauge\ntest_ready 1\n' in text
+
+
+def test_series_of_one_histogram_share_a_header():
+    metrics.histogram('test_stage_seconds', 'Stages', stage='a').observe(0.1)
+    metrics.Counter('test_other_total', 'Other')
+    metrics.histogram('test_stage_seconds', 'Stages', stage='b').observe(0.1)
+
+    text = metrics.render()
+    assert text.count('# TYPE test_stage_seconds histogram') == 1
+    header = text.index('# TYPE test_stage_seconds')
+    assert header < text.index('stage="a"') < text.index('stage="b"') < text.index('test_other_total')
@@ -0,0 +1,100 @@
+"""Tests for the write-behind query logger (query_logger.py)."""
+
+import query_logger
+from query_logger import QueryLogger
+
+
+def make_query(city='Austin', cost=2500.0):
+    return {
+        'city': city,
+        'apartment_size': '1BR',
+        'dining_frequency': 3,
+        'car_type': 'sedan',
+        'commute_miles': 12.5,
+        'predicted_cost': cost,
+        'breakdown': {'rent': 1500.0}
+    }
+
+
+def test_ids_come_back_before_the_rows_are_written(temp_db, run):
+    async def scenario():
+        logger = QueryLogger(flush_interval_ms=60_000, id_block_size=10)
+        await logger.start()
+
+        first = await logger.log_many([make_query(), make_query()])
+        second = await logger.log(make_query())
+        before_flush = await temp_db.get_recent_queries_async(limit=10)
+
+        await logger.stop()
+        after_flush = await temp_db.get_recent_queries_async(limit=10)
+        return first, second, before_flush, after_flush, logger.stats()
+
+    first, second, before_flush, after_flush, stats = run(scenario())
+    assert second == first[1] + 1
+    assert before_flush == []
+    assert sorted(row['id'] for row in after_flush) == first + [second]
+    assert stats['rows_flushed'] == 3
+
+
+def test_ids_never_overlap_across_loggers(temp_db, run):
+    async def scenario():
+        a = QueryLogger(id_block_size=5)
+        b = QueryLogger(id_block_size=5)
+        await a.start()
+        await b.start()
+        ids = []
+        for _ in range(7):
+            ids.append(await a.log(make_query()))
+            ids.append(await b.log(make_query()))
+        await a.stop()
+        await b.stop()
+        rows = await temp_db.get_recent_queries_async(limit=100)
+        return ids, rows
+
+    ids, rows = run(scenario())
+    assert len(set(ids)) == 14
+    assert sorted(row['id'] for row in rows) == sorted(ids)
+
+
+def test_bad_row_goes_to_dead_letter_after_retries(temp_db, run):
+    async def scenario():
+        logger = QueryLogger(flush_interval_ms=60_000, max_flush_retries=3)
+        await logger.start()
+        good_ids = await logger.log_many([make_query(), make_query()])
+        bad_id = await logger.log(make_query(city=None))
+        more_ids = await logger.log_many([make_query(), make_query()])
+
+        for _ in range(3):
+            await logger.flush()
+        await logger.stop()
+
+        rows = await temp_db.get_recent_queries_async(limit=10)
+        return good_ids + more_ids, bad_id, rows, logger
+
+    good_ids, bad_id, rows, logger = run(scenario())
+    assert sorted(row['id'] for row in rows) == good_ids
+    assert logger.stats()['rows_dropped'] == 1
+    assert logger.stats()['queue_depth'] == 0
+    assert [query_id for query_id, _, _ in logger.dead_letter] == [bad_id]
+
+
+def test_queue_is_capped_when_the_database_keeps_failing(temp_db, run, monkeypatch):
+    async def failing_insert(rows):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(query_logger, 'insert_user_queries_async', failing_insert)
+
+    async def scenario():
+        logger = QueryLogger(flush_interval_ms=60_000, max_queue_rows=5,
+                             max_flush_retries=1000)
+        await logger.start()
+        for _ in range(12):
+            await logger.log(make_query())
+        stats = logger.stats()
+        logger._queue = []
+        await logger.stop()
+        return stats
+
+    stats = run(scenario())
+    assert stats['queue_depth'] <= 5
+    assert stats['rows_dropped'] == 12 - stats['queue_depth']
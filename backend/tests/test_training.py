@@ -0,0 +1,257 @@
+"""Tests for the training pipeline (train_model.py, training_data.py)."""
+
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lookup_table
+import train_model
+import training_data
+
+REAL_DATA = os.path.join(train_model.DATA_DIR, 'cost_of_living_data.csv')
+SEPARATE_WEIGHTS = {'total_monthly_cost': 100, 'rent': 50, 'food': 50,
+                    'transportation': 50, 'utilities': 50}
+
+
+@pytest.mark.parametrize('budget', [1, 4, 5, 7, 8, 13, 16, 64])
+def test_share_workers_hands_out_exactly_the_budget(budget):
+    shares = train_model.share_workers(SEPARATE_WEIGHTS, budget)
+
+    assert sum(shares.values()) == max(budget, len(SEPARATE_WEIGHTS))
+    assert min(shares.values()) >= 1
+    # The forest with twice the trees never gets fewer threads
+    assert shares['total_monthly_cost'] >= max(shares[name] for name in train_model.CATEGORIES)
+
+
+def test_share_workers_leftovers_go_to_the_biggest_remainders():
+    # 11 spare cores after 1 each: 3.67 / 1.83 x4 -> 3 + 1 x4, then the 4
+    # leftover cores go to the .83s
+    assert train_model.share_workers(SEPARATE_WEIGHTS, 16) == {
+        'total_monthly_cost': 4, 'rent': 3, 'food': 3, 'transportation': 3, 'utilities': 3}
+    assert train_model.share_workers({'fused': 100}, 16) == {'fused': 16}
+
+
+def test_models_fit_side_by_side_within_the_budget():
+    df, _, _ = train_model.load_and_preprocess_data(REAL_DATA)
+    train_df, test_df = train_model.split_data(df)
+    trained = train_model.train_models(train_df, test_df, workers=8)
+
+    assert set(trained) == {'total_monthly_cost', *train_model.CATEGORIES}
+    assert sum(model.n_jobs for model, _ in trained.values()) == 8
+    assert all(metrics['test']['r2'] > 0 for _, metrics in trained.values())
+
+
+@pytest.fixture(scope='module')
+def fused_dir(tmp_path_factory):
+    """One fused training run on the real data, shared by the fused tests."""
+    model_dir = str(tmp_path_factory.mktemp('fused'))
+    train_model.main(fused=True, model_dir=model_dir, workers=1, data_path=REAL_DATA)
+    return model_dir
+
+
+def test_fused_run_saves_one_forest_with_every_output(fused_dir):
+    assert os.path.exists(os.path.join(fused_dir, 'livecost_fused_model.pkl'))
+    assert not os.path.exists(os.path.join(fused_dir, 'livecost_model.pkl'))
+
+    with open(os.path.join(fused_dir, 'model_metadata.json')) as f:
+        metadata = json.load(f)
+    assert metadata['model_type'] == 'fused'
+    assert set(metadata['output_metrics']) == set(train_model.FUSED_OUTPUTS)
+    assert metadata['metrics'] == metadata['output_metrics']['total_monthly_cost']
+
+
+@pytest.mark.parametrize('engine', ['table', 'numpy', 'sklearn'])
+def test_fused_bundle_serves_what_the_forest_predicts(fused_dir, engine):
+    import main
+
+    model, breakdown_models, metadata = lookup_table.load_artifacts(fused_dir)
+    assert breakdown_models is None
+
+    bundle = main.load_bundle(fused_dir, engine)
+    assert bundle.inference_engine == engine
+    # table/numpy come from the exported serving arrays, not the pickle
+    assert (bundle.model is None) == (engine != 'sklearn')
+
+    df, _, _ = train_model.load_and_preprocess_data(REAL_DATA)
+    features = df[train_model.FEATURE_COLS].to_numpy(dtype=np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = model.predict(features)
+    assert np.array_equal(bundle.predictor.predict(features), expected)
+
+
+def test_small_chunks_load_exactly_what_one_chunk_does():
+    whole, whole_encoders, whole_position = training_data.load(REAL_DATA)
+    chunked, chunked_encoders, chunked_position = training_data.load(REAL_DATA, chunk_rows=7)
+
+    pd.testing.assert_frame_equal(chunked, whole)
+    assert chunked_encoders == whole_encoders
+    assert chunked_position == whole_position
+    assert whole_position['rows'] == len(whole)
+
+
+def test_streamed_encoders_match_label_encoder():
+    from sklearn.preprocessing import LabelEncoder
+
+    df, encoders, _ = training_data.load(REAL_DATA, chunk_rows=5)
+    raw = pd.read_csv(REAL_DATA)
+    for col in training_data.CATEGORICAL_COLS:
+        label_encoder = LabelEncoder().fit(raw[col])
+        assert encoders[col]['classes'] == list(label_encoder.classes_)
+        assert df[f'{col}_encoded'].tolist() == label_encoder.transform(raw[col]).tolist()
+
+
+def test_max_rows_samples_down_in_file_order():
+    df, _, position = training_data.load(REAL_DATA, max_rows=20, chunk_rows=8)
+
+    assert len(df) == 20
+    assert df.index.is_monotonic_increasing
+    assert df.index.is_unique
+    # Every row was still counted, not just the ones kept
+    assert position['rows'] == len(pd.read_csv(REAL_DATA))
+
+
+def test_start_position_reads_only_appended_rows(tmp_path):
+    data_path = str(tmp_path / 'data.csv')
+    lines = open(REAL_DATA).read().splitlines(keepends=True)
+    with open(data_path, 'w') as f:
+        f.writelines(lines[:51])
+
+    first, encoders, position = training_data.load(data_path)
+    assert len(first) == 50
+    assert training_data.load(data_path, start=position, encoders=encoders)[0] is None
+
+    with open(data_path, 'a') as f:
+        f.writelines(lines[51:])
+    assert training_data.continues_from(data_path, position)
+
+    new, _, new_position = training_data.load(data_path, start=position, encoders=encoders)
+    whole, _, _ = training_data.load(data_path)
+    assert new.index.tolist() == list(range(50, len(lines) - 1))
+    pd.testing.assert_frame_equal(new, whole.loc[50:])
+    assert new_position['rows'] == len(lines) - 1
+
+
+def test_rewritten_file_does_not_continue(tmp_path):
+    data_path = str(tmp_path / 'data.csv')
+    lines = open(REAL_DATA).read().splitlines(keepends=True)
+    with open(data_path, 'w') as f:
+        f.writelines(lines)
+    _, _, position = training_data.load(data_path)
+
+    with open(data_path, 'w') as f:
+        f.writelines([lines[0]] + lines[2:] + [lines[1]])
+    assert not training_data.continues_from(data_path, position)
+
+
+def test_missing_city_is_an_error(tmp_path):
+    data_path = str(tmp_path / 'data.csv')
+    lines = open(REAL_DATA).read().splitlines(keepends=True)
+    with open(data_path, 'w') as f:
+        f.writelines(lines[:4] + [',' + lines[4].split(',', 1)[1]])
+
+    with pytest.raises(ValueError, match='Missing city'):
+        training_data.load(data_path)
+
+
+def test_parquet_loads_the_same_as_csv(tmp_path):
+    pytest.importorskip('pyarrow')
+    data_path = str(tmp_path / 'data.parquet')
+    pd.read_csv(REAL_DATA).to_parquet(data_path)
+
+    from_csv, csv_encoders, _ = training_data.load(REAL_DATA)
+    from_parquet, parquet_encoders, position = training_data.load(data_path, chunk_rows=9)
+
+    pd.testing.assert_frame_equal(from_parquet, from_csv)
+    assert parquet_encoders == csv_encoders
+    assert position['bytes'] is None
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    """A full run on the first 50 rows, in a temp model_versions/ and live."""
+    import model_store
+
+    versions_dir = tmp_path / 'model_versions'
+    monkeypatch.setattr(model_store, 'MODEL_VERSIONS_DIR', str(versions_dir))
+    monkeypatch.setattr(model_store, 'CURRENT_FILE', str(versions_dir / 'CURRENT'))
+
+    data_path = str(tmp_path / 'data.csv')
+    lines = open(REAL_DATA).read().splitlines(keepends=True)
+    with open(data_path, 'w') as f:
+        f.writelines(lines[:51])
+
+    base_dir = model_store.new_version_dir()
+    train_model.main(model_dir=base_dir, workers=1, data_path=data_path)
+    model_store.set_active_version(base_dir)
+    return base_dir, data_path, lines[51:]
+
+
+def read_metadata(model_dir):
+    with open(os.path.join(model_dir, 'model_metadata.json')) as f:
+        return json.load(f)
+
+
+def test_incremental_run_grows_every_forest(served):
+    import model_store
+    import training_manifest
+
+    base_dir, data_path, new_lines = served
+    with open(data_path, 'a') as f:
+        f.writelines(new_lines)
+
+    new_dir = model_store.new_version_dir()
+    assert train_model.main_incremental(model_dir=new_dir, workers=1, data_path=data_path)
+
+    manifest = training_manifest.load(new_dir)
+    assert manifest['trees'] == {
+        'total_monthly_cost': 120, 'rent': 60, 'food': 60, 'transportation': 60, 'utilities': 60}
+    assert manifest['position']['rows'] == 50 + len(new_lines)
+    assert manifest['incremental_runs'][-1]['new_rows'] == len(new_lines)
+
+    model, breakdown_models, _ = lookup_table.load_artifacts(new_dir)
+    assert len(model.estimators_) == 120
+    assert all(len(forest.estimators_) == 60 for forest in breakdown_models.values())
+
+    # The confidence label keeps the full retrain's scores; the holdout
+    # of new rows gets reported separately
+    base, grown = read_metadata(base_dir), read_metadata(new_dir)
+    assert grown['metrics'] == base['metrics']
+    assert grown['output_metrics'] == base['output_metrics']
+    assert set(grown['incremental_holdout']) == {'total_monthly_cost', *train_model.CATEGORIES}
+
+
+def test_incremental_run_with_too_few_new_rows_does_nothing(served):
+    import model_store
+
+    _, data_path, new_lines = served
+    with open(data_path, 'a') as f:
+        f.writelines(new_lines[:train_model.MIN_INCREMENTAL_ROWS - 1])
+
+    new_dir = model_store.new_version_dir()
+    assert train_model.main_incremental(model_dir=new_dir, workers=1,
+                                        data_path=data_path) is False
+    assert os.listdir(new_dir) == []
+
+
+def test_rewritten_data_falls_back_to_a_full_retrain(served):
+    import model_store
+    import training_manifest
+
+    _, data_path, new_lines = served
+    lines = open(data_path).read().splitlines(keepends=True)
+    with open(data_path, 'w') as f:
+        f.writelines([lines[0]] + new_lines + lines[1:])
+
+    new_dir = model_store.new_version_dir()
+    train_model.main_incremental(model_dir=new_dir, workers=1, data_path=data_path)
+
+    manifest = training_manifest.load(new_dir)
+    assert manifest['incremental_runs'] == []
+    assert manifest['trees']['total_monthly_cost'] == train_model.MAIN_FOREST['n_estimators']
+    assert manifest['position']['rows'] == len(lines) - 1 + len(new_lines)
+    assert 'incremental_holdout' not in read_metadata(new_dir)
@@ -10,125 +10,97 @@ I picked RandomForestRegressor after trying a few options:
 - Random Forest hit the sweet spot - handles mixed data types well
   and doesn't need feature scaling
 
-Usage: python train_model.py
+Usage:
+    python train_model.py           # main model + 4 breakdown models
+    python train_model.py --fused   # one multi-output model for all 5
+    python train_model.py --workers 4   # cap the cores training uses
+    python train_model.py --data surveys.parquet --max-rows 5000000
+    python train_model.py --incremental     # only add trees for new rows
+    python train_model.py --incremental --compare-full
 
 Author: Jeremiah Williams
 Course: Project & Portfolio IV - Full Sail University
 Date: December 2025
 """
 
-import pandas as pd
 import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import lookup_table
+import model_store
+import serving_artifacts
+import training_data
+import training_manifest
 
 # Figure out where this script lives so we can find the data
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'data')
 
+# Features the models use - has to match encode_input() in main.py
+FEATURE_COLS = [
+    'city_encoded',
+    'apartment_size_encoded',
+    'dining_frequency',
+    'car_type_encoded',
+    'commute_miles'
+]
 
-def load_and_preprocess_data():
-    """
-    Load the training data from CSV.
+CATEGORIES = ['rent', 'food', 'transportation', 'utilities']
 
-    Using CSV because it's simple and easy to edit if I need to
-    add more data points later. For a bigger project I'd probably
-    use a real database.
-    """
-    csv_path = os.path.join(DATA_DIR, 'cost_of_living_data.csv')
-    df = pd.read_csv(csv_path)
+# Everything the fused model predicts, in the column order the API expects
+FUSED_OUTPUTS = ['total_monthly_cost'] + CATEGORIES
 
-    print(f"Dataset loaded: {len(df)} records")
-    print(f"Features: {df.columns.tolist()}")
-    print(f"\nCities in dataset: {df['city'].unique().tolist()}")
 
-    return df
+def default_data_path():
+    return os.path.join(DATA_DIR, 'cost_of_living_data.csv')
 
 
-def encode_features(df):
+def load_and_preprocess_data(path=None, max_rows=training_data.MAX_ROWS):
     """
-    Convert text categories to numbers for the ML model.
+    Load the training data and convert text categories to numbers.
 
-    ML models need numbers, not strings like 'studio' or 'Austin'.
-    LabelEncoder converts each unique value to an integer.
+    Using CSV because it's simple and easy to edit if I need to
+    add more data points later. Parquet works too, for the big
+    survey/transaction exports.
 
-    Important: we save these mappings so the API can encode new
+    ML models need numbers, not strings like 'studio' or 'Austin', so
+    each category gets an integer code (same as LabelEncoder would
+    give it). Important: we save these mappings so the API can encode new
     predictions the same way. If the encoding doesn't match,
     predictions will be totally wrong (learned this the hard way).
-    """
-    encoders = {}
-    df_encoded = df.copy()
 
-    # These are the columns we need to encode
-    categorical_cols = ['city', 'apartment_size', 'car_type']
-
-    for col in categorical_cols:
-        le = LabelEncoder()
-        df_encoded[f'{col}_encoded'] = le.fit_transform(df[col])
-
-        # Save the mapping for later
-        encoders[col] = {
-            'classes': le.classes_.tolist(),
-            'mapping': {cls: idx for idx, cls in enumerate(le.classes_)}
-        }
+    The file gets streamed in chunks with compact dtypes, and the
+    encoders are fit along the way - see training_data.py. Past max_rows
+    rows it trains on a random sample, so memory stays bounded.
+    """
+    df_encoded, encoders, position = training_data.load(path or default_data_path(), max_rows)
+    total_rows = position['rows']
 
-        print(f"\n{col} encoding: {encoders[col]['mapping']}")
+    print(f"Dataset loaded: {total_rows} records")
+    if len(df_encoded) < total_rows:
+        print(f"Training on a random sample of {len(df_encoded)} of them")
+    print(f"Features: {df_encoded.columns.tolist()}")
+    print(f"\nCities in dataset: {encoders['city']['classes']}")
 
-    return df_encoded, encoders
+    for col, encoder in encoders.items():
+        print(f"\n{col} encoding: {encoder['mapping']}")
 
+    return df_encoded, encoders, position
 
-def train_model(df_encoded):
-    """
-    Train the main prediction model.
 
-    Using 80/20 train/test split which is pretty standard.
-    random_state=42 makes it reproducible (the 42 is just a convention,
-    it's a Hitchhiker's Guide reference apparently).
-    """
-    # Features the model will use
-    feature_cols = [
-        'city_encoded',
-        'apartment_size_encoded',
-        'dining_frequency',
-        'car_type_encoded',
-        'commute_miles'
-    ]
-
-    X = df_encoded[feature_cols]
-    y = df_encoded['total_monthly_cost']
-
-    # Split into training and test sets
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y,
-        test_size=0.2,
-        random_state=42
-    )
-
-    print(f"\nTraining set size: {len(X_train)}")
-    print(f"Test set size: {len(X_test)}")
-
-    # Train the model
-    # n_estimators=100 means 100 trees in the forest
-    # max_depth=10 prevents overfitting on our small dataset
-    model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=10,
-        random_state=42,
-        n_jobs=-1  # Use all CPU cores
-    )
-
-    model.fit(X_train, y_train)
-
-    # See how well it did
-    y_pred_train = model.predict(X_train)
-    y_pred_test = model.predict(X_test)
-
-    metrics = {
+def compute_metrics(y_train, y_pred_train, y_test, y_pred_test):
+    """RMSE / R² / MAE on both splits, as plain floats so they go into JSON."""
+    return {
         'train': {
             'rmse': float(np.sqrt(mean_squared_error(y_train, y_pred_train))),
             'r2': float(r2_score(y_train, y_pred_train)),
@@ -141,7 +113,206 @@ def train_model(df_encoded):
         }
     }
 
-    # Print out how we did
+
+# Forest settings for each model. The breakdown models are simpler since
+# each category has less variance to predict. max_depth keeps the forests
+# from overfitting on our small dataset.
+MAIN_FOREST = {'n_estimators': 100, 'max_depth': 10}
+BREAKDOWN_FOREST = {'n_estimators': 50, 'max_depth': 8}
+FUSED_FOREST = {'n_estimators': 100, 'max_depth': 10}
+
+# Incremental runs (--incremental) add this fraction of each forest's
+# tree count, fit on the new + recent rows. Past MAX_TREES_FACTOR times
+# the normal size, the oldest trees get dropped to make room.
+INCREMENTAL_TREES = 0.2
+MAX_TREES_FACTOR = 2
+
+# Fewer new rows than this isn't worth a run - they'd be too few to
+# hold any out for evaluation
+MIN_INCREMENTAL_ROWS = 10
+
+# Cores training can use in total, across every model fitting at once.
+# Retrains run right next to the live server (see run_retrain in main.py),
+# so LIVECOST_TRAIN_WORKERS can turn it down there.
+TRAIN_WORKERS = int(os.environ.get('LIVECOST_TRAIN_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def split_data(df_encoded):
+    """
+    Split into training and test sets - once, shared by every model.
+
+    Using 80/20 train/test split which is pretty standard.
+    random_state=42 makes it reproducible (the 42 is just a convention,
+    it's a Hitchhiker's Guide reference apparently). The split only
+    depends on the row count and the seed, so each model used to redo
+    this exact same split for nothing.
+    """
+    train_df, test_df = train_test_split(df_encoded, test_size=0.2, random_state=42)
+
+    print(f"\nTraining set size: {len(train_df)}")
+    print(f"Test set size: {len(test_df)}")
+
+    return train_df, test_df
+
+
+def share_workers(weights, budget):
+    """
+    Split a budget of cores between models that fit at the same time.
+
+    Every model needs at least 1 thread, and the rest of the budget gets
+    handed out in proportion to each model's weight (its tree count) by
+    largest remainder: everyone gets the whole part of their share, then
+    the cores left over go to the biggest fractional parts. So the total
+    is exactly the budget - no idle cores, and no oversubscribing, which
+    just makes the forests fight over the CPU. The one exception is more
+    models than cores, where it's 1 each (run_fits only runs `budget` of
+    them at once then).
+    """
+    names = list(weights)
+    spare = max(budget, len(names)) - len(names)
+    total = sum(weights.values())
+
+    shares = {name: 1 + spare * weights[name] // total for name in names}
+    leftover = spare - sum(shares.values()) + len(names)
+    by_remainder = sorted(names, key=lambda name: spare * weights[name] % total, reverse=True)
+    for name in by_remainder[:leftover]:
+        shares[name] += 1
+    return shares
+
+
+def evaluate(model, target, train_df, test_df):
+    """Metrics on both splits - per output if the model predicts several."""
+    y_pred_train = model.predict(train_df[FEATURE_COLS])
+    y_pred_test = model.predict(test_df[FEATURE_COLS])
+
+    if isinstance(target, str):
+        return compute_metrics(train_df[target], y_pred_train, test_df[target], y_pred_test)
+
+    return {
+        output: compute_metrics(train_df[output], y_pred_train[:, i],
+                                test_df[output], y_pred_test[:, i])
+        for i, output in enumerate(target)
+    }
+
+
+def fit_forest(params, target, train_df, test_df, n_jobs):
+    """Fit one forest and score it. Runs on a training thread."""
+    model = RandomForestRegressor(**params, random_state=42, n_jobs=n_jobs)
+
+    start = time.perf_counter()
+    model.fit(train_df[FEATURE_COLS], train_df[target])
+    fit_seconds = time.perf_counter() - start
+
+    metrics = evaluate(model, target, train_df, test_df)
+    eval_seconds = time.perf_counter() - start - fit_seconds
+
+    return model, metrics, fit_seconds, eval_seconds
+
+
+def grow_forest(model, params, target, train_df, test_df, n_jobs):
+    """
+    Add trees fit on train_df to a trained forest, then score it.
+
+    warm_start keeps the existing trees and only fits the new ones. The
+    forest's trees are oldest first, so past the cap the front of the
+    list - the slice fit on the oldest data - gets dropped.
+    """
+    new_trees = max(1, int(params['n_estimators'] * INCREMENTAL_TREES))
+    max_trees = params['n_estimators'] * MAX_TREES_FACTOR
+    model.set_params(warm_start=True, n_jobs=n_jobs,
+                     n_estimators=len(model.estimators_) + new_trees)
+
+    start = time.perf_counter()
+    model.fit(train_df[FEATURE_COLS], train_df[target])
+    fit_seconds = time.perf_counter() - start
+
+    dropped = max(0, len(model.estimators_) - max_trees)
+    del model.estimators_[:dropped]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+
+    metrics = evaluate(model, target, train_df, test_df)
+    eval_seconds = time.perf_counter() - start - fit_seconds
+
+    return model, metrics, fit_seconds, eval_seconds, new_trees, dropped
+
+
+def model_jobs(fused=False):
+    """{name: (forest params, target)} for every model a run trains."""
+    if fused:
+        return {'fused': (FUSED_FOREST, FUSED_OUTPUTS)}
+    jobs = {'total_monthly_cost': (MAIN_FOREST, 'total_monthly_cost')}
+    jobs.update({category: (BREAKDOWN_FOREST, category) for category in CATEGORIES})
+    return jobs
+
+
+def run_fits(jobs, fit, workers=TRAIN_WORKERS):
+    """
+    Call fit(name, params, target, n_jobs) for every job at the same time.
+
+    One at a time, even with n_jobs=-1, the small forests leave cores
+    idle between fits. sklearn builds trees without holding the GIL, so
+    threads are enough to run them side by side, with share_workers()
+    keeping the total at `workers` threads. fit returns
+    (model, metrics, fit seconds, eval seconds, ...) - evaluation runs on
+    the same thread right after the fit.
+    """
+    n_jobs = share_workers({name: params['n_estimators'] for name, (params, _) in jobs.items()},
+                           workers)
+
+    with ThreadPoolExecutor(max_workers=min(len(jobs), workers)) as pool:
+        futures = {
+            name: pool.submit(fit, name, params, target, n_jobs[name])
+            for name, (params, target) in jobs.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    print(f"\nTrained {len(jobs)} model(s) on {workers} cores:")
+    for name, result in results.items():
+        print(f"  {name}: fit {result[2]:.2f}s, evaluate {result[3]:.2f}s "
+              f"({n_jobs[name]} threads)")
+
+    return results
+
+
+def train_models(train_df, test_df, fused=False, workers=TRAIN_WORKERS):
+    """
+    Fit every model from scratch at the same time and score them.
+
+    Separate mode is five forests: the total plus rent, food,
+    transportation and utilities.
+
+    Returns {name: (model, metrics)} - 'fused' for the fused model,
+    otherwise 'total_monthly_cost' and each category.
+    """
+    def fit(name, params, target, n_jobs):
+        return fit_forest(params, target, train_df, test_df, n_jobs)
+
+    results = run_fits(model_jobs(fused), fit, workers)
+    return {name: result[:2] for name, result in results.items()}
+
+
+def grow_models(models, train_df, test_df, fused=False, workers=TRAIN_WORKERS):
+    """
+    grow_forest() every model at the same time.
+
+    Returns {name: (model, metrics, trees added, trees dropped)}.
+    """
+    def fit(name, params, target, n_jobs):
+        return grow_forest(models[name], params, target, train_df, test_df, n_jobs)
+
+    results = run_fits(model_jobs(fused), fit, workers)
+    return {name: result[:2] + result[4:] for name, result in results.items()}
+
+
+def output_metrics_of(trained, fused=False):
+    """Metrics per output ('total_monthly_cost', 'rent', ...) either way."""
+    if fused:
+        return trained['fused'][1]
+    return {name: result[1] for name, result in trained.items()}
+
+
+def report_main_model(model, metrics):
+    """Print how the main model did."""
     print("\n" + "="*50)
     print("MODEL EVALUATION")
     print("="*50)
@@ -158,122 +329,344 @@ def train_model(df_encoded):
     # have 70 data points. More data would help a lot.
 
     # Check which features matter most
-    importance = dict(zip(feature_cols, model.feature_importances_))
+    importance = dict(zip(FEATURE_COLS, model.feature_importances_))
 
     print("\nFeature Importance:")
     for feat, imp in sorted(importance.items(), key=lambda x: x[1], reverse=True):
         print(f"  {feat}: {imp:.4f}")
 
-    return model, metrics, feature_cols
 
-
-def train_breakdown_models(df_encoded):
+def report_breakdown_models(breakdown_metrics):
     """
-    Train separate models for rent, food, transportation, utilities.
+    Print how the rent, food, transportation and utilities models did.
 
-    This way we can show users a detailed breakdown instead of just
-    one total number. Each model is simpler since it's predicting
-    less variance.
+    These let us show users a detailed breakdown instead of just one
+    total number.
     """
-    feature_cols = [
-        'city_encoded',
-        'apartment_size_encoded',
-        'dining_frequency',
-        'car_type_encoded',
-        'commute_miles'
-    ]
-
-    X = df_encoded[feature_cols]
-    breakdown_models = {}
-    categories = ['rent', 'food', 'transportation', 'utilities']
-
     print("\n" + "="*50)
-    print("TRAINING BREAKDOWN MODELS")
+    print("BREAKDOWN MODELS")
     print("="*50)
+    for category, metrics in breakdown_metrics.items():
+        print(f"  {category.capitalize()} model R²: {metrics['test']['r2']:.4f}")
 
-    for category in categories:
-        y = df_encoded[category]
-
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-
-        # Simpler models for individual categories
-        model = RandomForestRegressor(
-            n_estimators=50,
-            max_depth=8,
-            random_state=42,
-            n_jobs=-1
-        )
 
-        model.fit(X_train, y_train)
-
-        y_pred = model.predict(X_test)
-        r2 = r2_score(y_test, y_pred)
-
-        breakdown_models[category] = model
-
-        print(f"  {category.capitalize()} model R²: {r2:.4f}")
+def report_fused_model(output_metrics):
+    """
+    Print the per-output metrics of the fused model.
 
-    return breakdown_models
+    RandomForestRegressor handles multiple targets natively - each leaf
+    just stores a vector instead of a number. That means one fit instead
+    of five, and the API only has to call predict() once per request.
+    The trade-off is every split has to work for all five targets at
+    once, so it's worth checking these against the separate models.
+    """
+    print("\n" + "="*50)
+    print("FUSED MODEL EVALUATION (test set)")
+    print("="*50)
+    for output, metrics in output_metrics.items():
+        print(f"  {output}: R² {metrics['test']['r2']:.4f}, "
+              f"RMSE ${metrics['test']['rmse']:.2f}, MAE ${metrics['test']['mae']:.2f}")
 
 
-def save_artifacts(model, breakdown_models, encoders, metrics, feature_cols):
+def save_artifacts(model, breakdown_models, encoders, metrics, feature_cols,
+                   output_metrics=None, model_type='separate', model_dir=SCRIPT_DIR,
+                   incremental_holdout=None):
     """
     Save everything to disk so the API can use it.
 
     Using joblib for the models (better than pickle for sklearn)
     and JSON for the metadata (human readable, easy to debug).
-    """
-    # Save main model
-    model_path = os.path.join(SCRIPT_DIR, 'livecost_model.pkl')
-    joblib.dump(model, model_path)
-    print(f"\nMain model saved to: {model_path}")
 
-    # Save breakdown models
-    breakdown_path = os.path.join(SCRIPT_DIR, 'breakdown_models.pkl')
-    joblib.dump(breakdown_models, breakdown_path)
-    print(f"Breakdown models saved to: {breakdown_path}")
+    For model_type='fused' there's just the one model and
+    breakdown_models is None. model_dir is the backend folder unless
+    this is a versioned retrain (see model_store.py).
+
+    incremental_holdout is the test metrics of the last incremental run,
+    kept apart from `metrics` (see finish_training).
+    """
+    if model_type == 'fused':
+        fused_path = os.path.join(model_dir, 'livecost_fused_model.pkl')
+        joblib.dump(model, fused_path)
+        print(f"\nFused model saved to: {fused_path}")
+    else:
+        # Save main model
+        model_path = os.path.join(model_dir, 'livecost_model.pkl')
+        joblib.dump(model, model_path)
+        print(f"\nMain model saved to: {model_path}")
+
+        # Save breakdown models
+        breakdown_path = os.path.join(model_dir, 'breakdown_models.pkl')
+        joblib.dump(breakdown_models, breakdown_path)
+        print(f"Breakdown models saved to: {breakdown_path}")
 
     # Save metadata (encoders, metrics, etc.)
     metadata = {
         'encoders': encoders,
         'metrics': metrics,
         'feature_cols': feature_cols,
-        'categories': ['rent', 'food', 'transportation', 'utilities']
+        'categories': CATEGORIES,
+        'model_type': model_type,
+        'output_metrics': output_metrics or {}
     }
+    if incremental_holdout is not None:
+        metadata['incremental_holdout'] = incremental_holdout
 
-    metadata_path = os.path.join(SCRIPT_DIR, 'model_metadata.json')
+    metadata_path = os.path.join(model_dir, 'model_metadata.json')
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
     print(f"Metadata saved to: {metadata_path}")
 
+    # Flattened trees + the prediction lookup table as memory-mappable
+    # arrays - what the API actually serves from (see serving_artifacts.py)
+    serving_artifacts.export(model, breakdown_models, metadata, model_dir)
+
+
+def unpack_models(trained, fused=False):
+    """(model, breakdown_models, total metrics, metrics per output) from a run."""
+    output_metrics = output_metrics_of(trained, fused)
+    if fused:
+        return trained['fused'][0], None, output_metrics['total_monthly_cost'], output_metrics
+
+    breakdown_models = {category: trained[category][0] for category in CATEGORIES}
+    return (trained['total_monthly_cost'][0], breakdown_models,
+            output_metrics['total_monthly_cost'], output_metrics)
 
-def main():
-    """Run the full training pipeline."""
-    print("="*50)
-    print("LIVECOST ML MODEL TRAINING")
-    print("="*50)
 
-    # Load data
-    df = load_and_preprocess_data()
+def finish_training(trained, encoders, fused, model_dir, base_metadata=None):
+    """
+    Save the artifacts and, for the backend folder, switch to serving them.
 
-    # Encode categorical features
-    df_encoded, encoders = encode_features(df)
+    An incremental run passes the metadata of the models it grew. Its
+    test scores only cover a holdout of the new rows, which can be tiny,
+    and the API's confidence label comes from metrics['test']['r2'] - so
+    metrics stays what the last full retrain measured, and the holdout
+    scores go under incremental_holdout instead.
+    """
+    model, breakdown_models, metrics, output_metrics = unpack_models(trained, fused)
 
-    # Train main model
-    model, metrics, feature_cols = train_model(df_encoded)
+    incremental_holdout = None
+    if base_metadata is not None:
+        incremental_holdout = output_metrics
+        metrics = base_metadata['metrics']
+        output_metrics = base_metadata.get('output_metrics', {})
 
-    # Train breakdown models
-    breakdown_models = train_breakdown_models(df_encoded)
+    peak_mb = training_data.peak_memory_mb()
+    if peak_mb is not None:
+        print(f"Peak memory: {peak_mb:.0f} MB")
 
     # Save everything
-    save_artifacts(model, breakdown_models, encoders, metrics, feature_cols)
+    save_artifacts(model, breakdown_models, encoders, metrics, FEATURE_COLS,
+                   output_metrics, model_type='fused' if fused else 'separate',
+                   model_dir=model_dir, incremental_holdout=incremental_holdout)
+
+    # Training by hand into the backend folder means "serve these", even if
+    # an API retrain had switched the server over to a versioned folder
+    if os.path.abspath(model_dir) == SCRIPT_DIR:
+        model_store.clear_active_version()
 
     print("\n" + "="*50)
     print("TRAINING COMPLETE!")
     print("="*50)
 
 
+def main(fused=False, model_dir=SCRIPT_DIR, workers=TRAIN_WORKERS,
+         data_path=None, max_rows=training_data.MAX_ROWS):
+    """Run the full training pipeline, saving into model_dir."""
+    print("="*50)
+    print("LIVECOST ML MODEL TRAINING" + (" (FUSED)" if fused else ""))
+    print("="*50)
+
+    data_path = os.path.abspath(data_path or default_data_path())
+
+    # Load data and encode categorical features
+    df_encoded, encoders, position = load_and_preprocess_data(data_path, max_rows)
+
+    start = time.perf_counter()
+
+    train_df, test_df = split_data(df_encoded)
+    trained = train_models(train_df, test_df, fused=fused, workers=workers)
+
+    model, _, metrics, output_metrics = unpack_models(trained, fused)
+    if fused:
+        # One forest for the total and all 4 categories
+        report_fused_model(output_metrics)
+    else:
+        report_main_model(model, metrics)
+        report_breakdown_models({category: output_metrics[category] for category in CATEGORIES})
+
+    seconds = time.perf_counter() - start
+    print(f"\nTotal training time: {seconds:.2f}s")
+
+    finish_training(trained, encoders, fused, model_dir)
+
+    # Where the next --incremental run picks up from
+    training_manifest.save(model_dir, {
+        'data_path': data_path,
+        'position': position,
+        'model_type': 'fused' if fused else 'separate',
+        'trees': {name: len(result[0].estimators_) for name, result in trained.items()},
+        'full_retrain': {
+            'finished_at': datetime.now().isoformat(),
+            'rows': position['rows'],
+            'seconds': round(seconds, 2)
+        },
+        'incremental_runs': []
+    })
+    training_manifest.save_recent_rows(model_dir, df_encoded)
+
+
+def incremental_blocker(manifest, data_path, fused):
+    """Why the models can't be updated incrementally, or None if they can."""
+    if manifest is None:
+        return "no training manifest - models predate incremental training"
+    if manifest['data_path'] != data_path:
+        return f"last trained on {manifest['data_path']}"
+    if manifest['model_type'] != ('fused' if fused else 'separate'):
+        return f"current models are {manifest['model_type']}"
+    if not training_data.continues_from(data_path, manifest['position']):
+        return "the data file changed, not just new rows added"
+    return None
+
+
+def report_incremental_gap(incremental, full, seconds, full_seconds):
+    """Print holdout accuracy of the incremental models next to a full retrain."""
+    print("\n" + "="*50)
+    print("INCREMENTAL VS FULL RETRAIN (holdout of new rows)")
+    print("="*50)
+    print(f"  Wall time: {seconds:.2f}s incremental, {full_seconds:.2f}s full "
+          f"({full_seconds / seconds:.1f}x)")
+    for output, metrics in incremental.items():
+        inc, ful = metrics['test'], full[output]['test']
+        print(f"  {output}: RMSE ${inc['rmse']:.2f} vs ${ful['rmse']:.2f} "
+              f"({inc['rmse'] - ful['rmse']:+.2f}), R² {inc['r2']:.4f} vs {ful['r2']:.4f}")
+
+
+def main_incremental(fused=False, model_dir=SCRIPT_DIR, workers=TRAIN_WORKERS,
+                     data_path=None, max_rows=training_data.MAX_ROWS,
+                     compare_full=False):
+    """
+    Update the models being served with the rows added since they were
+    trained, instead of retraining on everything.
+
+    Reads only the new rows (see training_data.load), holds 20% of them
+    out for evaluation, and grows every forest with trees fit on the rest
+    plus the most recent older rows (see grow_forest). Falls back to a
+    full retrain when that can't work - no manifest, a different or
+    rewritten data file, or a city/apartment/car the encoders have never
+    seen. compare_full also does a full retrain in memory to show how
+    much accuracy the incremental run gave up, and how much time it saved.
+    """
+    print("="*50)
+    print("LIVECOST ML MODEL TRAINING (INCREMENTAL)")
+    print("="*50)
+
+    data_path = os.path.abspath(data_path or default_data_path())
+    base_dir = model_store.active_model_dir()
+    manifest = training_manifest.load(base_dir)
+
+    blocker = incremental_blocker(manifest, data_path, fused)
+    if blocker is not None:
+        print(f"Can't train incrementally ({blocker}) - doing a full retrain")
+        return main(fused, model_dir, workers, data_path, max_rows)
+
+    start = time.perf_counter()
+    model, breakdown_models, metadata = lookup_table.load_artifacts(base_dir)
+    new_df, encoders, position = training_data.load(
+        data_path, max_rows, start=manifest['position'], encoders=metadata['encoders'])
+
+    new_rows = 0 if new_df is None else len(new_df)
+    if new_rows < MIN_INCREMENTAL_ROWS:
+        print(f"Only {new_rows} new rows since the last run - nothing to do yet")
+        return False
+
+    if any(encoders[col]['classes'] != metadata['encoders'][col]['classes']
+           for col in encoders):
+        print("New cities/apartment sizes/car types in the data - doing a full retrain")
+        return main(fused, model_dir, workers, data_path, max_rows)
+
+    print(f"New rows: {new_rows} (rows {manifest['position']['rows']}-{position['rows'] - 1})")
+
+    # Holdout comes from the new rows only - none of the trees have seen those
+    new_train, holdout = split_data(new_df)
+    recent = training_manifest.load_recent_rows(base_dir)
+    window = pd.concat([recent, new_train]) if recent is not None else new_train
+
+    models = {'fused': model} if fused else {'total_monthly_cost': model, **breakdown_models}
+    grown = grow_models(models, window, holdout, fused=fused, workers=workers)
+    seconds = time.perf_counter() - start
+
+    print("\nTrees per forest:")
+    for name, (forest, _, added, dropped) in grown.items():
+        print(f"  {name}: {len(forest.estimators_)} (+{added}, -{dropped} oldest)")
+    print(f"\nTotal incremental training time: {seconds:.2f}s "
+          f"(last full retrain took {manifest['full_retrain']['seconds']:.2f}s)")
+
+    run = {
+        'finished_at': datetime.now().isoformat(),
+        'new_rows': new_rows,
+        'window_rows': len(window),
+        'seconds': round(seconds, 2),
+        'holdout_rmse': {output: round(metrics['test']['rmse'], 2) for output, metrics
+                         in output_metrics_of(grown, fused).items()}
+    }
+
+    if compare_full:
+        full_df, _, _ = training_data.load(data_path, max_rows)
+        full_df = full_df.loc[full_df.index < position['rows']].drop(holdout.index, errors='ignore')
+
+        full_start = time.perf_counter()
+        full = train_models(full_df, holdout, fused=fused, workers=workers)
+        full_seconds = time.perf_counter() - full_start
+
+        incremental_metrics = output_metrics_of(grown, fused)
+        full_metrics = output_metrics_of(full, fused)
+        report_incremental_gap(incremental_metrics, full_metrics, seconds, full_seconds)
+        run['full_seconds'] = round(full_seconds, 2)
+        run['rmse_gap'] = {output: round(incremental_metrics[output]['test']['rmse']
+                                         - full_metrics[output]['test']['rmse'], 2)
+                           for output in incremental_metrics}
+
+    finish_training(grown, encoders, fused, model_dir, base_metadata=metadata)
+
+    manifest['position'] = position
+    manifest['trees'] = {name: len(result[0].estimators_) for name, result in grown.items()}
+    manifest['incremental_runs'].append(run)
+    training_manifest.save(model_dir, manifest)
+    training_manifest.save_recent_rows(
+        model_dir, pd.concat([recent, new_df]) if recent is not None else new_df)
+    return True
+
+
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train the LiveCost models')
+    parser.add_argument('--fused', action='store_true',
+                        help='train one multi-output forest instead of five')
+    parser.add_argument('--output-dir', default=SCRIPT_DIR,
+                        help='where to save the artifacts (default: the backend folder)')
+    parser.add_argument('--workers', type=int, default=TRAIN_WORKERS,
+                        help='cores to train with, shared by all the models '
+                             '(default: LIVECOST_TRAIN_WORKERS or every core)')
+    parser.add_argument('--data', help='training data, .csv or .parquet '
+                        '(default: data/cost_of_living_data.csv)')
+    parser.add_argument('--max-rows', type=int, default=training_data.MAX_ROWS,
+                        help='train on a random sample of this many rows if the data is '
+                             'bigger (default: LIVECOST_TRAIN_MAX_ROWS or 2,000,000)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='add trees for the rows appended since the models being '
+                             'served were trained, instead of retraining from scratch')
+    parser.add_argument('--compare-full', action='store_true',
+                        help='with --incremental, also do a full retrain (not saved) and '
+                             'report the accuracy gap and time saved')
+    args = parser.parse_args()
+
+    if args.incremental:
+        trained = main_incremental(fused=args.fused, model_dir=args.output_dir,
+                                   workers=args.workers, data_path=args.data,
+                                   max_rows=args.max_rows, compare_full=args.compare_full)
+        if trained is False:
+            sys.exit(model_store.NO_NEW_DATA_EXIT_CODE)
+    else:
+        main(fused=args.fused, model_dir=args.output_dir, workers=args.workers,
+             data_path=args.data, max_rows=args.max_rows)
@@ -0,0 +1,293 @@
+"""
+LiveCost Training Data - training_data.py
+
+Streams the training data in chunks instead of reading the whole file at
+once, so train_model.py can handle datasets far bigger than the 70 rows
+in data/.
+
+- Every column gets an explicit compact dtype (categories, int8,
+  float32) instead of whatever pandas infers, which is object strings
+  and 64-bit numbers.
+- CSV is read in chunks. Parquet (.parquet / .pq) is read one row batch
+  at a time, which needs pyarrow installed.
+- The city / apartment / car encoders get fit during that same single
+  pass. They end up identical to LabelEncoder (classes sorted, codes
+  0..n-1), so the API encodes requests the same way as before.
+- Only the encoded columns are kept, and at most max_rows of them. Past
+  that the rows are a uniform random sample of the whole file. So memory
+  depends on max_rows and the chunk size, not on how big the file is.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import csv
+import hashlib
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CATEGORICAL_COLS = ['city', 'apartment_size', 'car_type']
+
+TARGET_COLS = ['rent', 'food', 'transportation', 'utilities', 'total_monthly_cost']
+
+# What every input column gets read as. float32 has plenty of precision
+# for dollar amounts and commute miles, and the trees train on float32
+# anyway.
+COLUMN_DTYPES = {
+    'city': 'category',
+    'apartment_size': 'category',
+    'car_type': 'category',
+    'dining_frequency': np.int8,
+    'commute_miles': np.float32,
+    **{col: np.float32 for col in TARGET_COLS}
+}
+
+# Rows read per chunk
+CHUNK_ROWS = 250_000
+
+# Most rows kept for training - about 30 bytes each once encoded, so the
+# default is ~60 MB. Bigger files get sampled down to this.
+MAX_ROWS = int(os.environ.get('LIVECOST_TRAIN_MAX_ROWS', 2_000_000))
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# How much of the data before a saved position gets hashed, to check the
+# file has only had rows appended since (see continues_from)
+TAIL_BYTES = 64 * 1024
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def parquet_file(path: str):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)") from None
+    return pq.ParquetFile(path)
+
+
+class BoundedFile(io.RawIOBase):
+    """A binary file that ends at `end` bytes, even if it's bigger by now."""
+
+    def __init__(self, f, end: int):
+        self._f = f
+        self._end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        remaining = self._end - self._f.tell()
+        if remaining <= 0:
+            return 0
+        return self._f.readinto(memoryview(buffer)[:remaining])
+
+
+def tail_sha256(path: str, end: int) -> str:
+    """Hash of the TAIL_BYTES bytes before `end`."""
+    with open(path, 'rb') as f:
+        f.seek(max(0, end - TAIL_BYTES))
+        return hashlib.sha256(f.read(end - f.tell())).hexdigest()
+
+
+def continues_from(path: str, position: Dict[str, Any]) -> bool:
+    """
+    Is this still the file `position` came from, maybe with rows appended?
+
+    CSV checks the bytes before the position are unchanged. Parquet can
+    only be checked for not having lost rows.
+    """
+    if is_parquet(path):
+        return parquet_file(path).metadata.num_rows >= position['rows']
+    if position['bytes'] is None or os.path.getsize(path) < position['bytes']:
+        return False
+    return tail_sha256(path, position['bytes']) == position['tail_sha256']
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS,
+                start: Optional[Dict[str, Any]] = None,
+                end: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    The file as DataFrames of up to chunk_rows rows, with COLUMN_DTYPES.
+
+    With `start` (a position load() returned earlier) only the rows after
+    it. CSV reads stop at byte `end` (default: the current size), so rows
+    appended in the meantime are left for the next run.
+    """
+    columns = list(COLUMN_DTYPES)
+
+    if is_parquet(path):
+        skip = start['rows'] if start else 0
+        for batch in parquet_file(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            yield batch.slice(skip).to_pandas().astype(COLUMN_DTYPES)
+            skip = 0
+        return
+
+    end = os.path.getsize(path) if end is None else end
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        if start is not None:
+            f.seek(max(start['bytes'], f.tell()))
+        if f.tell() >= end:
+            return
+
+        text = io.TextIOWrapper(io.BufferedReader(BoundedFile(f, end)), encoding='utf-8')
+        yield from pd.read_csv(text, header=None, names=header, usecols=columns,
+                               dtype=COLUMN_DTYPES, chunksize=chunk_rows)
+
+
+class StreamingEncoder:
+    """
+    LabelEncoder that gets fit one chunk at a time.
+
+    Each class gets a temporary id the first time it shows up. finish()
+    works out the sorted order LabelEncoder would have used and how to
+    remap the temporary ids to it.
+    """
+
+    def __init__(self, column: str, classes: Optional[List[str]] = None):
+        self.column = column
+        # Starting from an existing encoder keeps its codes, as long as
+        # no new classes turn up
+        self.ids: Dict[str, int] = {cls: code for code, cls in enumerate(classes or [])}
+
+    def partial_transform(self, values: pd.Series) -> np.ndarray:
+        """Temporary ids for one chunk of a categorical column."""
+        codes = values.cat.codes.to_numpy()
+        if (codes < 0).any():
+            raise ValueError(f"Missing {self.column} values in the training data")
+
+        lookup = np.array([self.ids.setdefault(cls, len(self.ids))
+                           for cls in values.cat.categories], dtype=np.int16)
+        return lookup[codes]
+
+    def finish(self) -> Tuple[Dict[str, Any], np.ndarray]:
+        """(encoder in the metadata format, temporary id -> final code)."""
+        classes = sorted(self.ids)
+        remap = np.empty(len(classes), dtype=np.int16)
+        for code, cls in enumerate(classes):
+            remap[self.ids[cls]] = code
+
+        encoder = {
+            'classes': classes,
+            'mapping': {cls: code for code, cls in enumerate(classes)}
+        }
+        return encoder, remap
+
+
+def downsample(columns: Dict[str, np.ndarray], max_rows: int) -> Dict[str, np.ndarray]:
+    """
+    Keep the max_rows rows with the smallest random keys.
+
+    Every row got its key when it was read, so this is a uniform sample
+    of everything read so far no matter how it arrived in chunks.
+    """
+    keep = np.argpartition(columns['_key'], max_rows - 1)[:max_rows]
+    return {name: column[keep] for name, column in columns.items()}
+
+
+def concat(pieces: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {name: np.concatenate([piece[name] for piece in pieces]) for name in pieces[0]}
+
+
+def load(path: str, max_rows: Optional[int] = MAX_ROWS, chunk_rows: int = CHUNK_ROWS,
+         seed: int = 42, start: Optional[Dict[str, Any]] = None,
+         encoders: Optional[Dict[str, Any]] = None
+         ) -> Tuple[pd.DataFrame, Dict[str, Any], Dict[str, Any]]:
+    """
+    Read and encode a training file in one streaming pass.
+
+    Returns (encoded rows in file order, encoders, end position). The
+    DataFrame has the *_encoded feature columns plus dining_frequency,
+    commute_miles and the cost targets, indexed by row number in the
+    file. max_rows=None keeps every row.
+
+    The position is where the next incremental read picks up: pass it
+    back as `start`, along with the encoders from last time so the codes
+    stay the same. 'rows' in it counts every row in the file up to there.
+    """
+    encoders = {col: StreamingEncoder(col, encoders[col]['classes'] if encoders else None)
+                for col in CATEGORICAL_COLS}
+    rng = np.random.default_rng(seed)
+
+    first_row = start['rows'] if start else 0
+    end = None if is_parquet(path) else os.path.getsize(path)
+
+    pieces = []
+    buffered = 0
+    total_rows = first_row
+
+    for chunk in read_chunks(path, chunk_rows, start, end):
+        n = len(chunk)
+        piece = {f'{col}_encoded': encoders[col].partial_transform(chunk[col])
+                 for col in CATEGORICAL_COLS}
+        piece['dining_frequency'] = chunk['dining_frequency'].to_numpy()
+        piece['commute_miles'] = chunk['commute_miles'].to_numpy()
+        for col in TARGET_COLS:
+            piece[col] = chunk[col].to_numpy()
+        piece['_row'] = np.arange(total_rows, total_rows + n)
+        piece['_key'] = rng.random(n)
+
+        pieces.append(piece)
+        buffered += n
+        total_rows += n
+
+        # Let up to twice max_rows pile up before sampling, so it doesn't
+        # have to re-sample after every chunk
+        if max_rows is not None and buffered > 2 * max_rows:
+            pieces = [downsample(concat(pieces), max_rows)]
+            buffered = max_rows
+
+    position = {
+        'rows': total_rows,
+        'bytes': end,
+        'tail_sha256': tail_sha256(path, end) if end is not None else None
+    }
+
+    if not pieces:
+        if start is None:
+            raise ValueError(f"No training data in {path}")
+        return None, {col: encoder.finish()[0] for col, encoder in encoders.items()}, position
+
+    columns = concat(pieces)
+    if max_rows is not None and buffered > max_rows:
+        columns = downsample(columns, max_rows)
+
+    # Back in file order, so a file that fits gives exactly the rows (and
+    # train/test split) it always did
+    rows = columns.pop('_row')
+    order = np.argsort(rows, kind='stable')
+    del columns['_key']
+
+    metadata_encoders = {}
+    for col, encoder in encoders.items():
+        metadata_encoders[col], remap = encoder.finish()
+        codes = remap[columns[f'{col}_encoded']]
+        columns[f'{col}_encoded'] = codes.astype(np.int8 if len(remap) <= 127 else np.int16)
+
+    df = pd.DataFrame({name: column[order] for name, column in columns.items()},
+                      index=rows[order])
+    return df, metadata_encoders, position
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Most memory this process has used so far (max RSS), if the OS says."""
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
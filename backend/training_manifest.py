@@ -0,0 +1,62 @@
+"""
+LiveCost Training Manifest - training_manifest.py
+
+What a set of models has been trained on, so the next retrain can be
+incremental (python train_model.py --incremental) instead of starting
+over on the whole history.
+
+Saved next to the model artifacts (so each model_versions/ folder has its
+own):
+- training_manifest.json: which data file, how far into it training got
+  (see training_data.load), how many trees each forest has, and a log of
+  the full and incremental runs.
+- recent_rows.pkl: the last RECENT_ROWS encoded rows trained on. New
+  trees get fit on these plus the new rows, so one day's worth of data
+  doesn't get a whole slice of the forest to itself.
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+MANIFEST_FILE = 'training_manifest.json'
+RECENT_ROWS_FILE = 'recent_rows.pkl'
+
+# Rows kept around to train the next incremental slice of trees on
+RECENT_ROWS = 50_000
+
+# Incremental runs kept in the manifest's log
+KEEP_RUNS = 50
+
+
+def load(model_dir: str) -> Optional[Dict[str, Any]]:
+    """The manifest saved with the models in model_dir, if there is one."""
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save(model_dir: str, manifest: Dict[str, Any]):
+    manifest['incremental_runs'] = manifest.get('incremental_runs', [])[-KEEP_RUNS:]
+    with open(os.path.join(model_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_recent_rows(model_dir: str) -> Optional[pd.DataFrame]:
+    try:
+        return pd.read_pickle(os.path.join(model_dir, RECENT_ROWS_FILE))
+    except FileNotFoundError:
+        return None
+
+
+def save_recent_rows(model_dir: str, rows: pd.DataFrame):
+    """Keep the newest RECENT_ROWS rows (by row number in the data file)."""
+    rows.sort_index().tail(RECENT_ROWS).to_pickle(os.path.join(model_dir, RECENT_ROWS_FILE))
@@ -0,0 +1,211 @@
+"""
+LiveCost NumPy Tree Engine - tree_engine.py
+
+Serving-side inference for our RandomForest models without going
+through sklearn's predict().
+
+Profiling /predict showed most of the time wasn't the tree walks at all -
+it was sklearn validating the input and spinning up joblib threads, five
+times per request. Our forests are small (100 + 4x50 trees, depth <= 10)
+so the actual work is tiny.
+
+This flattens every tree of every forest into one set of contiguous node
+arrays (feature, threshold, left, right, value) and walks all of them at
+once with NumPy fancy indexing - one step per tree level for the whole
+batch. Results are bit-identical to sklearn (see benchmarks/bench_inference.py).
+
+Author: Jeremiah Williams
+Course: Project & Portfolio IV - Full Sail University
+Date: December 2025
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Rows per traversal chunk - keeps the (trees x rows) index arrays small
+# enough to stay in cache for big batches
+CHUNK_ROWS = 1024
+
+
+class TreeEnsemble:
+    """
+    Several fitted forests flattened into one array-backed ensemble.
+
+    Leaves point back at themselves (left = right = self), so every row
+    can just take max_depth steps without checking whether it's done.
+    predict() returns the forests' outputs side by side, in the order
+    the forests were passed in.
+
+    Children are stored interleaved as [left, right] so one gather at
+    2*node + went_right picks the next node, and the index arrays are
+    intp so NumPy doesn't convert them on every step. Arrays that are
+    already the right dtype are used as-is (no copy), which is what lets
+    the memory-mapped ones from serving_artifacts.py stay shared.
+    """
+
+    ARRAYS = ['feature', 'threshold', 'children', 'value', 'roots',
+              'forest_trees', 'forest_outputs']
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray,
+                 children: np.ndarray, value: np.ndarray,
+                 roots: np.ndarray, forest_trees: np.ndarray,
+                 forest_outputs: np.ndarray, max_depth: int):
+        self.feature = feature.astype(np.intp, copy=False)
+        self.threshold = threshold.astype(np.float64, copy=False)
+        self.children = children.astype(np.intp, copy=False)
+        self.value = value.astype(np.float64, copy=False)
+        self.roots = roots.astype(np.intp, copy=False)
+        self.forest_trees = forest_trees
+        self.forest_outputs = forest_outputs
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_outputs(self) -> int:
+        return int(self.forest_outputs.sum())
+
+    @classmethod
+    def from_forests(cls, forests: List) -> 'TreeEnsemble':
+        """Flatten fitted RandomForestRegressors into contiguous node arrays."""
+        max_outputs = max(forest.n_outputs_ for forest in forests)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        forest_trees, forest_outputs = [], []
+        offset = 0
+        max_depth = 0
+
+        for forest in forests:
+            forest_trees.append(len(forest.estimators_))
+            forest_outputs.append(forest.n_outputs_)
+
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                n_nodes = tree.node_count
+                node_ids = np.arange(n_nodes, dtype=np.int32)
+                is_leaf = tree.children_left == -1
+
+                feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+                left = np.where(is_leaf, node_ids, tree.children_left).astype(np.int32)
+                right = np.where(is_leaf, node_ids, tree.children_right).astype(np.int32)
+
+                # Regression trees store value as (nodes, outputs, 1)
+                value = np.zeros((n_nodes, max_outputs), dtype=np.float64)
+                value[:, :forest.n_outputs_] = tree.value[:, :, 0]
+
+                features.append(feature)
+                thresholds.append(tree.threshold.astype(np.float64))
+                lefts.append(left + offset)
+                rights.append(right + offset)
+                values.append(value)
+                roots.append(offset)
+
+                offset += n_nodes
+                max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).ravel(),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            forest_trees=np.array(forest_trees, dtype=np.int32),
+            forest_outputs=np.array(forest_outputs, dtype=np.int32),
+            max_depth=max_depth
+        )
+
+    def apply(self, features: np.ndarray) -> np.ndarray:
+        """Leaf node index for every (row, tree) pair."""
+        # sklearn casts X to float32 before comparing against the float64
+        # thresholds - have to do the same or edge values go the wrong way
+        X = np.asarray(features, dtype=np.float32).astype(np.float64)
+        n_rows = X.shape[0]
+
+        # Feature-major copy of X so a (tree, row) pair's value sits at
+        # feature * n_rows + row
+        X_flat = np.ascontiguousarray(X.T).ravel()
+        row_ids = np.arange(n_rows, dtype=np.intp)
+
+        # Tree-major layout (trees x rows) - each tree's rows stay together
+        # which is a lot friendlier to the cache than rows x trees
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            went_right = X_flat[self.feature[nodes] * n_rows + row_ids] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + went_right]
+
+        return nodes.T
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Each forest's averaged prediction, side by side (N x n_outputs)."""
+        n_rows = features.shape[0]
+        outputs = np.empty((n_rows, self.n_outputs))
+
+        for start in range(0, n_rows, CHUNK_ROWS):
+            chunk = slice(start, min(start + CHUNK_ROWS, n_rows))
+            leaves = self.apply(features[chunk])
+
+            tree_start = 0
+            column = 0
+            for n_trees, n_out in zip(self.forest_trees, self.forest_outputs):
+                leaf_values = self.value[leaves[:, tree_start:tree_start + n_trees], :n_out]
+
+                # sklearn adds the trees up one at a time in estimator order
+                # and then divides - cumsum does the same sequential adds
+                # (np.sum uses pairwise summation, which rounds differently)
+                totals = np.cumsum(leaf_values, axis=1)[:, -1, :]
+                outputs[chunk, column:column + n_out] = totals / n_trees
+
+                tree_start += n_trees
+                column += n_out
+
+        return outputs
+
+
+class SklearnEnsemble:
+    """
+    Plain sklearn predict() calls behind the same interface as TreeEnsemble.
+
+    breakdown_models is None for a fused model (train_model.py --fused),
+    which already predicts all 5 columns in one call.
+
+    timers is optional - one timer per forest (same order as
+    model_forests()) with a since(start) method, like metrics.Histogram.
+    main.py uses it to time each model's predict() on its own.
+    """
+
+    def __init__(self, model, breakdown_models: Optional[Dict], timers: Optional[List] = None):
+        self.model = model
+        self.breakdown_models = breakdown_models
+        self.timers = timers
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        timers = self.timers
+        start = time.perf_counter() if timers else 0.0
+
+        if self.breakdown_models is None:
+            outputs = self.model.predict(features)
+            if timers:
+                timers[0].since(start)
+            return outputs
+
+        outputs = np.empty((features.shape[0], 1 + len(self.breakdown_models)))
+        outputs[:, 0] = self.model.predict(features)
+        if timers:
+            start = timers[0].since(start)
+        for i, cat_model in enumerate(self.breakdown_models.values(), start=1):
+            outputs[:, i] = cat_model.predict(features)
+            if timers:
+                start = timers[i].since(start)
+        return outputs
+
+
+def model_forests(model, breakdown_models: Optional[Dict]) -> List:
+    """Total model first, then the breakdown models in category order."""
+    if breakdown_models is None:
+        return [model]
+    return [model] + list(breakdown_models.values())
+
+
+def from_models(model, breakdown_models: Optional[Dict]) -> TreeEnsemble:
+    """Flatten either the five separate forests or the one fused forest."""
+    return TreeEnsemble.from_forests(model_forests(model, breakdown_models))
@@ -39,7 +39,7 @@ import CostChart from './components/CostChart';
 import AffordabilityMap from './components/AffordabilityMap';
 
 // API service for talking to the backend
-import { predictCost } from './services/api';
+import { compareCities, predictCost } from './services/api';
 
 
 // Custom theme - colors picked from Tailwind's palette because they look good
@@ -82,6 +82,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [prediction, setPrediction] = useState(null);
+  const [comparison, setComparison] = useState(null);
 
   // These are for the affordability map
   const [selectedCity, setSelectedCity] = useState('Austin');
@@ -97,11 +98,18 @@ function App() {
     setSalary(parseFloat(formData.salary) || 75000);
 
     try {
-      const result = await predictCost(formData);
+      // Every city for the map comes from one /compare call - the map just
+      // stays gray for the other cities if it fails
+      const [result, cities] = await Promise.all([
+        predictCost(formData),
+        compareCities(formData).catch(() => null),
+      ]);
       setPrediction(result);
+      setComparison(cities);
     } catch (err) {
       setError(err.message || 'Failed to get prediction. Please try again.');
       setPrediction(null);
+      setComparison(null);
     } finally {
       setLoading(false);
     }
@@ -238,6 +246,7 @@ function App() {
           <Box sx={{ mt: 3 }}>
             <AffordabilityMap
               prediction={prediction}
+              comparison={comparison}
               salary={salary}
               selectedCity={selectedCity}
             />
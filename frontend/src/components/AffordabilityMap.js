@@ -91,11 +91,17 @@ const getAffordabilityLabel = (monthlyCost, annualSalary) => {
 };
 
 
-function AffordabilityMap({ prediction, salary, selectedCity }) {
+function AffordabilityMap({ prediction, comparison, salary, selectedCity }) {
   const [hoveredCity, setHoveredCity] = useState(null);
 
   const monthlyCost = prediction?.total_monthly_cost || null;
 
+  // Every city's monthly cost for this profile, from /compare
+  const cityCosts = {};
+  (comparison?.cities || []).forEach((row) => {
+    cityCosts[row.city] = row.total_monthly_cost;
+  });
+
   return (
     <Paper elevation={2} sx={{ p: 2 }}>
       <Typography variant="h6" gutterBottom>
@@ -104,7 +110,7 @@ function AffordabilityMap({ prediction, salary, selectedCity }) {
 
       <Typography variant="body2" color="text.secondary" sx={{ mb: 2 }}>
         {prediction
-          ? `Showing affordability for ${CITY_COORDINATES[selectedCity]?.name || selectedCity} based on $${salary?.toLocaleString() || 0}/year salary`
+          ? `Showing affordability ${comparison ? 'in every city' : `for ${CITY_COORDINATES[selectedCity]?.name || selectedCity}`} based on $${salary?.toLocaleString() || 0}/year salary`
           : 'Calculate a cost estimate to see affordability'
         }
       </Typography>
@@ -158,12 +164,15 @@ function AffordabilityMap({ prediction, salary, selectedCity }) {
           {/* City markers */}
           {Object.entries(CITY_COORDINATES).map(([cityCode, cityData]) => {
             const isSelected = cityCode === selectedCity;
-            const markerColor = isSelected && prediction
-              ? getAffordabilityColor(monthlyCost, salary)
+            const cityCost = isSelected && prediction
+              ? monthlyCost
+              : cityCosts[cityCode] || null;
+            const markerColor = cityCost
+              ? getAffordabilityColor(cityCost, salary)
               : '#9ca3af';
 
-            const tooltipText = isSelected && prediction
-              ? `${cityData.name}: $${monthlyCost?.toLocaleString()}/mo - ${getAffordabilityLabel(monthlyCost, salary)}`
+            const tooltipText = cityCost
+              ? `${cityData.name}: $${cityCost.toLocaleString()}/mo - ${getAffordabilityLabel(cityCost, salary)}`
               : `${cityData.name}: Select to calculate`;
 
             return (
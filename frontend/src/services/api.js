@@ -55,6 +55,30 @@ export const predictCost = async (data) => {
   }
 };
 
+/**
+ * Price one lifestyle profile in every city in a single call
+ * @param {Object} data - User input data (city is ignored)
+ * @returns {Promise<Object>} - Every city's cost and affordability, cheapest first
+ */
+export const compareCities = async (data) => {
+  try {
+    const response = await api.post('/compare', {
+      apartment_size: data.apartmentSize,
+      dining_frequency: parseInt(data.diningFrequency, 10),
+      car_type: data.carType,
+      commute_miles: parseFloat(data.commuteMiles),
+      entertainment_budget: data.entertainmentBudget,
+      grocery_habits: data.groceryHabits,
+      fitness_routine: data.fitnessRoutine,
+      healthcare_needs: data.healthcareNeeds,
+      salary: parseFloat(data.salary) || 75000,
+    });
+    return response.data;
+  } catch (error) {
+    throw new Error('Failed to compare cities');
+  }
+};
+
 /**
  * Check API health status
  * @returns {Promise<Object>} - Health status
@@ -95,12 +119,18 @@ export const getModelInfo = async () => {
 };
 
 /**
- * Get recent queries
- * @returns {Promise<Object>} - Recent queries
+ * Get recent queries, newest first
+ * @param {Object} options - Optional paging/filtering
+ * @param {number} options.after - next_cursor from the previous page
+ * @param {number} options.limit - Queries per page
+ * @param {string} options.city - Only queries for this city
+ * @returns {Promise<Object>} - Recent queries and next_cursor (null on the last page)
  */
-export const getRecentQueries = async () => {
+export const getRecentQueries = async ({ after, limit, city } = {}) => {
   try {
-    const response = await api.get('/recent-queries');
+    const response = await api.get('/recent-queries', {
+      params: { after, limit, city },
+    });
     return response.data;
   } catch (error) {
     throw new Error('Failed to fetch recent queries');